@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+AutoAirconSched.py -- AutoAirconServer の目標温度のスケジュール
+
+crontab と同じ書式(分 時 日 月 曜日)で、目標温度(ttemp)を変える時刻を指定する。
+
+  [schedule]                       # デフォルトのゾーン
+  morning = 0 7 * * 1-5 24         # 平日 7:00 に 24度
+  night   = 0 23 * * * 18
+  [schedule.zone2]                 # ゾーン zone2
+  evening = 30 17 * * * 23
+
+部屋の温度変化の時定数(tau)を、温度履歴からオンラインで推定し、
+指定した時刻に目標温度になるように、前もって ttemp を変える
+(リード時間 = tau * ln(|ttemp - 室温| / BAND))。
+指定時刻に急に ttemp を変えるより、PID が飽和しにくく、
+設定温度を何度も修正する赤外線信号が少なくなる。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import datetime
+import math
+
+from MyLogger import get_logger
+
+
+class CronRule:
+    """
+    crontab の時刻指定 (分 時 日 月 曜日)
+
+      *, 1-5, 1,3,5, */10, 0-30/10
+      曜日: 0..7 (0, 7: 日曜日)
+      日と曜日の両方を指定した場合は、どちらかに一致すれば良い (cron と同じ)
+    """
+    FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('dom', 1, 31),
+              ('month', 1, 12), ('dow', 0, 7)]
+
+    MAX_DAYS = 366 * 5  # next_time() で探す日数 (2/29 を含む)
+
+    def __init__(self, spec):
+        """
+        Raises
+        ------
+        ValueError
+        """
+        fields = spec.split()
+        if len(fields) != len(self.FIELDS):
+            raise ValueError('%a: %d fields required' %
+                             (spec, len(self.FIELDS)))
+
+        self.spec = spec
+        self.val = {}
+        self.star = {}
+        for f, (name, v_min, v_max) in zip(fields, self.FIELDS):
+            self.val[name] = self.parse_field(f, v_min, v_max)
+            self.star[name] = f.startswith('*')
+
+        # 曜日: 7 -> 0 (日曜日)
+        if 7 in self.val['dow']:
+            self.val['dow'] = sorted(set(self.val['dow']) - {7} | {0})
+
+    @staticmethod
+    def parse_field(field, v_min, v_max):
+        """
+        Returns
+        -------
+        values: [int, ..] (sorted)
+        """
+        values = set()
+        for item in field.split(','):
+            step = 1
+            if '/' in item:
+                item, step_str = item.split('/', 1)
+                step = int(step_str)
+                if step < 1:
+                    raise ValueError('%a: step < 1' % field)
+
+            if item == '*':
+                a, b = v_min, v_max
+            elif '-' in item:
+                a, b = [int(v) for v in item.split('-', 1)]
+            else:
+                a = int(item)
+                b = a if step == 1 else v_max
+
+            if a < v_min or b > v_max or a > b:
+                raise ValueError('%a: out of range %d-%d' %
+                                 (field, v_min, v_max))
+            values |= set(range(a, b + 1, step))
+        return sorted(values)
+
+    def match_day(self, d):
+        """
+        d: datetime.date
+        """
+        if d.month not in self.val['month']:
+            return False
+
+        dom = d.day in self.val['dom']
+        dow = (d.isoweekday() % 7) in self.val['dow']
+        if self.star['dom'] or self.star['dow']:
+            return dom and dow
+        return dom or dow
+
+    def next_time(self, ts):
+        """
+        ts より後で、最初に一致する時刻
+
+        Returns
+        -------
+        ts_next: float or None
+        """
+        t = datetime.datetime.fromtimestamp(ts).replace(second=0,
+                                                        microsecond=0)
+        t += datetime.timedelta(minutes=1)
+
+        d = t.date()
+        for i in range(self.MAX_DAYS):
+            if self.match_day(d):
+                for h in self.val['hour']:
+                    if i == 0 and h < t.hour:
+                        continue
+                    for m in self.val['minute']:
+                        if i == 0 and h == t.hour and m < t.minute:
+                            continue
+                        return datetime.datetime(d.year, d.month, d.day,
+                                                 h, m).timestamp()
+            d += datetime.timedelta(days=1)
+        return None
+
+
+class RoomTau:
+    """
+    部屋の温度変化の時定数 tau [sec] のオンライン推定
+
+    目標温度に近づく途中では、dT/dt = (ttemp - T) / tau と考えて、
+    温度履歴の回帰直線の傾き(TempHist.slope())から tau を求め、
+    指数移動平均する。
+    目標温度に近い(MIN_ERR以内)ときや、離れていく方向のときは、推定しない。
+    """
+    DEF_TAU = 1800  # sec
+    TAU_MIN = 60
+    TAU_MAX = 4 * 3600
+
+    MIN_ERR = 0.5  # 度
+    ALPHA = 0.05
+
+    BAND = 0.3  # lead_time(): 目標温度 ± [度] になるまで
+
+    def __init__(self, tau=DEF_TAU, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('tau=%s', tau)
+
+        self.tau = tau
+        self.n = 0
+
+    def update(self, temp, ttemp, slope):
+        """
+        slope: 温度の傾き [度/sec] (None: 推定しない)
+
+        Returns
+        -------
+        tau: float or None
+          None: 推定しなかった
+        """
+        err = ttemp - temp
+        if slope is None or abs(err) < self.MIN_ERR or slope * err <= 0:
+            return None
+
+        tau1 = err / slope
+        if not self.TAU_MIN <= tau1 <= self.TAU_MAX:
+            self._log.debug('tau1=%.0f .. ignored', tau1)
+            return None
+
+        self.tau += self.ALPHA * (tau1 - self.tau)
+        self.n += 1
+        self._log.debug('tau1=%.0f, tau=%.0f, n=%d', tau1, self.tau, self.n)
+        return self.tau
+
+    def lead_time(self, temp, ttemp, max_lead=None, direction=0):
+        """
+        室温 temp から、目標温度 ttemp ± BAND になるまでの時間 [sec]
+
+        direction: 1: 暖房、-1: 冷房、0: 両方
+          暖房で温度を下げる(冷房で上げる)場合は、エアコンを止めれば
+          良いだけなので、前もって変えない (リード時間 0)
+        """
+        err = abs(ttemp - temp)
+        if err <= self.BAND or (ttemp - temp) * direction < 0:
+            return 0.0
+
+        lead = self.tau * math.log(err / self.BAND)
+        if max_lead is not None:
+            lead = min(lead, max_lead)
+        return lead
+
+
+class AutoAirconSched:
+    """
+    一つのゾーンのスケジュール
+    """
+    MAX_LEAD = 3 * 3600  # sec
+
+    NO_EVENT = object()  # next_event(): 一致する時刻がない (_next に保存)
+
+    def __init__(self, rules, max_lead=MAX_LEAD, direction=0, debug=False):
+        """
+        Parameters
+        ----------
+        rules: {name: "分 時 日 月 曜日 ttemp"}
+        direction: 1: 暖房、-1: 冷房、0: 両方 (RoomTau.lead_time())
+
+        Raises
+        ------
+        ValueError
+        """
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('rules=%s, max_lead=%s, direction=%s',
+                        rules, max_lead, direction)
+
+        self.max_lead = max_lead
+        self.direction = direction
+
+        self.rules = []
+        for name, spec in rules.items():
+            cron_spec, ttemp = spec.rsplit(None, 1)
+            self.rules.append((name, CronRule(cron_spec), float(ttemp)))
+
+        self._next = None  # (ts, ttemp, name), NO_EVENT or None(未計算)
+        self._next_date = None  # NO_EVENT を求めた日付
+        self._ts_done = None
+
+    def next_event(self, now):
+        """
+        Returns
+        -------
+        event: (ts, ttemp, name) or None
+          適用済みの時刻(_ts_done)より後で、now 以降の一番早いイベント
+
+        一致する時刻がない場合(2月30日など)も、日付が変わるまでは、
+        探し直さない (CronRule.next_time() は、MAX_DAYS 日分探すので)。
+        """
+        if self._next is self.NO_EVENT:
+            if datetime.date.fromtimestamp(now) == self._next_date:
+                return None
+            self._next = None
+        if self._next is not None:
+            return self._next
+
+        ts_from = now - 60
+        if self._ts_done is not None:
+            ts_from = max(ts_from, self._ts_done)
+
+        for name, rule, ttemp in self.rules:
+            ts = rule.next_time(ts_from)
+            if ts is None:
+                continue
+            if self._next is None or ts < self._next[0]:
+                self._next = (ts, ttemp, name)
+        self._log.debug('_next=%s', self._next)
+        if self._next is None:
+            self._next = self.NO_EVENT
+            self._next_date = datetime.date.fromtimestamp(now)
+            return None
+        return self._next
+
+    def check(self, now, temp, tau):
+        """
+        Parameters
+        ----------
+        temp: float
+          現在の室温
+        tau: RoomTau
+
+        Returns
+        -------
+        ttemp: float or None
+          None: まだ
+        """
+        ev = self.next_event(now)
+        if ev is None:
+            return None
+
+        ts, ttemp, name = ev
+        lead = tau.lead_time(temp, ttemp, self.max_lead, self.direction)
+        if now < ts - lead:
+            return None
+
+        self._log.info('%s: ttemp=%s at %s (lead %.0f sec, tau %.0f)',
+                       name, ttemp,
+                       datetime.datetime.fromtimestamp(ts).strftime('%H:%M'),
+                       lead, tau.tau)
+        self._ts_done = ts
+        self._next = None
+        return ttemp
+
+    def status(self, now, temp, tau):
+        ev = self.next_event(now)
+        if ev is None:
+            return None
+
+        ts, ttemp, name = ev
+        lead = tau.lead_time(temp, ttemp, self.max_lead, self.direction)
+        fmt = '%Y-%m-%d %H:%M:%S'
+        return {
+            'name': name,
+            'ttemp': ttemp,
+            'time': datetime.datetime.fromtimestamp(ts).strftime(fmt),
+            'start': datetime.datetime.fromtimestamp(ts - lead).strftime(fmt),
+        }
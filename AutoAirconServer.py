@@ -13,14 +13,20 @@ __author__ = 'Yoichi Tanibayashi'
 __date__   = '2023'
 
 from TcpCmdServer import Cmd, CmdServerApp
+import IrConst
 from TcpCmdClient import TcpCmdClient
 from Mqtt import MqttSubscriber, BeebotteSubscriber
 from IrSendCmdClient import IrSendCmdClient
+from AutoAirconSched import AutoAirconSched, RoomTau
+from IrStateCache import IrStateCache
 
 import queue
+import collections
+import select
 import json
 import os
 import configparser
+import threading
 import time
 
 from MyLogger import get_logger
@@ -41,6 +47,8 @@ class PIDParam:
         'kd': 0.0,
         'ki_i_max': 0.0,
         'interval_min': 0,
+        'd_method': 'lsq',  # 'lsq': 最小二乗法, 'ends': 最初と最後
+        'd_hist_sec': 300,  # 'lsq' の期間 [sec]
     }
 
     def __init__(self, param=DEF_PARAM, param_file=None, debug=False):
@@ -86,6 +94,30 @@ class PIDParam:
             return {'error': msg}
         return self.param
 
+    def save_param(self, param):
+        """
+        param のキーだけを、ファイルの内容にマージして保存
+        (他のキーは、ファイルの値のまま .. 同じファイルを使う他のゾーンや、
+        AutoAirconTune.py が書いた値を上書きしない)
+        """
+        self._log.debug('param=%s', param)
+
+        self.param.update(param)
+        try:
+            try:
+                with open(self._param_file) as f:
+                    p = json.load(f)
+            except FileNotFoundError:
+                p = {}
+            p.update(param)
+            with open(self._param_file, 'w') as f:
+                json.dump(p, f, indent=2)
+        except Exception as e:
+            msg = '%s:%s' % (type(e), e)
+            self._log.error(msg)
+            return {'error': msg}
+        return p
+
     def find(self, fname=PARAM_FILENAME, path=PARAM_PATH):
         self._log.debug('fname=%s, path=%s', fname, path)
 
@@ -110,21 +142,171 @@ class PIDParam:
 
 
 class ParamClient(TcpCmdClient):
+    """
+    Node-RED (ParamServer) へのパラメータの通知
+
+    一つの接続を使い続ける。
+    一回の通知は、JSON 一行 (改行で区切る)。
+    Node-RED の tcp in ノード(ParamServer:51888)は、
+    stream, utf8, 改行で区切る設定にする (flows_rpi3b-1.json)。
+    """
     DEF_SVR_HOST = 'localhost'
     DEF_SVR_PORT = 51888
 
     DEF_TIMEOUT = 2  # sec
 
+    def __init__(self, host=DEF_SVR_HOST, port=DEF_SVR_PORT, unix_path=None,
+                 debug=False):
+        super().__init__(host, port, unix_path=unix_path, debug=debug)
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+
+        self._sock = None
+
+    def end(self):
+        self._log.debug('')
+        self.close()
+        super().end()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def is_closed(self):
+        """
+        相手が接続を切ったか? (ParamServer は何も送ってこない)
+        """
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            if readable and self._sock.recv(4096) == b'':
+                return True
+        except OSError as e:
+            self._log.debug('%s:%s', type(e), e)
+            return True
+        return False
+
     def send_param(self, param):
+        """
+        Returns
+        -------
+        result: bool
+          False: 送信できなかった
+        """
         self._log.debug('param=%s', param)
 
-        param_str = json.dumps(param)
-        ret = self.send_recv_str(param_str, timeout=0)
-        ret_json = json.loads(ret)
-        if ret_json['rc'] == 'OK':
-            self._log.debug('ret=%s', ret)
-        else:
-            self._log.error('ret=%s', ret)
+        out_data = (json.dumps(param) + '\n').encode('utf-8')
+
+        # 切れていたら、一度だけ接続し直す
+        for retry in range(2):
+            if self._sock is not None and self.is_closed():
+                self._log.info('closed by peer .. reconnect')
+                self.close()
+
+            if self._sock is None:
+                try:
+                    self._sock = self.connect()
+                    self._sock.settimeout(self.DEF_TIMEOUT)
+                except OSError as e:
+                    self._log.error('%s:%s', type(e), e)
+                    return False
+
+            try:
+                self._sock.sendall(out_data)
+                return True
+            except OSError as e:
+                self._log.warning('%s:%s', type(e), e)
+                self.close()
+
+        self._log.error('send failed: param=%s', param)
+        return False
+
+
+class ParamPublisher:
+    """
+    Node-RED へのパラメータの非同期通知
+
+    send_param() は、未送信のパラメータにマージするだけで、すぐに戻る。
+    スレッドが、マージしたパラメータを一つにまとめて ParamClient で送る。
+    送信は、最大で flush_ms ミリ秒に一回。
+    その間に更新されたキーは、最新の値だけが送られる。
+    """
+    DEF_FLUSH_MS = 200
+    END_TIMEOUT = 3  # sec
+
+    def __init__(self, param_cl, flush_ms=DEF_FLUSH_MS, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('param_cl=%s, flush_ms=%s', param_cl, flush_ms)
+
+        self._param_cl = param_cl
+        self._flush_sec = flush_ms / 1000
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._active = False
+        self._th = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._log.debug('')
+        self._active = True
+        self._th.start()
+
+    def end(self):
+        self._log.debug('')
+        if not self._active:
+            return
+        self._active = False
+        self._event.set()
+        self._th.join(timeout=self.END_TIMEOUT)
+        self._param_cl.end()
+        self._log.debug('done')
+
+    def send_param(self, param):
+        self._log.debug('param=%s', param)
+
+        with self._lock:
+            self._pending.update(param)
+        self._event.set()
+
+    def flush(self):
+        with self._lock:
+            param, self._pending = self._pending, {}
+        if len(param) == 0:
+            return
+
+        try:
+            ret = self._param_cl.send_param(param)
+        except Exception as e:
+            self._log.error('%s:%s', type(e), e)
+            ret = False
+
+        if ret is False:
+            # 次の送信で送り直す (その間に更新されたキーは、新しい値)
+            with self._lock:
+                param.update(self._pending)
+                self._pending = param
+
+    def run(self):
+        self._log.debug('')
+
+        t_flush = 0
+        while self._active:
+            self._event.wait()
+
+            # 前回の送信から flush_ms 経つまで、まとめる
+            wait_sec = t_flush + self._flush_sec - time.monotonic()
+            if wait_sec > 0:
+                time.sleep(wait_sec)
+
+            self._event.clear()
+            self.flush()
+            t_flush = time.monotonic()
+
+        # 残りを送る
+        self.flush()
+        self._log.debug('done')
 
 
 class Aircon(IrSendCmdClient):
@@ -141,11 +323,12 @@ class Aircon(IrSendCmdClient):
     BUTTON_OFF = 'off'
 
     def __init__(self, dev=DEF_DEV, bhdr=DEF_BHDR, ir_host=DEF_IR_HOST,
-                 interval_min=INTERVAL_MIN, debug=False):
+                 interval_min=INTERVAL_MIN, ir_unix=None, debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
         self._log.debug('dev=%s, bhdr=%s, ir_host=%s, interval_min=%s',
                         dev, bhdr, ir_host, interval_min)
+        self._log.debug('ir_unix=%s', ir_unix)
 
         self._dev = dev
         self._bhdr = bhdr
@@ -155,12 +338,57 @@ class Aircon(IrSendCmdClient):
         self._interval_min_count = 0
         self._on = False
 
-        super().__init__(ir_host, debug=self._dbg)
+        super().__init__(ir_host, unix_path=ir_unix, debug=self._dbg)
 
     def on(self):
         self._log.debug('')
+        if self.load_state() is not None:
+            # 最後に送信した状態のまま .. 送信しない
+            self._on = True
+            return
         self.set_temp(self._rtemp, force=True)
 
+    def load_state(self):
+        """
+        IrSendCmdServer が保存している、最後に送信した状態(IrStateCache)
+        から、_rtemp を復元する。
+        復元できた場合は、再起動しても、on() で赤外線信号を送らない。
+        (IrSendCmdServer の --state_max_age より古い状態は、返ってこない)
+        手元のリモコンで操作された場合は、"on", "rtemp" コマンド
+        (ボタン名の先頭に "!" を付けて送信)で、再同期する。
+
+        Returns
+        -------
+        rtemp: int or None
+          None: 復元できなかった
+        """
+        try:
+            # send_recv() は、複数ボタンの結果をまとめるので、msg が残らない
+            ret = json.loads(self.send_recv_str(' '.join([
+                IrConst.IRSEND_CMD, IrConst.IRSEND_STATE, self._dev])))
+        except Exception as e:
+            self._log.warning('%s:%s', type(e), e)
+            return None
+        self._log.debug('ret=%s', ret)
+
+        ent = ret.get('msg')
+        if ret.get('rc') != IrConst.RC_OK or type(ent) != dict:
+            return None
+
+        button = ent.get('button', '')
+        if not button.startswith(self._bhdr):
+            return None
+        ts = ent.get('ts', 0)
+        try:
+            rtemp = int(button[len(self._bhdr):])
+        except ValueError:
+            return None
+
+        self._log.info('rtemp=%s <= %s', rtemp, ent)
+        self._rtemp = rtemp
+        self._ts_set_temp = ts
+        return rtemp
+
     def off(self):
         self._log.debug('')
         args = [self._dev, self.BUTTON_OFF]
@@ -178,8 +406,26 @@ class Aircon(IrSendCmdClient):
     def is_on(self):
         return self._on
 
-    def set_temp(self, rtemp, force=False):
-        self._log.debug('rtemp=%s', rtemp)
+    def direction(self):
+        """
+        Returns
+        -------
+        direction: int
+          1: 暖房、-1: 冷房、0: 不明 (ボタン名の先頭 _bhdr から判断)
+        """
+        if '_hot_' in self._bhdr:
+            return 1
+        if '_cool_' in self._bhdr:
+            return -1
+        return 0
+
+    def set_temp(self, rtemp, force=False, ts=None):
+        """
+        force: 同じ温度や、送信間隔の制限に関係なく送信する
+               (IrSendCmdServer の IrStateCache による省略もしない)
+        ts: 現在時刻 (None: time.time())
+        """
+        self._log.debug('rtemp=%s, ts=%s', rtemp, ts)
 
         if rtemp > self.RTEMP_MAX:
             rtemp = self.RTEMP_MAX
@@ -192,7 +438,9 @@ class Aircon(IrSendCmdClient):
             self._log.info('rtemp==_rtemp=%s .. ignored', self._rtemp)
             return None
 
-        ts_now = time.time()
+        ts_now = ts
+        if ts_now is None:
+            ts_now = time.time()
         interval = ts_now - self._ts_set_temp
         if not force \
            and interval < self._interval_min \
@@ -209,6 +457,8 @@ class Aircon(IrSendCmdClient):
         self._interval_min_count = 0
 
         button = self._bhdr + '%02d' % rtemp
+        if force:
+            button = IrStateCache.FORCE_PREFIX + button
         args = [self._dev, button]
         self._log.debug('args=%s', args)
 
@@ -229,32 +479,119 @@ class Aircon(IrSendCmdClient):
 
 class TempHist:
     """
-    _val := [{'temp': temp1, 'ts': ts1}, {'temp': temp2, 'ts': ts2}, .. ]
+    直近 hist_sec 秒間の温度履歴
+
+    _val := deque([{'temp': temp1, 'ts': ts1}, {'temp': temp2, 'ts': ts2}, ..])
+
+    追加・削除のたびに、合計(_sum)と、台形近似の面積(_area)と、
+    最小二乗法のための合計(_st, _stt, _sty)を更新するので、
+    ave(), tw_ave(), slope(), get(0), get(-1) は、履歴の長さによらず O(1)。
+
+    _st, _stt, _sty の時刻は、桁落ちを避けるため、_ts0 からの相対値。
     """
     DEF_HIST_SEC = 60  # sec
 
-    def __init__(self, val=[], hist_sec=DEF_HIST_SEC, debug=False):
+    RESUM_N = 1000  # 丸め誤差が溜まらないように、時々、合計を計算し直す
+
+    def __init__(self, val=None, hist_sec=DEF_HIST_SEC, debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
         self._log.debug('val=%s, hist_sec=%s', val, hist_sec)
 
-        self._val = val
+        self._val = collections.deque()
         self._hist_sec = hist_sec
 
+        self._sum = 0.0   # temp の合計
+        self._area = 0.0  # 温度 x 時間 (台形近似)
+        self._ts0 = None  # 最小二乗法の時刻の基準
+        self._st = 0.0    # t の合計
+        self._stt = 0.0   # t * t の合計
+        self._sty = 0.0   # t * temp の合計
+        self._add_n = 0
+
         self._i = 0
 
-    def add(self, temp, ts):
-        self._log.debug('val=%s', temp)
+        for v in val or []:
+            self.add(v['temp'], v['ts'])
 
+    def add(self, temp, ts):
+        if self._val:
+            v_last = self._val[-1]
+            self._area += (v_last['temp'] + temp) * (ts - v_last['ts']) / 2
+        else:
+            self._ts0 = ts
         self._val.append({'temp': temp, 'ts': ts})
+        self._sum += temp
+        t = ts - self._ts0
+        self._st += t
+        self._stt += t * t
+        self._sty += t * temp
 
         while ts - self._val[0]['ts'] > self._hist_sec and len(self._val) >= 2:
-            v = self._val.pop(0)
-            self._log.debug('  remove: %s', v)
+            v = self._val.popleft()
+            v0 = self._val[0]
+            self._sum -= v['temp']
+            self._area -= (v['temp'] + v0['temp']) * (v0['ts'] - v['ts']) / 2
+            t = v['ts'] - self._ts0
+            self._st -= t
+            self._stt -= t * t
+            self._sty -= t * v['temp']
+
+        self._add_n += 1
+        if self._add_n >= self.RESUM_N:
+            self.resum()
+
+        self._log.debug('temp=%s, ts=%s, len=%d', temp, ts, len(self._val))
+        return self._val
 
+    def add_many(self, samples):
+        """
+        複数のサンプルを、まとめて追加
+
+        Parameters
+        ----------
+        samples: [(temp, ts), ..]
+          時刻順で、最後のサンプルより新しいもの
+
+        Returns
+        -------
+        (area, d_ts): (float, float)
+          追加前の最後のサンプルから、追加した最後のサンプルまでの
+          台形近似の面積と期間 (I項の積分用)
+        """
+        area = 0.0
+        d_ts = 0.0
+        v_last = self._val[-1] if self._val else None
+        for temp, ts in samples:
+            if v_last is not None:
+                area += (v_last['temp'] + temp) * (ts - v_last['ts']) / 2
+                d_ts += ts - v_last['ts']
+            self.add(temp, ts)
+            v_last = self._val[-1]
+        return (area, d_ts)
+
+    def resum(self):
+        """
+        合計と面積を、最初から計算し直す (時刻の基準も更新)
+        """
+        self._sum = 0.0
+        self._area = 0.0
+        self._ts0 = self._val[0]['ts']
+        self._st = 0.0
+        self._stt = 0.0
+        self._sty = 0.0
+        v_prev = None
         for v in self._val:
-            self._log.debug('  %s', v)
-        return self._val
+            self._sum += v['temp']
+            t = v['ts'] - self._ts0
+            self._st += t
+            self._stt += t * t
+            self._sty += t * v['temp']
+            if v_prev is not None:
+                self._area += (v_prev['temp'] + v['temp']) * (
+                    v['ts'] - v_prev['ts']) / 2
+            v_prev = v
+        self._add_n = 0
 
     def len(self):
         return len(self._val)
@@ -263,31 +600,374 @@ class TempHist:
         return self._val[idx]
 
     def ave(self):
-        temp_sum = 0.0
-        temp_n = 0
-        for v in self._val:
-            temp_sum += v['temp']
-            temp_n += 1
-        temp_ave = temp_sum / temp_n
+        """
+        単純平均
+        """
+        temp_ave = self._sum / len(self._val)
         self._log.debug('temp_ave=%.2f', temp_ave)
         return temp_ave
 
+    def tw_ave(self):
+        """
+        時間加重平均 (サンプルの間隔が不均一でも、偏らない)
+
+        期間が 0 の場合(サンプルが一つ、または、同じ時刻)は、単純平均
+        """
+        d_ts = self._val[-1]['ts'] - self._val[0]['ts']
+        if d_ts <= 0:
+            return self.ave()
+        temp_ave = self._area / d_ts
+        self._log.debug('temp_ave=%.2f', temp_ave)
+        return temp_ave
+
+    def slope(self):
+        """
+        最小二乗法(回帰直線)による、温度の傾き [度/sec]
+
+        最初と最後のサンプルだけで計算するより、ノイズの影響が小さい。
+        期間が 0 の場合は None
+        """
+        n = len(self._val)
+        if n < 2 or self._val[-1]['ts'] == self._val[0]['ts']:
+            return None
+
+        st_n = self._st / n
+        var = self._stt - self._st * st_n
+        if var <= 0:
+            return None
+        slope = (self._sty - st_n * self._sum) / var
+        self._log.debug('slope=%.6f', slope)
+        return slope
+
+
+class AutoAirconZone:
+    """
+    一つのゾーン(部屋)の自動エアコン制御
+
+    ゾーンごとに、温度センサーのトピック、Aircon、PIDパラメータ、
+    温度履歴、PIDの状態を持つ。
+    MQTT の接続、Node-RED への通知(ParamPublisher)、コマンドのポートは、
+    AutoAirconCmd の全てのゾーンで共有する。
+
+    Node-RED に通知するキーには、prefix を付ける
+    (デフォルトのゾーンは '' .. 以前と同じキー)。
+    """
+    COEFF_P = 1.0
+    COEFF_I = 0.01
+    COEFF_D = 100
+
+    TEMP_HIST_SEC = 45  # P項の温度履歴の期間 [sec]
+
+    def __init__(self, name, ttemp, topic, aircon, pp, param_cl, prefix='',
+                 debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('name=%s, ttemp=%s, topic=%s, prefix=%a',
+                        name, ttemp, topic, prefix)
+
+        self.name = name
+        self.topic = topic
+
+        self._ttemp = ttemp
+        self._rtemp = round(self._ttemp)
+        self._temp = self._ttemp
+        self._i = 0
+        self._prev_i = 0
+        self._i_area = 0.0  # i(): 最後に追加したサンプルの区間の面積
+        self._i_d_ts = 0.0  # i(): 同、期間
+        self._ts_last = None  # 最後に処理したサンプルの時刻
+
+        self._aircon = aircon
+        self._pp = pp
+        self._param_cl = param_cl
+        self._prefix = prefix
+
+        self._temp_hist = TempHist(hist_sec=self.TEMP_HIST_SEC,
+                                   debug=self._dbg)
+        # D項(d_method='lsq')用: P項より長い期間で、回帰直線の傾きを求める
+        self._d_hist = TempHist(
+            hist_sec=self.param('d_hist_sec',
+                                PIDParam.DEF_PARAM['d_hist_sec']),
+            debug=self._dbg)
+
+        # スケジュール(AutoAirconSched)用: 部屋の時定数の推定
+        #   PIDパラメータのファイルのキー: <prefix>room_tau (param())
+        self._tau = RoomTau(self.param('room_tau', RoomTau.DEF_TAU),
+                            debug=self._dbg)
+        self._sched = None
+
+    def param(self, key, default=None):
+        """
+        このゾーンの PIDパラメータ
+
+        PIDパラメータのファイルのキー <prefix><key> (例: zone2.kp)、
+        なければ <key> (デフォルトのゾーンと同じ値)
+        """
+        return self._pp.param.get(self._prefix + key,
+                                  self._pp.param.get(key, default))
+
+    def set_param(self, key, val):
+        """
+        このゾーンの PIDパラメータを、<prefix><key> に保存
+        (ファイルを共有する他のゾーンの値は変えない)
+        """
+        self._pp.save_param({self._prefix + key: val})
+
+    def send_param(self, param):
+        """
+        Node-RED への通知 (キーに prefix を付ける)
+        """
+        if self._prefix:
+            param = {self._prefix + k: v for k, v in param.items()}
+        self._param_cl.send_param(param)
+
+    def state(self):
+        """
+        Node-RED に通知する状態
+        """
+        return {
+            'active': self._aircon.is_on(),
+            'ttemp': self._ttemp,
+            'rtemp': self._rtemp,
+            'temp': self._temp,
+            'kp': self.param('kp'),
+            'ki': self.param('ki'),
+            'kd': self.param('kd'),
+            'interval_min': self._aircon._interval_min
+        }
+
+    def add_temps(self, samples):
+        """
+        温度履歴に追加
+
+        Parameters
+        ----------
+        samples: [(temp, ts), ..]
+          時刻順で、_ts_last より新しいもの
+        """
+        (self._i_area, self._i_d_ts) = self._temp_hist.add_many(samples)
+        self._d_hist.add_many(samples)
+        self._ts_last = samples[-1][1]
+
+    def on_temps(self, samples):
+        """
+        温度を受信したときの処理
+
+        まとめて受信したサンプル(再接続後など)は、
+        温度履歴とI項の積分に全て反映し、PID制御は一回だけ行う。
+
+        Parameters
+        ----------
+        samples: [(temp, ts), ..]
+          時刻順、時刻の重複なし
+          (既に処理した時刻より古いサンプルは、捨てる)
+        """
+        if self._ts_last is not None:
+            n = len(samples)
+            samples = [s for s in samples if s[1] > self._ts_last]
+            if len(samples) < n:
+                self._log.warning('%s: %d old samples .. ignored',
+                                  self.name, n - len(samples))
+        if not samples:
+            return
+
+        self._log.info('%s: temp=%.3f, ts=%s (%d samples)',
+                       self.name, samples[-1][0], samples[-1][1], len(samples))
+        samples = [(float('%.2f' % temp), ts) for temp, ts in samples]
+        self._temp = samples[-1][0]
+
+        # 温度履歴に追加
+        self.add_temps(samples)
+
+        # パラメータの値を Node-RED に通知
+        self.send_param(self.state())
+
+        # エアコンのON/OFFチェック
+        if not self._aircon.is_on():
+            self._log.info('%s: _aircon is off .. do nothing', self.name)
+            return
+
+        # 部屋の時定数の推定
+        self._tau.update(self._temp, self._ttemp, self._d_hist.slope())
+
+        # PID制御の計算
+        pid = self.pid()
+        if type(pid) == float:
+            pid = round(pid, 2)
+        self._log.debug('pid=%s', pid)
+        if pid is None:
+            return
+
+        # エアコンの温度設定
+        #   温度設定に関する制限事項(最大値、最低値、頻度など)に
+        #   関する処理は、_airconオブジェクト内で判断・処理され、
+        #   実際に設定された温度が返される。
+        rtemp = round(self._ttemp + pid)
+        self._log.debug('rtemp=%d', rtemp)
+
+        rtemp = self._aircon.set_temp(rtemp)
+        self._log.debug('rtemp=%s', rtemp)
+        if rtemp is not None:
+            self._rtemp = rtemp
+            self.send_param({'rtemp': self._rtemp})
+
+    def set_ttemp(self, ttemp):
+        self._log.debug('%s: ttemp=%s', self.name, ttemp)
+
+        self._i /= 2
+        self._ttemp = ttemp
+        self.send_param({'ttemp': self._ttemp})
+
+    def check_sched(self, now):
+        """
+        スケジュールの目標温度の時刻(の、リード時間前)なら、ttemp を変える
+        """
+        if self._sched is None:
+            return
+
+        ttemp = self._sched.check(now, self._temp, self._tau)
+        if ttemp is not None:
+            self.set_ttemp(ttemp)
+
+    def save_tau(self):
+        """
+        推定した時定数を、PIDパラメータのファイルに保存 (次回の初期値)
+        """
+        if self._tau.n == 0:
+            return
+
+        self.set_param('room_tau', round(self._tau.tau))
+
+    #
+    # PID
+    #
+    def pid(self):
+        self._log.debug('')
+
+        p_ = self.p()
+        i_ = self.i()
+        d_ = self.d()
+        self._log.debug('(p_, i_, d_)=(%s, %s, %s)', p_, i_, d_)
+        if None in (p_, i_, d_):
+            return None
+
+        kp_p = -self.param('kp') * p_
+
+        ki_i = -self.param('ki') * i_
+        if abs(ki_i) > self.param('ki_i_max'):
+            self._log.warning('abs(ki_i)=%.1f > %.1f',
+                              abs(ki_i), self.param('ki_i_max'))
+            ki_i = ki_i / abs(ki_i) * self.param('ki_i_max')
+            self._i = self._prev_i
+            """
+            ki_i = 0
+            self._i = 0
+            """
+            self._log.warning('ki_i=%.1f, self._i=%.1f ', ki_i, self._i)
+
+        kd_d = -self.param('kd') * d_
+
+        # 極端な温度変更を避けるため
+        KPD_MAX = 3
+        kpd = kp_p + kd_d
+        kpd = max(min(kpd, KPD_MAX), -KPD_MAX)
+
+        # pid = kp_p + ki_i + kd_d
+        pid = ki_i + kpd
+        self._log.info('pid=%.2f <= (kp_p,ki_i,kd_d,kpd)=(%.2f,%.2f,%.2f,%.2f)',
+                       pid, kp_p, ki_i, kd_d, kpd)
+
+        self.send_param({
+            'pid': pid,
+            'kp_p': kp_p,
+            'ki_i': ki_i,
+            'kd_d': kd_d,
+            'kp': self.param('kp'),
+            'ki': self.param('ki'),
+            'kd': self.param('kd'),
+        })
+        return pid
+
+    def p(self):
+        p_ = self._temp_hist.ave() - self._ttemp
+        p_ = p_ * self.COEFF_P
+        self._log.debug('p_=%.2f', p_)
+        return p_
+
+    def i(self):
+        if self._temp_hist.len() < 2:
+            self._log.debug('None')
+            return None
+
+        # 最後に追加したサンプルの区間(複数のサンプルの場合も)の台形近似
+        d_i = self._i_area - self._ttemp * self._i_d_ts
+        self._prev_i = self._i
+        self._i += d_i * self.COEFF_I
+        self._log.debug('_i=%s, _prev_i=%s', self._i, self._prev_i)
+        return self._i
+
+    def d(self):
+        """
+        温度の傾き
+
+        PIDParam の 'd_method'
+          'lsq':  直近 'd_hist_sec' 秒間の回帰直線の傾き (デフォルト)
+                  一つのサンプルのノイズで、D項が大きく振れない
+          'ends': P項の温度履歴の最初と最後のサンプルから計算 (以前の方法)
+        """
+        if self._temp_hist.len() < 2:
+            self._log.debug('None')
+            return None
+
+        if self.param('d_method', 'lsq') != 'ends':
+            slope = self._d_hist.slope()
+            if slope is None:
+                self._log.debug('None')
+                return None
+            d_ = slope * self.COEFF_D
+            self._log.debug('d_=%.4f', d_)
+            return d_
+
+        v_cur = self._temp_hist.get(-1)
+        v0 = self._temp_hist.get(0)
+
+        d_temp = v_cur['temp'] - v0['temp']
+        d_ts = v_cur['ts'] - v0['ts']
+        if d_ts == 0.0:
+            self._log.debug('None')
+            return None
+        d_ = d_temp / d_ts * self.COEFF_D
+        self._log.debug('d_=%.4f', d_)
+        return d_
+
 
 class AutoAirconCmd(Cmd):
     """
+    複数のゾーン(AutoAirconZone)の自動エアコン制御
+
+    ゾーン:
+      デフォルトのゾーン(DEF_ZONE): [temp], [aircon] セクション
+      追加のゾーン:                 [zone.<name>] セクション
+
+    コマンドの最初の引数がゾーン名の場合は、そのゾーン
+    (例: "ttemp zone2 24")、それ以外はデフォルトのゾーン。
     """
     CONF_FILENAME = ['autoaircon.conf', '.autoaircon.conf', '.autoaircon']
     CONF_PATH = ['.', os.environ['HOME'], '/etc']
 
-    DEF_PORT = 51002
+    DEF_PORT = IrConst.AUTOAIRCON_PORT
 
     DEF_TTEMP = 26
 
+    DEF_ZONE = 'main'
+    ZONE_SECTION = 'zone.'
+    SCHED_SECTION = 'schedule'
+
     TEMP_END = 0
 
-    COEFF_P = 1.0
-    COEFF_I = 0.01
-    COEFF_D = 100
+    TEMPQ_TIMEOUT = 5  # _tempq.get() のタイムアウト [sec] (_active のチェック)
+    RECV_BACKOFF = 1  # recv_data() が None の場合の待ち時間 [sec]
+    BATCH_MAX = 500  # _tempq から一度に取り出す最大数
 
     def __init__(self, init_param={'ttemp': DEF_TTEMP}, port=DEF_PORT,
                  debug=False):
@@ -303,6 +983,8 @@ class AutoAirconCmd(Cmd):
         self._mqtt_svr = init_param['mqtt_svr']
 
         # コマンド追加
+        self.add_cmd('zones', None, self.cmd_q_zones, 'list zones')
+
         self.add_cmd('on', None, self.cmd_q_on, 'Auto control ON')
         self.add_cmd('off', None, self.cmd_q_off, 'Auto control OFF')
 
@@ -318,6 +1000,9 @@ class AutoAirconCmd(Cmd):
         self.add_cmd('interval_min', None, self.cmd_q_interval_min,
                      'interval_min')
 
+        self.add_cmd('sched', None, self.cmd_q_sched,
+                     'next scheduled ttemp and room time constant')
+
         # サーバー独自の設定
         cfg, self._conf_file = self.load_conf()
         if cfg is None:
@@ -330,31 +1015,102 @@ class AutoAirconCmd(Cmd):
         self._log.debug('_port=%d', self._port)
 
         if 'ttemp' in init_param:
-            self._ttemp = float(init_param['ttemp'])
+            ttemp = float(init_param['ttemp'])
         else:
-            self._ttemp = self.DEF_TTEMP
-        self._log.debug('_ttemp=%s', self._ttemp)
+            ttemp = self.DEF_TTEMP
+        self._log.debug('ttemp=%s', ttemp)
 
         ir_host = cfg.get('ir', 'host')
-        aircon_dev = cfg.get('aircon', 'dev_name')
-        aircon_bhdr = cfg.get('aircon', 'button_header')
-        aircon_interval_min = cfg.getfloat('aircon', 'interval_min')
+        # IrSendCmdServer が同じホストなら、Unix domain socket で接続
+        ir_unix = ''
+        if ir_host in ['localhost', '127.0.0.1']:
+            ir_unix = IrConst.IRSEND_SOCK
+        ir_unix = cfg.get('ir', 'unix', fallback=ir_unix)
         param_host = cfg.get('param', 'host')
         param_port = cfg.getint('param', 'port')
+        param_flush_ms = cfg.getfloat('param', 'flush_ms',
+                                      fallback=ParamPublisher.DEF_FLUSH_MS)
 
-        self._temp_topic = cfg.get('temp', 'topic')
         self._temp_token = cfg.get('temp', 'token')
-        self._log.debug('_temp_topic=%s, _temp_token=%s',
-                        self._temp_topic, self._temp_token)
-        self._i = 0
-        self._prev_i = 0
-
-        self._rtemp = round(self._ttemp)
-        self._temp = self._ttemp
-
-        self._pp = PIDParam(debug=self._dbg)
-        self._log.debug('_pp.param=%s', self._pp.param)
+        self._log.debug('_temp_token=%s', self._temp_token)
+
+        # 全てのゾーンで共有
+        self._param_cl = ParamPublisher(
+            ParamClient(param_host, param_port, debug=self._dbg),
+            param_flush_ms, debug=self._dbg)
+
+        # ゾーン
+        self._zone = collections.OrderedDict()
+        # 同じファイルのゾーンは、同じ PIDParam (キーは、ゾーンの prefix で区別)
+        pp_by_file = {}
+        zone_sec = [('temp', 'aircon', self.DEF_ZONE, '')]
+        for s in cfg.sections():
+            if s.startswith(self.ZONE_SECTION):
+                name = s[len(self.ZONE_SECTION):]
+                zone_sec.append((s, s, name, name + '.'))
+
+        for temp_sec, aircon_sec, name, prefix in zone_sec:
+            topic = cfg.get(temp_sec, 'topic')
+            aircon_dev = cfg.get(aircon_sec, 'dev_name')
+            # 追加のゾーンで省略した値は、デフォルトのゾーンと同じ
+            aircon_bhdr = cfg.get(aircon_sec, 'button_header',
+                                  fallback=cfg.get('aircon', 'button_header'))
+            aircon_interval_min = cfg.getfloat(
+                aircon_sec, 'interval_min',
+                fallback=cfg.getfloat('aircon', 'interval_min'))
+            zone_ttemp = ttemp
+            if name != self.DEF_ZONE:
+                zone_ttemp = cfg.getfloat(temp_sec, 'ttemp', fallback=ttemp)
+
+            param_file = cfg.get(aircon_sec, 'param_file', fallback=None)
+            pp = PIDParam(dict(PIDParam.DEF_PARAM), param_file,
+                          debug=self._dbg)
+            pp = pp_by_file.setdefault(pp._param_file, pp)
+            self._log.debug('%s: pp.param=%s', name, pp.param)
+            # PIDパラメータのファイル(AutoAirconTune.py)の値を優先
+            # (0: 設定ファイル)
+            pp_interval_min = pp.param.get(prefix + 'interval_min',
+                                           pp.param.get('interval_min', 0))
+            if pp_interval_min > 0:
+                aircon_interval_min = float(pp_interval_min)
+            self._log.debug('%s: aircon_interval_min=%s',
+                            name, aircon_interval_min)
+
+            aircon = Aircon(aircon_dev, aircon_bhdr, ir_host,
+                            aircon_interval_min, ir_unix,
+                            debug=self._dbg)
+
+            if name in self._zone or topic in [
+                    z.topic for z in self._zone.values()]:
+                raise RuntimeError('%s: duplicated zone or topic' % name)
+            self._zone[name] = AutoAirconZone(name, zone_ttemp, topic,
+                                              aircon, pp, self._param_cl,
+                                              prefix, debug=self._dbg)
+        self._log.debug('_zone=%s', list(self._zone.keys()))
+
+        self._zone_by_topic = {z.topic: z for z in self._zone.values()}
+
+        # スケジュール: [schedule], [schedule.<name>]
+        for s in cfg.sections():
+            if s == self.SCHED_SECTION:
+                name = self.DEF_ZONE
+            elif s.startswith(self.SCHED_SECTION + '.'):
+                name = s[len(self.SCHED_SECTION) + 1:]
+            else:
+                continue
 
+            if name not in self._zone:
+                raise RuntimeError('[%s]: no such zone' % s)
+            try:
+                z = self._zone[name]
+                z._sched = AutoAirconSched(
+                    dict(cfg[s]), direction=z._aircon.direction(),
+                    debug=self._dbg)
+            except ValueError as e:
+                raise RuntimeError('[%s]: %s' % (s, e))
+        topics = list(self._zone_by_topic.keys())
+
+        # MQTT の接続は、一つ
         '''
         self._mqtt = BeebotteSubscriber(self.cb_mqtt,
                                        [ self._temp_topic ], self._temp_token,
@@ -362,131 +1118,162 @@ class AutoAirconCmd(Cmd):
         '''
         if self._mqtt_svr == '':
             self._mqtt = BeebotteSubscriber(BeebotteSubscriber.CB_QPUT,
-                                            [ self._temp_topic ],
+                                            topics,
                                             self._temp_token,
                                             debug=self._dbg)
         else:
             self._mqtt = MqttSubscriber(MqttSubscriber.CB_QPUT,
-                                        [ self._temp_topic ], self._temp_token,
+                                        topics, self._temp_token,
                                         host=self._mqtt_svr,
                                         debug=self._dbg)
         self._tempq = queue.Queue()
 
-        self._aircon = Aircon(aircon_dev, aircon_bhdr, ir_host,
-                              aircon_interval_min,
-                              debug=self._dbg)
-
-        self._temp_hist = TempHist(hist_sec=45, debug=self._dbg)
-
-        self._param_cl = ParamClient(param_host, param_port, debug=self._dbg)
+        self._recv_th = threading.Thread(target=self.recv_mqtt, daemon=True)
 
         # 最後に super()__init__()
         super().__init__(port=self._port, debug=self._dbg)
 
     def main(self):
         """
+        イベント駆動のメインループ
+
+        MQTTの温度は、recv_mqtt() スレッドが _tempq に入れる。
+        _tempq に溜まっているサンプルは、まとめて取り出して(on_batch())、
+        ゾーンごとに一回だけ PID制御を行う。
+        Node-RED への通知は、_param_cl (ParamPublisher)が非同期に行う。
         """
         self._log.debug('')
 
         self._mqtt.start()
+        self._param_cl.start()
+        self._recv_th.start()
 
-        self._aircon.on()
-
-        self._param_cl.send_param({
-            'active': self._aircon.is_on(),
-            'ttemp': self._ttemp,
-            'rtemp': self._rtemp,
-            'temp': self._temp,
-            'kp': self._pp.param['kp'],
-            'ki': self._pp.param['ki'],
-            'kd': self._pp.param['kd'],
-            'interval_min': self._aircon._interval_min
-        })
+        for z in self._zone.values():
+            z._aircon.on()
+            z.send_param(z.state())
 
         while self._active:
-            # シャットダウン チェック
-            if not self._active:
+            try:
+                ret = self._tempq.get(timeout=self.TEMPQ_TIMEOUT)
+            except queue.Empty:
+                self.check_sched()
+                continue
+
+            batch = []
+            while ret is not None:
+                batch.append(ret)
+                if len(batch) >= self.BATCH_MAX:
+                    break
+                try:
+                    ret = self._tempq.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self.on_batch(batch)
+
+            if ret is None:
                 self._log.info('_active=%s .. shutdown', self._active)
                 break
 
-            # BeebotteからMQTTで温度を取得
+            self.check_sched()
+
+        self._active = False
+        self._log.debug('done')
+
+    def recv_mqtt(self):
+        """
+        スレッド: MQTTで温度を受信して、_tempq に入れる
+        """
+        self._log.debug('')
+
+        while self._active:
             ret = self._mqtt.recv_data()
             if ret is None:
+                # 受信できない場合に、空回りしない
+                time.sleep(self.RECV_BACKOFF)
                 continue
 
-            self._log.info('ret=%s', ret)
-            
-            (self._temp, topic, ts_msec) = ret
+            self._tempq.put(ret)
 
-            if self._mqtt_svr == '':
-                ts = ts_msec / 1000
-            else:
-                ts = ts_msec
-
-            self._log.info('_temp=%.3f, ts=%s',
-                           self._temp, ts)
-            self._temp = float('%.2f' % self._temp)
-
-            # 温度履歴に追加
-            self._temp_hist.add(self._temp, ts)
-
-            # パラメータの値を Node-RED に通知
-            self._param_cl.send_param({
-                'active': self._aircon.is_on(),
-                'ttemp': self._ttemp,
-                'rtemp': self._rtemp,
-                'temp': self._temp,
-                'kp': self._pp.param['kp'],
-                'ki': self._pp.param['ki'],
-                'kd': self._pp.param['kd'],
-                'interval_min': self._aircon._interval_min
-            })
-
-            # エアコンのON/OFFチェック
-            if not self._aircon.is_on():
-                self._log.info('_aircon is off .. do nothing')
-                continue
+        self._log.debug('done')
 
-            # PID制御の計算
-            pid = self.pid()
-            if type(pid) == float:
-                pid = round(pid, 2)
-            self._log.debug('pid=%s', pid)
-            if pid is None:
-                continue
+    def ts_sec(self, ts):
+        """
+        recv_data() の時刻を秒にする (Beebotte はミリ秒)
+        """
+        if self._mqtt_svr == '':
+            return ts / 1000
+        return ts
 
-            # エアコンの温度設定
-            #   温度設定に関する制限事項(最大値、最低値、頻度など)に
-            #   関する処理は、_airconオブジェクト内で判断・処理され、
-            #   実際に設定された温度が返される。
-            rtemp = round(self._ttemp + pid)
-            self._log.debug('rtemp=%d', rtemp)
+    def on_batch(self, batch):
+        """
+        まとめて受信した温度の処理
 
-            rtemp = self._aircon.set_temp(rtemp)
-            self._log.debug('rtemp=%s', rtemp)
-            if rtemp is not None:
-                self._rtemp = rtemp
-                self._param_cl.send_param({'rtemp': self._rtemp})
+        ゾーンごとに、時刻順に並べ、同じ時刻のサンプルは最後に受信したもの
+        だけにして、AutoAirconZone.on_temps() に渡す。
+        (再接続後に、順番が入れ替わったり、重複したりしたサンプルで、
+        I項の積分が狂わないように)
 
-        self._active = False
-        self._log.debug('done')
+        Parameters
+        ----------
+        batch: [(temp, topic, ts), ..]
+          recv_data() の戻り値のリスト
+        """
+        self._log.debug('batch=%s', batch)
+
+        samples = {}  # {zone_name: {ts: temp}}
+        for temp, topic, ts in batch:
+            zone = self._zone_by_topic.get(topic)
+            if zone is None:
+                self._log.warning('%s: unknown topic .. ignored', topic)
+                continue
+            samples.setdefault(zone.name, {})[self.ts_sec(ts)] = temp
+
+        for name, s in samples.items():
+            self._zone[name].on_temps([(s[ts], ts) for ts in sorted(s)])
+
+    def check_sched(self):
+        now = time.time()
+        for z in self._zone.values():
+            z.check_sched(now)
 
     def end(self):
         self._log.debug('')
         self._mqtt.end()
         if self._active:
             self.stop_main()
+        for z in self._zone.values():
+            z.save_tau()
+        self._param_cl.end()
         super().end()
         self._log.debug('done')
 
     def stop_main(self):
         self._log.debug('')
         self._active = False
-        # self._mqtt.publish(self._temp_topic, self._temp)
-        self._mqtt.send_data(self._temp, [ self._temp_topic ])
+        # main() を起こす
+        self._tempq.put(None)
+        # recv_mqtt() の recv_data() を起こす
+        zone = self._zone[self.DEF_ZONE]
+        # self._mqtt.publish(zone.topic, zone._temp)
+        self._mqtt.send_data(zone._temp, [ zone.topic ])
         super().stop_main()
         self._log.debug('done')
 
+    def zone_args(self, args):
+        """
+        コマンドの引数から、ゾーンを取り出す
+
+        Returns
+        -------
+        (zone, args): (AutoAirconZone, list)
+          args: ゾーン名を除いた引数
+        """
+        if len(args) >= 2 and args[1] in self._zone:
+            return self._zone[args[1]], [args[0]] + args[2:]
+        return self._zone[self.DEF_ZONE], args
+
     #
     # config file
     #
@@ -534,211 +1321,112 @@ class AutoAirconCmd(Cmd):
         return cfg, conf_file
 
     #
-    # PID
+    # cmd funcs
     #
-    def pid(self):
-        self._log.debug('')
-
-        p_ = self.p()
-        i_ = self.i()
-        d_ = self.d()
-        self._log.debug('(p_, i_, d_)=(%s, %s, %s)', p_, i_, d_)
-        if None in (p_, i_, d_):
-            return None
-
-        kp_p = -self._pp.param['kp'] * p_
-
-        ki_i = -self._pp.param['ki'] * i_
-        if abs(ki_i) > self._pp.param['ki_i_max']:
-            self._log.warning('abs(ki_i)=%.1f > %.1f',
-                              abs(ki_i), self._pp.param['ki_i_max'])
-            ki_i = ki_i / abs(ki_i) * self._pp.param['ki_i_max']
-            self._i = self._prev_i
-            """
-            ki_i = 0
-            self._i = 0
-            """
-            self._log.warning('ki_i=%.1f, self._i=%.1f ', ki_i, self._i)
-
-        kd_d = -self._pp.param['kd'] * d_
-
-        # 極端な温度変更を避けるため
-        KPD_MAX = 3
-        kpd = kp_p + kd_d
-        kpd = max(min(kpd, KPD_MAX), -KPD_MAX)
-
-        # pid = kp_p + ki_i + kd_d
-        pid = ki_i + kpd
-        self._log.info('pid=%.2f <= (kp_p,ki_i,kd_d,kpd)=(%.2f,%.2f,%.2f,%.2f)',
-                       pid, kp_p, ki_i, kd_d, kpd)
-
-        self._param_cl.send_param({
-            'pid': pid,
-            'kp_p': kp_p,
-            'ki_i': ki_i,
-            'kd_d': kd_d,
-            'kp': self._pp.param['kp'],
-            'ki': self._pp.param['ki'],
-            'kd': self._pp.param['kd'],
-        })
-        return pid
-
-    def p(self):
-        p_ = self._temp_hist.ave() - self._ttemp
-        p_ = p_ * self.COEFF_P
-        self._log.debug('p_=%.2f', p_)
-        return p_
-
-    def i(self):
-        if self._temp_hist.len() < 2:
-            self._log.debug('None')
-            return None
-
-        v_cur = self._temp_hist.get(-1)
-        v_prev = self._temp_hist.get(-2)
-
-        d_ts = v_cur['ts'] - v_prev['ts']
-        d_i = (v_cur['temp'] + v_prev['temp']) * d_ts / 2 - self._ttemp * d_ts
-        self._prev_i = self._i
-        self._i += d_i * self.COEFF_I
-        self._log.debug('_i=%s, _prev_i=%s', self._i, self._prev_i)
-        return self._i
-
-    def d(self):
-        if self._temp_hist.len() < 2:
-            self._log.debug('None')
-            return None
-
-        v_cur = self._temp_hist.get(-1)
-        v0 = self._temp_hist.get(0)
+    def cmd_q_zones(self, args):
+        self._log.debug('args=%a', args)
 
-        d_temp = v_cur['temp'] - v0['temp']
-        d_ts = v_cur['ts'] - v0['ts']
-        if d_ts == 0.0:
-            self._log.debug('None')
-            return None
-        d_ = d_temp / d_ts * self.COEFF_D
-        self._log.debug('d_=%.4f', d_)
-        return d_
+        return self.RC_OK, {name: z.state() for name, z in self._zone.items()}
 
-    #
-    # cmd funcs
-    #
     def cmd_q_on(self, args):
         self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
-        self._rtemp = round(self._ttemp)
-        self._i = 0
+        z._rtemp = round(z._ttemp)
+        z._i = 0
 
-        self._param_cl.send_param({
-            'active': self._aircon.is_on(),
-            'rtemp': self._rtemp
+        z.send_param({
+            'active': z._aircon.is_on(),
+            'rtemp': z._rtemp
         })
 
-        rtemp = self._aircon.set_temp(self._rtemp, force=True)
+        rtemp = z._aircon.set_temp(z._rtemp, force=True)
         if rtemp is not None:
-            self._rtemp = rtemp
+            z._rtemp = rtemp
 
-        self._param_cl.send_param({
-            'active': self._aircon.is_on(),
-            'rtemp': self._rtemp
+        z.send_param({
+            'active': z._aircon.is_on(),
+            'rtemp': z._rtemp
         })
         return self.RC_OK, None
 
     def cmd_q_off(self, args):
         self._log.debug('args=%a', args)
-        self._aircon.off()
-        self._param_cl.send_param({'active': self._aircon.is_on()})
+        z, args = self.zone_args(args)
+
+        z._aircon.off()
+        z.send_param({'active': z._aircon.is_on()})
         return self.RC_OK, None
 
-    def cmd_q_kp(self, args):
-        self._log.debug('args=%a', args)
+    def cmd_q_k(self, args, key):
+        """
+        kp, ki, kd
+        """
+        self._log.debug('args=%a, key=%s', args, key)
+        z, args = self.zone_args(args)
 
         if len(args) == 1:
-            return self.RC_OK, self._pp.param['kp']
+            return self.RC_OK, z.param(key)
 
+        if key == 'ki':
+            z._i = 0
         try:
-            self._pp.param['kp'] = float(args[1])
-            self._pp.save()
-            self._param_cl.send_param({'kp': self._pp.param['kp']})
+            z.set_param(key, float(args[1]))
+            z.send_param({key: z.param(key)})
         except Exception as e:
             msg = '%s:%s' % (type(e), e)
             self._log.error(msg)
             return self.RC_NG, msg
 
-        return self.cmd_q_kp([''])
-
-    def cmd_q_ki(self, args):
-        self._log.debug('args=%a', args)
-
-        if len(args) == 1:
-            return self.RC_OK, self._pp.param['ki']
+        return self.RC_OK, z.param(key)
 
-        self._i = 0
-        try:
-            self._pp.param['ki'] = float(args[1])
-            self._pp.save()
-            self._param_cl.send_param({'ki': self._pp.param['ki']})
-        except Exception as e:
-            msg = '%s:%s' % (type(e), e)
-            self._log.error(msg)
-            return self.RC_NG, msg
+    def cmd_q_kp(self, args):
+        return self.cmd_q_k(args, 'kp')
 
-        return self.cmd_q_ki([''])
+    def cmd_q_ki(self, args):
+        return self.cmd_q_k(args, 'ki')
 
     def cmd_q_kd(self, args):
-        self._log.debug('args=%a', args)
-
-        if len(args) == 1:
-            return self.RC_OK, self._pp.param['kd']
-
-        try:
-            self._pp.param['kd'] = float(args[1])
-            self._pp.save()
-            self._param_cl.send_param({'kd': self._pp.param['kd']})
-        except Exception as e:
-            msg = '%s:%s' % (type(e), e)
-            self._log.error(msg)
-            return self.RC_NG, msg
-
-        return self.cmd_q_kd([''])
+        return self.cmd_q_k(args, 'kd')
 
     def cmd_q_temp(self, args):
         self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
-        if self._temp_hist.len() == 0:
+        if z._temp_hist.len() == 0:
             return self.RC_NG, 'no temp data'
 
-        return self.RC_OK, self._temp_hist.get(-1)['temp']
+        return self.RC_OK, z._temp_hist.get(-1)['temp']
 
     def cmd_q_ttemp(self, args):
         self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
         if len(args) == 1:
-            return self.RC_OK, self._ttemp
-
-        self._i /= 2
+            return self.RC_OK, z._ttemp
 
         try:
-            self._ttemp = float(args[1])
-            self._param_cl.send_param({'ttemp': self._ttemp})
+            ttemp = float(args[1])
         except Exception as e:
             msg = '%s:%s' % (type(e), e)
             self._log.error(msg)
             return self.RC_NG, msg
 
-        return self.cmd_q_ttemp([''])
+        z.set_ttemp(ttemp)
+
+        return self.RC_OK, z._ttemp
 
     def cmd_q_rtemp(self, args):
         self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
         if len(args) == 1:
-            msg = 'rtemp=%s' % self._rtemp
+            msg = 'rtemp=%s' % z._rtemp
             return self.RC_OK, msg
 
         try:
             rtemp = round(float(args[1]))
-            rtemp = self._aircon.set_temp(rtemp, force=True)
+            rtemp = z._aircon.set_temp(rtemp, force=True)
         except Exception as e:
             msg = '%s:%s' % (type(e), e)
             self._log.error(msg)
@@ -748,26 +1436,35 @@ class AutoAirconCmd(Cmd):
             msg = '_aircon.set_temp(): failed'
             return self.RC_NG, msg
 
-        self._rtemp = rtemp
-        self._param_cl.send_param({'rtemp': self._rtemp})
+        z._rtemp = rtemp
+        z.send_param({'rtemp': z._rtemp})
 
-        return self.cmd_q_rtemp([''])
+        return self.RC_OK, 'rtemp=%s' % z._rtemp
 
     def cmd_q_interval_min(self, args):
         self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
         if len(args) == 1:
-            return self.RC_OK, self._aircon._interval_min
+            return self.RC_OK, z._aircon._interval_min
 
         try:
-            self._aircon._interval_min = float(args[1])
+            z._aircon._interval_min = float(args[1])
         except Exception as e:
             msg = '%s:%s' % (type(e), e)
             self._log.error(msg)
             return self.RC_NG, msg
 
-        return self.cmd_q_interval_min([''])
+        return self.RC_OK, z._aircon._interval_min
+
+    def cmd_q_sched(self, args):
+        self._log.debug('args=%a', args)
+        z, args = self.zone_args(args)
 
+        ret = {'tau': round(z._tau.tau), 'tau_n': z._tau.n, 'next': None}
+        if z._sched is not None:
+            ret['next'] = z._sched.status(time.time(), z._temp, z._tau)
+        return self.RC_OK, ret
 
 import click
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
@@ -782,18 +1479,32 @@ Auto Aircon Server
               help='port numbe')
 @click.option('--mqtt_svr', 'mqtt_svr', type=str, default='',
               help='MQTT server')
+@click.option('--metrics_port', 'metrics_port', type=int,
+              help='port number for Prometheus metrics')
+@click.option('--unix', '-u', 'unix_path', type=str,
+              help='Unix domain socket path')
+@click.option('--unix_mode', 'unix_mode', type=str, default='660',
+              help='permission of Unix domain socket (octal)')
+@click.option('--unix_group', 'unix_group', type=str,
+              help='group of Unix domain socket')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(target_temp, port, mqtt_svr, debug):
+def main(target_temp, port, mqtt_svr, metrics_port, unix_path, unix_mode,
+         unix_group, debug):
     logger = get_logger(__name__, debug)
     logger.debug('target_temp=%s, port=%s', target_temp, port)
-    logger.debug('mqtt_svr=%s', mqtt_svr)
+    logger.debug('mqtt_svr=%s, metrics_port=%s', mqtt_svr, metrics_port)
+    logger.debug('unix_path=%s, unix_mode=%s, unix_group=%s',
+                 unix_path, unix_mode, unix_group)
 
     logger.info('start')
 
     app = CmdServerApp(AutoAirconCmd,
                        init_param={'ttemp': target_temp, 'mqtt_svr': mqtt_svr},
                        port=port,
+                       metrics_port=metrics_port,
+                       unix_path=unix_path, unix_mode=int(unix_mode, 8),
+                       unix_group=unix_group,
                        debug=debug)
     try:
         app.main()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+AutoAirconSim.py -- AutoAirconServer の PID制御のオフライン・シミュレータ
+
+エアコン、MQTTブローカー、IrSendCmdServer、Node-RED なしで、
+温度の時系列を AutoAirconCmd.pid() と Aircon.set_temp() (送信間隔の制限)に
+実時間より速く入力し、PIDパラメータ(kp, ki, kd, ki_i_max, interval_min)の
+良し悪しを評価する。
+
+  閉ループ (デフォルト):
+    簡単な部屋の熱モデル(ThermalPlant)で、エアコンの設定温度から室温を求め、
+    センサーのノイズを加えて、pid()に入力する。
+    ``--csv`` の3列目(外気温)があれば、それを使う。
+  開ループ (--open_loop):
+    記録した室温(``--csv`` の2列目)を、そのまま pid()に入力する。
+
+結果:
+  ir_send:  赤外線信号の送信回数
+  changes:  pid() から求めたリモコン温度が変化した回数
+  rmse, mae: 室温と目標温度の差 (時間加重)
+  out_pct:  室温が目標温度 ±0.5度 を外れていた時間の割合 [%]
+
+  ``--out FILE`` で、設定温度の軌跡(CSV)を出力する。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import json
+import math
+import random
+import time
+
+from AutoAirconServer import AutoAirconCmd, AutoAirconZone, Aircon
+from AutoAirconServer import PIDParam
+from AutoAirconSched import AutoAirconSched
+from MyLogger import get_logger
+
+
+class NullLogger:
+    """
+    何も出力しないロガー (大量のシミュレーションで、ログを出さないため)
+    """
+    def _nop(self, *args, **kwargs):
+        pass
+
+    debug = info = warning = error = critical = exception = _nop
+
+
+class NullParamClient:
+    """
+    ParamClient の代わり: Node-RED に通知しない
+    """
+    def send_param(self, param):
+        pass
+
+
+class SimPIDParam:
+    """
+    PIDParam の代わり: ファイルを読み書きしない
+    """
+    def __init__(self, param=None):
+        self.param = dict(PIDParam.DEF_PARAM)
+        self.param.update(param or {})
+
+    def save(self):
+        return self.param
+
+
+class SimAircon(Aircon):
+    """
+    赤外線信号を送信せず、送信回数を数える Aircon
+    """
+    def __init__(self, interval_min=Aircon.INTERVAL_MIN, debug=False):
+        super().__init__(interval_min=interval_min, debug=debug)
+        if not debug:
+            self._log = NullLogger()
+
+        self.ir_send = 0
+
+    def send_recv(self, args, timeout=None, newline=False):
+        self.ir_send += 1
+        return '{"rc": "OK"}'
+
+
+class SimAutoAirconCmd(AutoAirconZone):
+    """
+    pid() だけを使うための AutoAirconZone
+
+    Aircon は使わず(SimAircon は AutoAirconSim が持つ)、
+    PIDParam, ParamClient の代わりに、SimPIDParam, NullParamClient を使う。
+    """
+    def __init__(self, param=None, ttemp=AutoAirconCmd.DEF_TTEMP,
+                 debug=False):
+        super().__init__('sim', ttemp, None, None, SimPIDParam(param),
+                         NullParamClient(), debug=debug)
+        if not debug:
+            self._log = NullLogger()
+
+    def add_temp(self, temp, ts):
+        self.add_temps([(temp, ts)])
+
+
+class ThermalPlant:
+    """
+    部屋の熱モデル (一次遅れ)
+
+      dT/dt = (t_out - T) / tau_loss + on * (rtemp + offset - T) / tau_ac
+
+    tau_loss: 外気への熱損失の時定数 [sec]
+    tau_ac:   エアコンの時定数 [sec]
+    offset:   エアコンの設定温度と、センサー位置の室温の差
+    noise:    センサーのノイズ(標準偏差)
+    """
+    DEF_TAU_LOSS = 7200
+    DEF_TAU_AC = 600
+    DEF_OFFSET = -1.0
+    DEF_NOISE = 0.05
+
+    def __init__(self, temp, tau_loss=DEF_TAU_LOSS, tau_ac=DEF_TAU_AC,
+                 offset=DEF_OFFSET, noise=DEF_NOISE, seed=0):
+        self.temp = temp
+        self.tau_loss = tau_loss
+        self.tau_ac = tau_ac
+        self.offset = offset
+        self.noise = noise
+        self._rnd = random.Random(seed)
+
+    def step(self, dt, t_out, rtemp, on=True):
+        """
+        dt秒後の室温 (区間内では入力一定として、厳密に解く)
+        """
+        a = 1 / self.tau_loss
+        b = t_out / self.tau_loss
+        if on:
+            a += 1 / self.tau_ac
+            b += (rtemp + self.offset) / self.tau_ac
+        t_ss = b / a
+        self.temp = t_ss + (self.temp - t_ss) * math.exp(-a * dt)
+        return self.temp
+
+    def sense(self):
+        """
+        センサーの値 (ノイズあり、0.01度単位)
+        """
+        return round(self.temp + self._rnd.gauss(0, self.noise), 2)
+
+
+def gen_series(hours=24, interval=30, t_out=8.0, t_out_amp=4.0, seed=0):
+    """
+    サンプル時刻と外気温を生成する
+
+    Returns
+    -------
+    series: [(ts, None, t_out), ..]
+    """
+    rnd = random.Random(seed)
+    series = []
+    ts = 0.0
+    while ts < hours * 3600:
+        t_out1 = t_out - t_out_amp * math.cos(2 * math.pi * ts / 86400)
+        series.append((ts, None, t_out1))
+        ts += interval * rnd.uniform(0.5, 1.5)
+    return series
+
+
+def load_csv(file_name, t_out=None):
+    """
+    "ts,temp[,t_out]" の行を読み込む
+
+    Returns
+    -------
+    series: [(ts, temp, t_out), ..]
+    """
+    series = []
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith('#'):
+                continue
+            col = line.split(',')
+            t_out1 = t_out
+            if len(col) >= 3 and col[2].strip() != '':
+                t_out1 = float(col[2])
+            series.append((float(col[0]), float(col[1]), t_out1))
+    return series
+
+
+class AutoAirconSim:
+    """
+    PID制御のシミュレーション
+    """
+    COMFORT_BAND = 0.5  # 目標温度 ± [度]
+
+    def __init__(self, param=None, ttemp=AutoAirconCmd.DEF_TTEMP,
+                 interval_min=Aircon.INTERVAL_MIN, plant_param=None, seed=0,
+                 sched=None, sched_lead=True, debug=False):
+        """
+        sched: {name: "分 時 日 月 曜日 ttemp"} (AutoAirconSched)
+        sched_lead: False: リード時間なし (指定時刻に ttemp を変える)
+        """
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('param=%s, ttemp=%s, interval_min=%s',
+                        param, ttemp, interval_min)
+        self._log.debug('plant_param=%s, seed=%s', plant_param, seed)
+        self._log.debug('sched=%s, sched_lead=%s', sched, sched_lead)
+
+        self.param = dict(param or {})
+        self.ttemp = ttemp
+        self.interval_min = interval_min
+        self.plant_param = dict(plant_param or {})
+        self.seed = seed
+        self.sched = sched
+        self.sched_lead = sched_lead
+
+    def new_sched(self, max_lead, direction=0):
+        sched = AutoAirconSched(self.sched, max_lead, direction,
+                                debug=self._dbg)
+        if not self._dbg:
+            sched._log = NullLogger()
+        return sched
+
+    def run(self, series, open_loop=False, traj=False):
+        """
+        Parameters
+        ----------
+        series: [(ts, temp, t_out), ..]
+          open_loop=False: temp は、最初のサンプル(室温の初期値)だけ使う
+        traj: bool
+          True: 結果に設定温度の軌跡 'traj' を含める
+
+        スケジュール(sched)がある場合、rmse などは、
+        スケジュールの時刻に目標温度が変わるとして計算する。
+
+        Returns
+        -------
+        result: dict
+        """
+        cmd = SimAutoAirconCmd(self.param, self.ttemp, debug=self._dbg)
+        aircon = SimAircon(self.interval_min, debug=self._dbg)
+
+        temp0 = series[0][1]
+        if temp0 is None:
+            temp0 = self.ttemp
+        plant = ThermalPlant(temp0, seed=self.seed, **self.plant_param)
+
+        aircon.set_temp(cmd._rtemp, force=True, ts=series[0][0])
+
+        sched = sched_nominal = None
+        ttemp_nominal = self.ttemp
+        if self.sched:
+            max_lead = AutoAirconSched.MAX_LEAD if self.sched_lead else 0
+            sched = self.new_sched(max_lead, aircon.direction())
+            cmd._sched = sched
+            sched_nominal = self.new_sched(0)
+
+        ts_prev = series[0][0]
+        rtemp_prev = None
+        changes = 0
+        err_sum = 0.0
+        err2_sum = 0.0
+        out_sec = 0.0
+        traj_list = []
+        for ts, temp, t_out in series:
+            dt = ts - ts_prev
+            ts_prev = ts
+
+            if open_loop:
+                temp_true = temp
+                temp_sensed = temp
+            else:
+                plant.step(dt, t_out, aircon._rtemp, aircon.is_on())
+                temp_true = plant.temp
+                temp_sensed = plant.sense()
+
+            if sched is not None:
+                ttemp = sched_nominal.check(ts, temp_true, cmd._tau)
+                if ttemp is not None:
+                    ttemp_nominal = ttemp
+                cmd._temp = temp_sensed
+                cmd.check_sched(ts)
+
+            err = temp_true - ttemp_nominal
+            err_sum += abs(err) * dt
+            err2_sum += err * err * dt
+            if abs(err) > self.COMFORT_BAND:
+                out_sec += dt
+
+            cmd.add_temp(temp_sensed, ts)
+            if sched is not None and aircon.is_on():
+                cmd._tau.update(temp_sensed, cmd._ttemp, cmd._d_hist.slope())
+
+            pid = cmd.pid()
+            if pid is not None:
+                rtemp = round(cmd._ttemp + round(pid, 2))
+                if rtemp != rtemp_prev:
+                    changes += 1
+                rtemp_prev = rtemp
+
+                rtemp = aircon.set_temp(rtemp, ts=ts)
+                if rtemp is not None:
+                    cmd._rtemp = rtemp
+
+            if traj:
+                traj_list.append((ts, temp_true, temp_sensed, rtemp_prev,
+                                  aircon._rtemp))
+
+        sec = series[-1][0] - series[0][0]
+        result = {
+            'n': len(series),
+            'hours': sec / 3600,
+            'ir_send': aircon.ir_send,
+            'changes': changes,
+            'rmse': math.sqrt(err2_sum / sec) if sec > 0 else 0.0,
+            'mae': err_sum / sec if sec > 0 else 0.0,
+            'out_pct': out_sec / sec * 100 if sec > 0 else 0.0,
+        }
+        if sched is not None:
+            result['tau'] = cmd._tau.tau
+        if traj:
+            result['traj'] = traj_list
+        return result
+
+
+class App:
+    RES_FMT = ('%d samples, %.1f hours: ir_send %d, changes %d, '
+               'rmse %.3f, mae %.3f, out %.1f%%')
+
+    def __init__(self, csv_file, open_loop, param, ttemp, interval_min,
+                 gen_param, plant_param, seed, out_file, sched=None,
+                 sched_lead=True, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('csv_file=%s, open_loop=%s, param=%s',
+                        csv_file, open_loop, param)
+
+        self.open_loop = open_loop
+        self.out_file = out_file
+
+        if csv_file is None:
+            if open_loop:
+                raise ValueError('--open_loop: --csv is required')
+            self.series = gen_series(seed=seed, **gen_param)
+        else:
+            self.series = load_csv(csv_file, gen_param['t_out'])
+
+        self.sim = AutoAirconSim(param, ttemp, interval_min, plant_param,
+                                 seed, sched, sched_lead, debug=self._dbg)
+
+    def main(self):
+        self._log.debug('')
+
+        t_start = time.perf_counter()
+        r = self.sim.run(self.series, self.open_loop,
+                         traj=self.out_file is not None)
+        sec = time.perf_counter() - t_start
+
+        print(self.RES_FMT % (r['n'], r['hours'], r['ir_send'],
+                              r['changes'], r['rmse'], r['mae'],
+                              r['out_pct']))
+        if 'tau' in r:
+            print('tau %.0f sec' % r['tau'])
+        print('%.1f ms (%.0f samples/sec)' % (sec * 1000, r['n'] / sec))
+
+        if self.out_file is not None:
+            with open(self.out_file, 'w') as f:
+                f.write('# ts,temp,sensed,pid_rtemp,rtemp\n')
+                for v in r['traj']:
+                    f.write('%.1f,%.3f,%.2f,%s,%s\n' % v)
+
+    def end(self):
+        self._log.debug('')
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='offline simulator of AutoAirconServer PID control')
+@click.option('--csv', 'csv_file', type=str,
+              help='recorded series ("ts,temp[,t_out]" lines)')
+@click.option('--open_loop', 'open_loop', is_flag=True, default=False,
+              help='feed recorded temperatures as is (needs --csv)')
+@click.option('--param', 'param_file', type=str,
+              help='PID parameter file (JSON)')
+@click.option('--kp', 'kp', type=float, help='kp')
+@click.option('--ki', 'ki', type=float, help='ki')
+@click.option('--kd', 'kd', type=float, help='kd')
+@click.option('--ki_i_max', 'ki_i_max', type=float, help='ki_i_max')
+@click.option('--ttemp', 'ttemp', type=float,
+              default=AutoAirconCmd.DEF_TTEMP, help='target temperature')
+@click.option('--interval_min', 'interval_min', type=float,
+              default=Aircon.INTERVAL_MIN, help='Aircon interval_min [sec]')
+@click.option('--hours', 'hours', type=float, default=24,
+              help='hours to simulate (without --csv)')
+@click.option('--interval', 'interval', type=float, default=30,
+              help='average sample interval [sec] (without --csv)')
+@click.option('--t_out', 't_out', type=float, default=8.0,
+              help='average outdoor temperature')
+@click.option('--t_out_amp', 't_out_amp', type=float, default=4.0,
+              help='daily amplitude of outdoor temperature')
+@click.option('--tau_loss', 'tau_loss', type=float,
+              default=ThermalPlant.DEF_TAU_LOSS, help='room tau_loss [sec]')
+@click.option('--tau_ac', 'tau_ac', type=float,
+              default=ThermalPlant.DEF_TAU_AC, help='aircon tau_ac [sec]')
+@click.option('--offset', 'offset', type=float,
+              default=ThermalPlant.DEF_OFFSET, help='aircon offset')
+@click.option('--noise', 'noise', type=float,
+              default=ThermalPlant.DEF_NOISE, help='sensor noise')
+@click.option('--seed', 'seed', type=int, default=0,
+              help='random seed')
+@click.option('--sched', 'sched', type=str, multiple=True,
+              help='ttemp schedule "min hour dom mon dow ttemp" (multiple)')
+@click.option('--no_lead', 'no_lead', is_flag=True, default=False,
+              help='change ttemp at the scheduled time (no lead time)')
+@click.option('--out', '-o', 'out_file', type=str,
+              help='output trajectory (CSV)')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(csv_file, open_loop, param_file, kp, ki, kd, ki_i_max, ttemp,
+         interval_min, hours, interval, t_out, t_out_amp, tau_loss, tau_ac,
+         offset, noise, seed, sched, no_lead, out_file, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('csv_file=%s, open_loop=%s, param_file=%s',
+                 csv_file, open_loop, param_file)
+
+    param = {}
+    if param_file is not None:
+        with open(param_file) as f:
+            param = json.load(f)
+    for k, v in [('kp', kp), ('ki', ki), ('kd', kd), ('ki_i_max', ki_i_max)]:
+        if v is not None:
+            param[k] = v
+    logger.debug('param=%s', param)
+
+    gen_param = {'hours': hours, 'interval': interval,
+                 't_out': t_out, 't_out_amp': t_out_amp}
+    plant_param = {'tau_loss': tau_loss, 'tau_ac': tau_ac,
+                   'offset': offset, 'noise': noise}
+
+    sched = {'sched%d' % i: s for i, s in enumerate(sched)}
+
+    try:
+        app = App(csv_file, open_loop, param, ttemp, interval_min,
+                  gen_param, plant_param, seed, out_file, sched,
+                  not no_lead, debug=debug)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    try:
+        app.main()
+    finally:
+        logger.debug('finally')
+        app.end()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+AutoAirconTune.py -- AutoAirconServer の PIDパラメータの自動調整
+
+AutoAirconSim のシミュレーションを、プロセスプールで並列に実行して、
+kp, ki, kd, ki_i_max, interval_min (Aircon.INTERVAL_MIN)の組み合わせを探索し、
+一番良いものを PIDParam のファイルに書き込む。
+
+  grid:   ``--kp 2,4,6`` などで指定した値の、全ての組み合わせ
+  random: 各パラメータの最小値〜最大値の範囲で、ランダムに ``--n_iter`` 個試し、
+          ``--refine`` 回、一番良いものの周りに範囲を狭めて、繰り返す
+
+評価(score, 小さい方が良い):
+
+  score = rmse + w_ir * (一日あたりの赤外線信号の送信回数) / 100
+
+  シミュレーションは、``--n_seed`` 個の乱数の種(外気温・ノイズ・サンプル時刻)
+  の平均で評価する。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import json
+import random
+import itertools
+import time
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from AutoAirconServer import AutoAirconCmd, Aircon, PIDParam
+from AutoAirconSim import AutoAirconSim, ThermalPlant, gen_series, load_csv
+from MyLogger import get_logger
+
+
+KEYS = ['kp', 'ki', 'kd', 'ki_i_max', 'interval_min']
+
+# ワーカープロセスごとに一度だけ設定する (候補ごとに series を送らない)
+_worker = {}
+
+
+def _init_worker(series_list, ttemp, plant_param, base_param):
+    _worker['series_list'] = series_list
+    _worker['ttemp'] = ttemp
+    _worker['plant_param'] = plant_param
+    _worker['base_param'] = base_param
+
+
+def eval_param(cand):
+    """
+    ワーカープロセスで、一つの候補を評価する
+
+    Parameters
+    ----------
+    cand: dict
+      {'kp':, 'ki':, 'kd':, 'ki_i_max':, 'interval_min':}
+
+    Returns
+    -------
+    (cand, result): (dict, dict)
+      result: 各 series の結果の平均 (ir_send は一日あたり)
+    """
+    param = dict(_worker['base_param'])
+    param.update({k: cand[k] for k in KEYS if k != 'interval_min'})
+
+    result = {'ir_day': 0.0, 'rmse': 0.0, 'mae': 0.0, 'out_pct': 0.0}
+    series_list = _worker['series_list']
+    for seed, series in enumerate(series_list):
+        sim = AutoAirconSim(param, _worker['ttemp'], cand['interval_min'],
+                            _worker['plant_param'], seed)
+        r = sim.run(series)
+        result['ir_day'] += r['ir_send'] / r['hours'] * 24
+        for k in ['rmse', 'mae', 'out_pct']:
+            result[k] += r[k]
+
+    for k in result:
+        result[k] /= len(series_list)
+    return cand, result
+
+
+def score(result, w_ir):
+    return result['rmse'] + w_ir * result['ir_day'] / 100
+
+
+class AutoAirconTune:
+    """
+    PIDパラメータの探索
+    """
+    def __init__(self, series_list, ttemp, plant_param=None, base_param=None,
+                 w_ir=0.05, jobs=None, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('%d series, ttemp=%s, plant_param=%s',
+                        len(series_list), ttemp, plant_param)
+        self._log.debug('base_param=%s, w_ir=%s, jobs=%s',
+                        base_param, w_ir, jobs)
+
+        self.w_ir = w_ir
+        self.results = []  # [(score, cand, result), ..]
+        self._done = set()
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker,
+            initargs=(series_list, ttemp, dict(plant_param or {}),
+                      dict(base_param or {})))
+
+    def end(self):
+        self._log.debug('')
+        self._pool.shutdown()
+
+    def evaluate(self, cand_list):
+        """
+        評価済みの候補は除いて、並列に評価する
+
+        Returns
+        -------
+        results: [(score, cand, result), ..] (score の小さい順)
+        """
+        todo = []
+        for cand in cand_list:
+            key = tuple(cand[k] for k in KEYS)
+            if key not in self._done:
+                self._done.add(key)
+                todo.append(cand)
+        self._log.debug('%d candidates (%d new)', len(cand_list), len(todo))
+
+        chunksize = max(1, len(todo) // (os.cpu_count() or 1) // 4)
+        for cand, result in self._pool.map(eval_param, todo,
+                                           chunksize=chunksize):
+            self.results.append((score(result, self.w_ir), cand, result))
+        self.results.sort(key=lambda r: r[0])
+        return self.results
+
+    def grid(self, space):
+        """
+        Parameters
+        ----------
+        space: {key: [value, ..]}
+        """
+        self._log.debug('space=%s', space)
+
+        cand_list = [dict(zip(KEYS, v))
+                     for v in itertools.product(*[space[k] for k in KEYS])]
+        return self.evaluate(cand_list)
+
+    def random(self, space, n_iter=100, refine=2, shrink=0.3, seed=0):
+        """
+        ランダムサーチと、一番良い候補の周りでの絞り込み
+
+        Parameters
+        ----------
+        space: {key: [value, ..]}
+          各パラメータの範囲 (最小値〜最大値)
+        shrink: float
+          絞り込みのたびに、範囲の幅を何倍にするか
+        """
+        self._log.debug('space=%s, n_iter=%d, refine=%d, shrink=%s',
+                        space, n_iter, refine, shrink)
+
+        rnd = random.Random(seed)
+        lo = {k: min(space[k]) for k in KEYS}
+        hi = {k: max(space[k]) for k in KEYS}
+        width = {k: hi[k] - lo[k] for k in KEYS}
+        center = None
+
+        for r in range(refine + 1):
+            cand_list = []
+            for i in range(n_iter):
+                cand = {}
+                for k in KEYS:
+                    if center is None:
+                        a, b = lo[k], hi[k]
+                    else:
+                        a = max(lo[k], center[k] - width[k] / 2)
+                        b = min(hi[k], center[k] + width[k] / 2)
+                    # interval_min は秒単位、他は 0.1 単位
+                    ndigits = 0 if k == 'interval_min' else 1
+                    cand[k] = round(rnd.uniform(a, b), ndigits)
+                cand_list.append(cand)
+
+            self.evaluate(cand_list)
+            center = self.results[0][1]
+            width = {k: width[k] * shrink for k in KEYS}
+            self._log.debug('round %d: best=%s', r, center)
+
+        return self.results
+
+
+def parse_list(s):
+    """
+    "1,2,4" -> [1.0, 2.0, 4.0]
+    """
+    return [float(v) for v in s.split(',') if v.strip() != '']
+
+
+class App:
+    RES_FMT = ('%7.4f  kp %5.1f ki %5.1f kd %5.1f ki_i_max %5.1f '
+               'interval_min %4.0f | ir/day %6.1f rmse %.3f mae %.3f '
+               'out %5.1f%%')
+
+    def __init__(self, method, space, n_iter, refine, csv_file, n_seed,
+                 param_file, ttemp, gen_param, plant_param, w_ir, jobs,
+                 top, dry_run, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('method=%s, space=%s, n_iter=%d, refine=%d',
+                        method, space, n_iter, refine)
+        self._log.debug('csv_file=%s, n_seed=%d, param_file=%s',
+                        csv_file, n_seed, param_file)
+
+        self.method = method
+        self.space = space
+        self.n_iter = n_iter
+        self.refine = refine
+        self.top = top
+        self.dry_run = dry_run
+
+        # PIDParam.__init__()は、param を書き換えるので、コピーを渡す
+        self.pp = PIDParam(dict(PIDParam.DEF_PARAM), param_file,
+                           debug=self._dbg)
+        if self.pp._param_file is None:
+            if not dry_run:
+                raise ValueError('PID parameter file not found')
+            self.pp._param_file = PIDParam.PARAM_FILENAME[0]
+        self._log.debug('pp.param=%s', self.pp.param)
+
+        if csv_file is None:
+            series_list = [gen_series(seed=seed, **gen_param)
+                           for seed in range(n_seed)]
+        else:
+            series_list = [load_csv(csv_file, gen_param['t_out'])]
+
+        base_param = {k: v for k, v in self.pp.param.items()
+                      if k not in KEYS}
+        self.tune = AutoAirconTune(series_list, ttemp, plant_param,
+                                   base_param, w_ir, jobs, debug=self._dbg)
+
+    def print_result(self, s, cand, result):
+        print(self.RES_FMT % (s, cand['kp'], cand['ki'], cand['kd'],
+                              cand['ki_i_max'], cand['interval_min'],
+                              result['ir_day'], result['rmse'],
+                              result['mae'], result['out_pct']))
+
+    def main(self):
+        self._log.debug('')
+
+        # 現在のパラメータ (interval_min が 0 なら Aircon.INTERVAL_MIN)
+        cur = {k: self.pp.param.get(k, 0) for k in KEYS}
+        if not cur['interval_min']:
+            cur['interval_min'] = Aircon.INTERVAL_MIN
+
+        t_start = time.perf_counter()
+        cur_res = self.tune.evaluate([cur])[0]
+        if self.method == 'grid':
+            results = self.tune.grid(self.space)
+        else:
+            results = self.tune.random(self.space, self.n_iter, self.refine)
+        sec = time.perf_counter() - t_start
+        print('%d candidates, %.1f sec' % (len(results), sec))
+
+        print('current:')
+        self.print_result(*cur_res)
+        print('top %d:' % self.top)
+        for s, cand, result in results[:self.top]:
+            self.print_result(s, cand, result)
+
+        best = results[0][1]
+        self.pp.param.update(best)
+        if self.dry_run:
+            print(json.dumps(self.pp.param, indent=2))
+            return
+        ret = self.pp.save()
+        if 'error' in ret:
+            raise RuntimeError(ret['error'])
+        print('saved to %s' % self.pp._param_file)
+
+    def end(self):
+        self._log.debug('')
+        self.tune.end()
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='tune PID parameters of AutoAirconServer by simulation')
+@click.option('--method', '-m', 'method', type=click.Choice(['grid', 'random']),
+              default='grid', help='search method')
+@click.option('--kp', 'kp', type=str, default='1,2,4,6',
+              help='kp values (comma separated)')
+@click.option('--ki', 'ki', type=str, default='0,1,3,6.5',
+              help='ki values')
+@click.option('--kd', 'kd', type=str, default='0,1,3',
+              help='kd values')
+@click.option('--ki_i_max', 'ki_i_max', type=str, default='5,10',
+              help='ki_i_max values')
+@click.option('--interval_min', 'interval_min', type=str,
+              default='40,120,300', help='interval_min values [sec]')
+@click.option('--n_iter', 'n_iter', type=int, default=100,
+              help='candidates per round (random)')
+@click.option('--refine', 'refine', type=int, default=2,
+              help='refinement rounds (random)')
+@click.option('--csv', 'csv_file', type=str,
+              help='recorded series ("ts,temp[,t_out]" lines)')
+@click.option('--n_seed', 'n_seed', type=int, default=3,
+              help='number of generated series (without --csv)')
+@click.option('--param', 'param_file', type=str,
+              help='PID parameter file (JSON) to read and write')
+@click.option('--ttemp', 'ttemp', type=float,
+              default=AutoAirconCmd.DEF_TTEMP, help='target temperature')
+@click.option('--hours', 'hours', type=float, default=24,
+              help='hours to simulate (without --csv)')
+@click.option('--interval', 'interval', type=float, default=30,
+              help='average sample interval [sec] (without --csv)')
+@click.option('--t_out', 't_out', type=float, default=8.0,
+              help='average outdoor temperature')
+@click.option('--t_out_amp', 't_out_amp', type=float, default=4.0,
+              help='daily amplitude of outdoor temperature')
+@click.option('--tau_loss', 'tau_loss', type=float,
+              default=ThermalPlant.DEF_TAU_LOSS, help='room tau_loss [sec]')
+@click.option('--tau_ac', 'tau_ac', type=float,
+              default=ThermalPlant.DEF_TAU_AC, help='aircon tau_ac [sec]')
+@click.option('--offset', 'offset', type=float,
+              default=ThermalPlant.DEF_OFFSET, help='aircon offset')
+@click.option('--noise', 'noise', type=float,
+              default=ThermalPlant.DEF_NOISE, help='sensor noise')
+@click.option('--w_ir', 'w_ir', type=float, default=0.05,
+              help='weight of IR sends (per 100/day) against rmse')
+@click.option('--jobs', '-j', 'jobs', type=int,
+              help='number of processes (default: CPUs)')
+@click.option('--top', '-t', 'top', type=int, default=5,
+              help='number of results to show')
+@click.option('--dry_run', '-n', 'dry_run', is_flag=True, default=False,
+              help='do not write the parameter file')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(method, kp, ki, kd, ki_i_max, interval_min, n_iter, refine,
+         csv_file, n_seed, param_file, ttemp, hours, interval, t_out,
+         t_out_amp, tau_loss, tau_ac, offset, noise, w_ir, jobs, top,
+         dry_run, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('method=%s, param_file=%s, dry_run=%s',
+                 method, param_file, dry_run)
+
+    try:
+        space = {'kp': parse_list(kp), 'ki': parse_list(ki),
+                 'kd': parse_list(kd), 'ki_i_max': parse_list(ki_i_max),
+                 'interval_min': parse_list(interval_min)}
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for k in KEYS:
+        if len(space[k]) == 0:
+            raise click.BadParameter('--%s: no value' % k)
+    logger.debug('space=%s', space)
+
+    gen_param = {'hours': hours, 'interval': interval,
+                 't_out': t_out, 't_out_amp': t_out_amp}
+    plant_param = {'tau_loss': tau_loss, 'tau_ac': tau_ac,
+                   'offset': offset, 'noise': noise}
+
+    try:
+        app = App(method, space, n_iter, refine, csv_file, n_seed,
+                  param_file, ttemp, gen_param, plant_param, w_ir, jobs,
+                  top, dry_run, debug=debug)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    try:
+        app.main()
+    finally:
+        logger.debug('finally')
+        app.end()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+FakePigpio.py -- pigpiod の代わり (ハードウェアなしで動かすため)
+
+IrSend, IrRecv などが使う pigpio の関数(wave, chain, callback,
+watchdog, notify)を、プロセス内で模擬する。
+
+* ``install()``を、pigpioを使うモジュールを importする前に呼び出すと、
+  ``import pigpio``で、このモジュールが使われる。
+
+    import FakePigpio
+    FakePigpio.install()
+    from IrSend import IrSend
+
+* 複数の ``pigpio.pi()``は、一つのデーモン(``FakePigpio.daemon``)を共有する。
+
+* コマンドごとの通信遅延、wave_create()の処理時間、
+  DMAの制限(パルス数、コントロールブロック数、wave ID数、chainの長さ)を
+  模擬する。(``Daemon.CONF``)
+
+* wave_chain()で送信されたパルスは、``daemon.emitted``に記録される。
+
+* ``daemon.inject(pin, raw_data)``で、受信信号を模擬できる。
+  (コールバックが登録されると、エッジとタイムアウトを通知する)
+
+* ``daemon.connect(tx_pin, rx_pin)``で、送信ピンと受信ピンをつなぐと、
+  wave_chain()で送信した信号(キャリアを除いたもの)が、受信ピンに入力される。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import sys
+import threading
+import time
+
+from MyLogger import get_logger
+
+
+INPUT  = 0
+OUTPUT = 1
+
+RISING_EDGE  = 0
+FALLING_EDGE = 1
+EITHER_EDGE  = 2
+
+TIMEOUT = 2
+
+WAVE_MODE_ONE_SHOT = 0
+WAVE_MODE_REPEAT   = 1
+
+NTFY_FLAGS_WDOG = (1 << 5)
+
+PI_TOO_MANY_PULSES = -36
+PI_BAD_WAVE_ID     = -66
+PI_TOO_MANY_CBS    = -67
+PI_NO_WAVEFORM_ID  = -70
+PI_CHAIN_TOO_BIG   = -119
+
+ERR_STR = {
+    PI_TOO_MANY_PULSES: 'too many pulses',
+    PI_BAD_WAVE_ID:     'non existent wave id',
+    PI_TOO_MANY_CBS:    'No more CBs for waveform',
+    PI_NO_WAVEFORM_ID:  'no more waveform ids',
+    PI_CHAIN_TOO_BIG:   'chain is too long',
+}
+
+
+class error(Exception):
+    """pigpio module exception"""
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
+class pulse:
+    """
+    pigpio.pulse と同じ
+    """
+    def __init__(self, gpio_on, gpio_off, delay):
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
+
+class _callback:
+    """
+    pigpio.pi.callback() の戻り値
+    """
+    def __init__(self, daemon, pin, edge, func):
+        self._daemon = daemon
+        self.pin = pin
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        self._daemon.cancel_callback(self)
+
+
+class Daemon:
+    """
+    pigpiod の状態
+
+    emitted: list
+      送信記録 [{'tick': tick, 'pulses': [(gpio_on, gpio_off, delay), ..]}, ..]
+
+    stats: dict
+      コマンドごとの呼び出し回数
+    """
+    CONF = {
+        'latency_us':       100,    # コマンドごとの通信遅延
+        'wave_create_us':   0.5,    # wave_create()のパルス当たりの処理時間
+        'time_scale':       1.0,    # 送信時間の倍率 (0: 送信は一瞬で終わる)
+        'max_pulses':       12000,  # 一つのwaveのパルス数
+        'max_cbs':          25016,  # 全waveのコントロールブロック数
+        'cbs_per_pulse':    2,
+        'max_wave_id':      250,
+        'max_chain':        600,    # bytes
+        'rx_delay_ms':      1,      # コールバック登録から受信開始まで
+    }
+
+    def __init__(self, conf=None, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('conf=%s', conf)
+
+        self.conf = dict(self.CONF)
+        if conf is not None:
+            self.conf.update(conf)
+
+        self._lock = threading.RLock()
+        self._t0 = time.monotonic()
+        self.wires = {}
+        self.reset()
+
+    def reset(self):
+        """
+        全ての状態を初期化する(設定は変えない)
+        """
+        with self._lock:
+            self.mode = {}
+            self.level = {}
+            self.watchdog = {}
+            self.callbacks = []
+            self.wave_pending = []
+            self.waves = {}
+            self.cbs_used = 0
+            self.tx_end = 0.0
+            self.emitted = []
+            self.stats = {}
+            self.rx_pending = {}
+            self.rx_gen = {}
+            self.notify_handle = 0
+
+    def tick(self):
+        """
+        起動からのマイクロ秒 (32bit)
+        """
+        return int((time.monotonic() - self._t0) * 1000000) & 0xFFFFFFFF
+
+    def cmd(self, name):
+        """
+        コマンド一回分の通信遅延と、呼び出し回数の記録
+        """
+        self.stats[name] = self.stats.get(name, 0) + 1
+        if self.conf['latency_us'] > 0:
+            time.sleep(self.conf['latency_us'] / 1000000)
+
+    #
+    # wave
+    #
+    def wave_add_generic(self, pulses):
+        with self._lock:
+            if len(self.wave_pending) + len(pulses) > self.conf['max_pulses']:
+                raise error(ERR_STR[PI_TOO_MANY_PULSES])
+            self.wave_pending += [(p.gpio_on, p.gpio_off, p.delay)
+                                  for p in pulses]
+            return len(self.wave_pending)
+
+    def wave_create(self):
+        with self._lock:
+            pulses = self.wave_pending
+            self.wave_pending = []
+
+            cbs = len(pulses) * self.conf['cbs_per_pulse']
+            if self.cbs_used + cbs > self.conf['max_cbs']:
+                raise error(ERR_STR[PI_TOO_MANY_CBS])
+
+            for wave_id in range(self.conf['max_wave_id']):
+                if wave_id not in self.waves:
+                    break
+            else:
+                raise error(ERR_STR[PI_NO_WAVEFORM_ID])
+
+            self.waves[wave_id] = {'pulses': pulses, 'cbs': cbs}
+            self.cbs_used += cbs
+
+        time.sleep(len(pulses) * self.conf['wave_create_us'] / 1000000)
+        return wave_id
+
+    def wave_delete(self, wave_id):
+        with self._lock:
+            if wave_id not in self.waves:
+                raise error(ERR_STR[PI_BAD_WAVE_ID])
+            self.cbs_used -= self.waves[wave_id]['cbs']
+            del self.waves[wave_id]
+            return 0
+
+    def wave_clear(self):
+        with self._lock:
+            self.wave_pending = []
+            self.waves = {}
+            self.cbs_used = 0
+            return 0
+
+    def chain2pulses(self, data):
+        """
+        wave_chain()のデータを、パルスのリストに展開する
+
+        255 0      : loop start
+        255 1 x y  : loop end (x + 256 * y 回繰り返し)
+        255 2 x y  : delay (x + 256 * y usec)
+        255 3      : loop forever (ここでは一回だけ)
+        """
+        pulses = []
+        stack = []
+        i = 0
+        while i < len(data):
+            if data[i] != 255:
+                if data[i] not in self.waves:
+                    raise error(ERR_STR[PI_BAD_WAVE_ID])
+                pulses += self.waves[data[i]]['pulses']
+                i += 1
+                continue
+
+            cmd = data[i + 1]
+            if cmd == 0:
+                stack.append(len(pulses))
+                i += 2
+            elif cmd == 1:
+                n = data[i + 2] + 256 * data[i + 3]
+                start = stack.pop()
+                pulses += pulses[start:] * (n - 1)
+                i += 4
+            elif cmd == 2:
+                pulses.append((0, 0, data[i + 2] + 256 * data[i + 3]))
+                i += 4
+            else:
+                i += 2
+        return pulses
+
+    def wave_chain(self, data):
+        if len(data) > self.conf['max_chain']:
+            raise error(ERR_STR[PI_CHAIN_TOO_BIG])
+
+        with self._lock:
+            pulses = self.chain2pulses(data)
+            tick = self.tick()
+            self.emitted.append({'tick': tick, 'pulses': pulses})
+
+            t_us = sum([p[2] for p in pulses])
+            self.tx_end = time.monotonic() + \
+                t_us * self.conf['time_scale'] / 1000000
+
+        for tx_pin, rx_pin in list(self.wires.items()):
+            raw_data = pulses2raw(pulses, tx_pin)
+            if len(raw_data) > 0:
+                self.inject(rx_pin, raw_data,
+                            realtime=(self.conf['time_scale'] > 0),
+                            pending=False)
+        return 0
+
+    def wave_tx_busy(self):
+        return 1 if time.monotonic() < self.tx_end else 0
+
+    def wave_tx_stop(self):
+        self.tx_end = 0.0
+        return 0
+
+    #
+    # callback, watchdog
+    #
+    def add_callback(self, cb):
+        with self._lock:
+            self.callbacks.append(cb)
+            frames = self.rx_pending.pop(cb.pin, [])
+
+        if len(frames) > 0:
+            # callback()が戻ってから、再生を始める
+            th = threading.Timer(self.conf['rx_delay_ms'] / 1000, self.play,
+                                 args=(cb.pin, frames))
+            th.daemon = True
+            th.start()
+
+    def cancel_callback(self, cb):
+        with self._lock:
+            if cb in self.callbacks:
+                self.callbacks.remove(cb)
+
+    def set_watchdog(self, pin, ms):
+        self.watchdog[pin] = ms
+        return 0
+
+    def fire(self, pin, level, tick):
+        """
+        ``pin``のコールバックを呼び出す
+        """
+        self.level[pin] = level
+        with self._lock:
+            cbs = [cb for cb in self.callbacks if cb.pin == pin]
+        for cb in cbs:
+            if level == TIMEOUT or cb.edge == EITHER_EDGE \
+               or (cb.edge == RISING_EDGE and level == 1) \
+               or (cb.edge == FALLING_EDGE and level == 0):
+                cb.func(pin, level, tick)
+
+    def connect(self, tx_pin, rx_pin):
+        """
+        送信ピン``tx_pin``の出力を、受信ピン``rx_pin``に入力する。
+        (``rx_pin``が None の場合は、切断)
+        """
+        self._log.debug('tx_pin=%s, rx_pin=%s', tx_pin, rx_pin)
+        if rx_pin is None:
+            self.wires.pop(tx_pin, None)
+        else:
+            self.wires[tx_pin] = rx_pin
+
+    def inject(self, pin, raw_data, realtime=False, pending=True):
+        """
+        受信信号を模擬する。
+
+        ``pin``にコールバックが登録されていれば、すぐに再生し、
+        なければ、登録されたときに再生する。
+
+        Parameters
+        ----------
+        raw_data: [[pulse1, space1], [pulse2, space2], ..]
+          受信モジュールの出力は、pulseの間 0 (active low)
+        realtime: bool
+          False の場合は、待たずに(tickだけ進めて)通知する。
+          True の場合は、実時間で通知し、最後のエッジから
+          watchdogの時間が経過してからタイムアウトを通知する。
+          (次の信号が続けば、一つの受信信号になる)
+        pending: bool
+          False の場合は、コールバックがなければ、捨てる
+        """
+        frames = [[raw_data, realtime]]
+        with self._lock:
+            if not any([cb.pin == pin for cb in self.callbacks]):
+                if pending:
+                    self.rx_pending.setdefault(pin, []).extend(frames)
+                return
+        self.play(pin, frames)
+
+    def play(self, pin, frames):
+        for raw_data, realtime in frames:
+            with self._lock:
+                gen = self.rx_gen[pin] = self.rx_gen.get(pin, 0) + 1
+
+            tick = self.tick()
+            t_start = time.monotonic()
+            for i, (p, s) in enumerate(raw_data):
+                for level, usec in [(0, p), (1, s)]:
+                    self.fire(pin, level, tick & 0xFFFFFFFF)
+                    if level == 1:
+                        if realtime and i == len(raw_data) - 1:
+                            break
+                        wd_us = self.watchdog.get(pin, 0) * 1000
+                        if wd_us > 0 and s >= wd_us:
+                            usec = wd_us
+                    tick += int(usec)
+                    if realtime:
+                        wait = (tick - self.tick()) / 1000000
+                        if wait > 0:
+                            time.sleep(wait)
+            self._log.debug('%d pulses, %.3f sec', len(raw_data),
+                            time.monotonic() - t_start)
+
+            # 最後の space の後は、watchdog のタイムアウト
+            wd_ms = self.watchdog.get(pin, 0)
+            if wd_ms <= 0:
+                continue
+            if not realtime:
+                self.fire(pin, TIMEOUT, tick & 0xFFFFFFFF)
+                continue
+            th = threading.Timer(wd_ms / 1000, self.fire_timeout,
+                                 args=(pin, gen, tick + int(wd_ms * 1000)))
+            th.daemon = True
+            th.start()
+
+    def fire_timeout(self, pin, gen, tick):
+        """
+        ``play()``の後に、次の信号が来なければ、タイムアウトを通知する
+        """
+        if self.rx_gen.get(pin) == gen:
+            self.fire(pin, TIMEOUT, tick & 0xFFFFFFFF)
+
+    #
+    # notify
+    #
+    def notify_open(self):
+        with self._lock:
+            self.notify_handle += 1
+            return self.notify_handle - 1
+
+
+daemon = Daemon()
+
+
+class pi:
+    """
+    pigpio.pi の代わり
+
+    全てのインスタンスは、モジュール変数 ``daemon``を共有する。
+    """
+    def __init__(self, host='localhost', port=8888, show_errors=True):
+        self._daemon = daemon
+        self.connected = True
+        self._notify = {}
+
+    def _cmd(self, name):
+        self._daemon.cmd(name)
+
+    def stop(self):
+        self._cmd('stop')
+        self.connected = False
+
+    def get_current_tick(self):
+        self._cmd('get_current_tick')
+        return self._daemon.tick()
+
+    def set_mode(self, gpio, mode):
+        self._cmd('set_mode')
+        self._daemon.mode[gpio] = mode
+        return 0
+
+    def get_mode(self, gpio):
+        self._cmd('get_mode')
+        return self._daemon.mode.get(gpio, INPUT)
+
+    def read(self, gpio):
+        self._cmd('read')
+        return self._daemon.level.get(gpio, 1)
+
+    def write(self, gpio, level):
+        self._cmd('write')
+        self._daemon.level[gpio] = level
+        return 0
+
+    def set_glitch_filter(self, user_gpio, steady):
+        self._cmd('set_glitch_filter')
+        return 0
+
+    def set_watchdog(self, user_gpio, wdog_timeout):
+        self._cmd('set_watchdog')
+        return self._daemon.set_watchdog(user_gpio, wdog_timeout)
+
+    def callback(self, user_gpio, edge=RISING_EDGE, func=None):
+        self._cmd('callback')
+        cb = _callback(self._daemon, user_gpio, edge, func)
+        self._daemon.add_callback(cb)
+        return cb
+
+    def wave_add_new(self):
+        self._cmd('wave_add_new')
+        self._daemon.wave_pending = []
+        return 0
+
+    def wave_add_generic(self, pulses):
+        self._cmd('wave_add_generic')
+        return self._daemon.wave_add_generic(pulses)
+
+    def wave_create(self):
+        self._cmd('wave_create')
+        return self._daemon.wave_create()
+
+    def wave_delete(self, wave_id):
+        self._cmd('wave_delete')
+        return self._daemon.wave_delete(wave_id)
+
+    def wave_clear(self):
+        self._cmd('wave_clear')
+        return self._daemon.wave_clear()
+
+    def wave_send_once(self, wave_id):
+        self._cmd('wave_send_once')
+        return self._daemon.wave_chain([wave_id])
+
+    def wave_chain(self, data):
+        self._cmd('wave_chain')
+        return self._daemon.wave_chain(data)
+
+    def wave_tx_busy(self):
+        self._cmd('wave_tx_busy')
+        return self._daemon.wave_tx_busy()
+
+    def wave_tx_stop(self):
+        self._cmd('wave_tx_stop')
+        return self._daemon.wave_tx_stop()
+
+    def wave_get_max_pulses(self):
+        self._cmd('wave_get_max_pulses')
+        return self._daemon.conf['max_pulses']
+
+    def wave_get_max_cbs(self):
+        self._cmd('wave_get_max_cbs')
+        return self._daemon.conf['max_cbs']
+
+    def notify_open(self):
+        self._cmd('notify_open')
+        handle = self._daemon.notify_open()
+        self._notify[handle] = 0
+        return handle
+
+    def notify_begin(self, handle, bits):
+        self._cmd('notify_begin')
+        self._notify[handle] = bits
+        return 0
+
+    def notify_pause(self, handle):
+        self._cmd('notify_pause')
+        self._notify[handle] = 0
+        return 0
+
+    def notify_close(self, handle):
+        self._cmd('notify_close')
+        self._notify.pop(handle, None)
+        return 0
+
+
+def pulses2levels(pulses, pin):
+    """
+    送信されたパルスの``pin``の変化を、
+    [[level1, usec1], [level2, usec2], ..] に変換する。
+    (同じレベルが続く場合は、一つにまとめる)
+    """
+    mask = 1 << pin
+
+    levels = []
+    for on, off, delay in pulses:
+        if on & mask:
+            level = 1
+        elif off & mask:
+            level = 0
+        elif len(levels) > 0:
+            level = levels[-1][0]
+        else:
+            level = 0
+        if len(levels) > 0 and levels[-1][0] == level:
+            levels[-1][1] += delay
+        else:
+            levels.append([level, delay])
+    return levels
+
+
+def pulses2raw(pulses, pin, gap_us=100):
+    """
+    送信されたパルス(キャリアで変調された信号)を、
+    [[mark1, space1], [mark2, space2], ..] に変換する。
+
+    ``gap_us``より短いOFFは、キャリアの一部とみなす。
+    最後の space は、最後のmark以降の時間の合計。
+    """
+    levels = pulses2levels(pulses, pin)
+
+    raw_data = []
+    mark = None
+    space = 0
+    for level, usec in levels:
+        if level == 1:
+            if mark is None:
+                mark = 0
+            elif space < gap_us:
+                # キャリアの OFF 部分
+                mark += space
+            else:
+                raw_data.append([mark, space])
+                mark = 0
+            space = 0
+            mark += usec
+        else:
+            space += usec
+    if mark is not None:
+        raw_data.append([mark, space])
+    return raw_data
+
+
+def install():
+    """
+    ``import pigpio``で、このモジュールが使われるようにする
+    """
+    sys.modules['pigpio'] = sys.modules[__name__]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+FastLogger.py -- デバッグオフ時のオーバーヘッドが小さい MyLogger のラッパー
+
+    from FastLogger import get_logger, lazy
+
+    self._log = get_logger(__class__.__name__, self._dbg)
+
+* デバッグオフの場合、``self._log.debug()``は何もしない関数になる。
+  (logging.Logger.debug() のレベル判定を通らない)
+
+* 重い引数は ``lazy()``で包むと、実際に出力されるときだけ評価される。
+
+    self._log.debug('macro=%s', lazy(json.dumps, macro_data, indent=2))
+
+* ホットパスの内側のループでは、引数の評価自体を避けるために、
+  下記のようにガードする。
+
+    if __debug__ and self._dbg:
+        self._log.debug('usec=%s', usec)
+
+  ``python -O``(または PYTHONOPTIMIZE=1)で実行すると、
+  このブロックはコンパイル時に取り除かれる(strip debug モード)。
+  このモードでは、get_logger(debug=True)でも、デバッグログは出力しない。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import MyLogger
+
+
+STRIP_DEBUG = not __debug__
+
+
+def _nop(*args, **kwargs):
+    pass
+
+
+class lazy:
+    """
+    ログに出力されるときに評価される引数
+    """
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    def __repr__(self):
+        return repr(self.func(*self.args, **self.kwargs))
+
+
+class FastLogger:
+    """
+    MyLogger(logging.Logger) のラッパー
+    """
+    def __init__(self, logger, debug=False):
+        self.logger = logger
+        self.debug_enabled = debug and not STRIP_DEBUG
+
+        if self.debug_enabled:
+            self.debug = logger.debug
+        else:
+            self.debug = _nop
+        self.info = logger.info
+        self.warning = logger.warning
+        self.error = logger.error
+        self.critical = logger.critical
+        self.exception = logger.exception
+
+    def __getattr__(self, name):
+        return getattr(self.logger, name)
+
+
+def get_logger(name, debug=False):
+    return FastLogger(MyLogger.get_logger(name, debug and not STRIP_DEBUG),
+                      debug)
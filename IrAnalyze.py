@@ -10,8 +10,14 @@ __date__   = '2019'
 
 from IrConfig import IrConfig
 import json
+from collections import Counter
 from MyLogger import get_logger
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class IrAnalyze:
     """
@@ -33,6 +39,12 @@ class IrAnalyze:
     }
     SIG_STR_01 = SIG_SYM['zero'] + SIG_SYM['one']
 
+    T_MIN          = 100   # usec
+    T_FIT_K_MAX    = 40    # これより長い信号(trailerなど)は、Tの推定に使わない
+    T_FIT_LOOP_MAX = 10
+    T_FIT_CAND_N   = 3     # 候補を作る度数分布のグループ数
+    T_CONF_MIN     = 0.7
+
     def __init__(self, raw_data=[], debug=False):
         """
         Parameters
@@ -47,6 +59,7 @@ class IrAnalyze:
 
         self.result   = None
         self.raw_data = raw_data
+        self.T_conf   = None
 
     def fq_dist(self, data, step=0.2):
         """
@@ -74,6 +87,166 @@ class IrAnalyze:
             fq_list[-1].append(val)
         return fq_list
 
+    def calc_T(self):
+        """
+        単位時間<T>を求める
+
+        単位時間<T> = (pulse + space)の度数分布で
+        一番小さいグループの平均の半分
+
+        """
+        # pulse + sleep の値のリスト
+        self.sum_list = [(d1 + d2) for d1, d2 in self.raw_data]
+        self._log.debug('sum_list=%s', self.sum_list)
+
+        # self.sum_listの度数分布
+        self.fq_list = self.fq_dist(self.sum_list, 0.2)
+        self._log.debug('fq_list=%s', self.fq_list)
+
+        self.T = (sum(self.fq_list[0]) / len(self.fq_list[0])) / 2
+        self._log.debug('T=%.2f[us]', self.T)
+
+    def calc_Td(self):
+        """
+        誤差 td を求める
+
+        (pulse,spaceのTdの平均値を求めているが、pulseだけでも十分?)
+
+        """
+        self.T1 = {'pulse': [], 'space': []}
+        for i, s in enumerate(self.sum_list):
+            if self.sum_list[i] in self.fq_list[0]:
+                self.T1['pulse'].append(self.raw_data[i][0])
+                self.T1['space'].append(self.raw_data[i][1])
+        self.T1_ave = {'pulse': [], 'space': []}
+        for key in ['pulse', 'space']:
+            self.T1_ave[key] = sum(self.T1[key]) / len(self.T1[key])
+        self.Td_p = abs(self.T1_ave['pulse'] - self.T)
+        self.Td_s = abs(self.T1_ave['space'] - self.T)
+        self.Td = (self.Td_p + self.Td_s) / 2
+        self._log.debug('Td=%.2f, Td_p=%.2f, Td_s=%.2f',
+                        self.Td, self.Td_p, self.Td_s)
+
+    def fit_T1(self, T, Td):
+        """
+        ``T``, ``Td``を初期値として、最小二乗法で T, Td を求める。
+
+          pulse = k_p * T + Td
+          space = k_s * T - Td    (k_p, k_s: 整数)
+
+        整数 k の割り当てと、T, Td の推定を、
+        k が変化しなくなるまで繰り返す。
+
+        Returns
+        -------
+        T, Td: float
+        conf: float
+          確からしさ (0..1)
+          = 1 - 2 * (T単位での量子化誤差の平均)
+        """
+        (T0, Td0) = (T, Td)
+
+        x = []
+        sgn = []
+        for p, s in self.raw_data:
+            x += [p, s]
+            sgn += [1, -1]
+
+        k_prev = None
+        for loop in range(self.T_FIT_LOOP_MAX):
+            k = [max(round((x1 - s1 * Td) / T), 1) for x1, s1 in zip(x, sgn)]
+            if k == k_prev:
+                break
+            k_prev = k
+
+            fit = [(k1, s1, x1) for k1, s1, x1 in zip(k, sgn, x)
+                   if k1 <= self.T_FIT_K_MAX]
+            if len(fit) == 0:
+                return T0, Td0, 0.0
+            s_kk = sum([k1 * k1 for k1, s1, x1 in fit])
+            s_ks = sum([k1 * s1 for k1, s1, x1 in fit])
+            s_kx = sum([k1 * x1 for k1, s1, x1 in fit])
+            s_sx = sum([s1 * x1 for k1, s1, x1 in fit])
+            det = s_kk * len(fit) - s_ks * s_ks
+            if det == 0:
+                break
+
+            T = (s_kx * len(fit) - s_ks * s_sx) / det
+            Td = (s_kk * s_sx - s_ks * s_kx) / det
+            if T < self.T_MIN:
+                return T0, Td0, 0.0
+
+        err = [abs((x1 - s1 * Td) / T - k1) for k1, s1, x1 in zip(k, sgn, x)
+               if k1 <= self.T_FIT_K_MAX]
+        if len(err) == 0:
+            return T0, Td0, 0.0
+        conf = max(1.0 - 2 * sum(err) / len(err), 0.0)
+        self._log.debug('T=%.2f, Td=%.2f, conf=%.3f, loop=%d',
+                        T, Td, conf, loop)
+        return T, Td, conf
+
+    def fit_T(self):
+        """
+        単位時間<T>と誤差<Td>の補正
+
+        度数分布から求めた T, Td を初期値として fit_T1()で補正する。
+        確からしさが低い場合は、
+        度数分布の小さい方のグループから別の初期値を作って試し、
+        最も確からしいものを採用する。
+        (一番小さいグループにノイズが含まれる場合など)
+
+        結果は self.T, self.Td, self.T_conf に格納する。
+        """
+        best = self.fit_T1(self.T, self.Td)
+
+        if best[2] < self.T_CONF_MIN:
+            for g in self.fq_list[:self.T_FIT_CAND_N]:
+                for n in [2, 3, 4]:
+                    T = (sum(g) / len(g)) / n
+                    if T < self.T_MIN:
+                        continue
+                    ret = self.fit_T1(T, 0.0)
+                    if ret[2] > best[2]:
+                        best = ret
+
+        (self.T, self.Td, self.T_conf) = best
+        self._log.debug('T=%.2f, Td=%.2f, T_conf=%.3f',
+                        self.T, self.Td, self.T_conf)
+
+    def quantize(self):
+        """
+        self.raw_dataのそれぞれの値(Tdで補正)が、self.Tの何倍か求める
+        """
+        self.n_list_float = []  # for debug
+        self.n_list = []
+        for p, s in self.raw_data:
+            n_p = (p - self.Td) / self.T
+            n_s = (s + self.Td) / self.T
+            self.n_list_float.append([n_p, n_s])
+            n_p = round(n_p)
+            n_s = round(n_s)
+            self.n_list.append([n_p, n_s])
+        self._log.debug('n_list_float=%s', self.n_list_float)
+        self._log.debug('n_list=%s', self.n_list)
+
+    def extract_pattern(self):
+        """
+        信号パターン抽出
+        """
+        self.n_pattern = sorted(list(map(list, set(map(tuple, self.n_list)))))
+        self._log.debug('n_pattern=%s', self.n_pattern)
+
+    def make_sig_list(self):
+        """
+        self.n_listの各要素を、self.sig2nのキーに変換する
+        """
+        self.sig_list = []
+        for n1, n2 in self.n_list:
+            for key in self.sig2n.keys():
+                if [n1, n2] in self.sig2n[key]:
+                    self.sig_list.append(key)
+        self._log.debug('sig_list=%s', self.sig_list)
+
     def analyze(self, raw_data=[]):
         """
         pulse, sleepには、誤差があるが、
@@ -120,50 +293,11 @@ class IrAnalyze:
                                  raw_data)
             return None
 
-        # pulse + sleep の値のリスト
-        self.sum_list = [(d1 + d2) for d1, d2 in self.raw_data]
-        self._log.debug('sum_list=%s', self.sum_list)
-
-        # self.sum_listの度数分布
-        self.fq_list = self.fq_dist(self.sum_list, 0.2)
-        self._log.debug('fq_list=%s', self.fq_list)
-
-        # 単位時間<T> = 度数分布で一番小さいグループの平均の半分
-        self.T = (sum(self.fq_list[0]) / len(self.fq_list[0])) / 2
-        self._log.debug('T=%.2f[us]', self.T)
-
-        # 誤差 td を求める
-        self.T1 = {'pulse': [], 'space': []}
-        for i, s in enumerate(self.sum_list):
-            if self.sum_list[i] in self.fq_list[0]:
-                self.T1['pulse'].append(self.raw_data[i][0])
-                self.T1['space'].append(self.raw_data[i][1])
-        self.T1_ave = {'pulse': [], 'space': []}
-        # (pulse,spaceのTdの平均値を求めているが、pulseだけでも十分?)
-        for key in ['pulse', 'space']:
-            self.T1_ave[key] = sum(self.T1[key]) / len(self.T1[key])
-        self.Td_p = abs(self.T1_ave['pulse'] - self.T)
-        self.Td_s = abs(self.T1_ave['space'] - self.T)
-        self.Td = (self.Td_p + self.Td_s) / 2
-        self._log.debug('Td=%.2f, Td_p=%.2f, Td_s=%.2f',
-                           self.Td, self.Td_p, self.Td_s)
-
-        # self.raw_dataのそれぞれの値(Tdで補正)が、self.Tの何倍か求める
-        self.n_list_float = []  # for debug
-        self.n_list = []
-        for p, s in self.raw_data:
-            n_p = (p - self.Td) / self.T
-            n_s = (s + self.Td) / self.T
-            self.n_list_float.append([n_p, n_s])
-            n_p = round(n_p)
-            n_s = round(n_s)
-            self.n_list.append([n_p, n_s])
-        self._log.debug('n_list_float=%s', self.n_list_float)
-        self._log.debug('n_list=%s', self.n_list)
-
-        # 信号パターン抽出
-        self.n_pattern = sorted(list(map(list, set(map(tuple, self.n_list)))))
-        self._log.debug('n_pattern=%s', self.n_pattern)
+        self.calc_T()
+        self.calc_Td()
+        self.fit_T()
+        self.quantize()
+        self.extract_pattern()
 
         # 信号パターンの解析
         # 信号フォーマットの特定
@@ -276,12 +410,7 @@ class IrAnalyze:
         self._log.debug('sig_format2=%s', self.sig_format2)
 
         # 信号リストを生成
-        self.sig_list = []
-        for n1, n2 in self.n_list:
-            for key in self.sig2n.keys():
-                if [n1, n2] in self.sig2n[key]:
-                    self.sig_list.append(key)
-        self._log.debug('sig_list=%s', self.sig_list)
+        self.make_sig_list()
 
         # 信号リストを文字列に変換
         self.sig_str = ''
@@ -378,6 +507,28 @@ class IrAnalyze:
 
         return self.result
 
+    def load_jsonl(self, file_name):
+        """
+        JSON Lines形式のファイル(一行に一つの解析結果)を読み込む
+
+        Returns
+        -------
+        dev_list: list
+        """
+        self._log.debug('file_name=%s', file_name)
+
+        dev_list = []
+        with open(file_name, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line == '':
+                    continue
+                try:
+                    dev_list.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    self._log.warning('%s:%s .. ignored', type(e), e)
+        return dev_list
+
     def json_dumps(self, dev_list=None):
         """
         デバイスデータ(JSON形式、リスト)を見やすく整形し、文字列を返す
@@ -414,6 +565,11 @@ class IrAnalyze:
 
         json_str = '[\n'
         for dev_data in dev_list:
+            buttons_str = ''
+            for b in dev_data['buttons']:
+                buttons_str += '    %s: %s,\n' % (
+                    json.dumps(b), json.dumps(dev_data['buttons'][b]))
+
             json_str += """
 {
   "comment": %s,
@@ -435,8 +591,7 @@ class IrAnalyze:
     "[end of macro]": ""
   },
   "buttons": {
-    "button1": %s,
-    "end of buttons": ""
+%s    "end of buttons": ""
   }
 }
 ,
@@ -450,7 +605,7 @@ class IrAnalyze:
        dev_data['sym_tbl']['/'],
        dev_data['sym_tbl']['*'],
        dev_data['sym_tbl']['?'],
-       json.dumps(dev_data['buttons']['button1']))
+       buttons_str)
 
         json_str = json_str[:-2] + ']\n'
 
@@ -458,10 +613,317 @@ class IrAnalyze:
         return json_str
 
 
+class IrAnalyzeNp(IrAnalyze):
+    """
+    IrAnalyzeの数値処理部分をNumPyの配列演算に置き換えたもの
+
+    度数分布、T, Tdの算出、量子化、シンボル分類を配列演算で行う。
+    解析結果は、IrAnalyzeと完全に一致する。
+    (大量のデータを一括解析する場合に使う)
+    """
+    def __init__(self, raw_data=[], debug=False):
+        if np is None:
+            raise ModuleNotFoundError('numpy is required for %s' %
+                                      __class__.__name__)
+
+        super().__init__(raw_data, debug=debug)
+        self._log = get_logger(__class__.__name__, self._dbg)
+
+    def fq_dist(self, data, step=0.2):
+        """
+        度数分布作成
+
+        ソート済みのデータで、直前の値との比率(または差)が
+        ``step``以上になる位置でグループを分割する。
+
+        Parameters
+        ----------
+        data: list or numpy.ndarray
+        step: float
+
+        """
+        self._log.debug('data=%s, step=%.1f', data, step)
+
+        data = np.sort(np.asarray(data))
+        if step < 1:
+            # 比率
+            next_step = data[:-1] * (1 + step)
+        else:
+            # 差
+            next_step = data[:-1] + step
+        idx = np.flatnonzero(data[1:] >= next_step) + 1
+        return [d.tolist() for d in np.split(data, idx)]
+
+    def calc_T(self):
+        self._raw = np.asarray(self.raw_data)
+        self._sum = self._raw[:, 0] + self._raw[:, 1]
+        self.sum_list = self._sum.tolist()
+        self._log.debug('sum_list=%s', self.sum_list)
+
+        self.fq_list = self.fq_dist(self._sum, 0.2)
+        self._log.debug('fq_list=%s', self.fq_list)
+
+        # 合計は組込みの sum() で求める (浮動小数点の丸め誤差をそろえるため)
+        self.T = (sum(self.fq_list[0]) / len(self.fq_list[0])) / 2
+        self._log.debug('T=%.2f[us]', self.T)
+
+    def calc_Td(self):
+        # 一番小さいグループ = そのグループの最大値以下
+        mask = self._sum <= self.fq_list[0][-1]
+        self.T1 = {'pulse': self._raw[mask, 0].tolist(),
+                   'space': self._raw[mask, 1].tolist()}
+        self.T1_ave = {}
+        for key in ['pulse', 'space']:
+            self.T1_ave[key] = sum(self.T1[key]) / len(self.T1[key])
+        self.Td_p = abs(self.T1_ave['pulse'] - self.T)
+        self.Td_s = abs(self.T1_ave['space'] - self.T)
+        self.Td = (self.Td_p + self.Td_s) / 2
+        self._log.debug('Td=%.2f, Td_p=%.2f, Td_s=%.2f',
+                        self.Td, self.Td_p, self.Td_s)
+
+    def fit_T1(self, T, Td):
+        # 要素ごとの演算は配列で行い、
+        # 合計は組込みの sum() で求める (IrAnalyzeと結果をそろえるため)
+        (T0, Td0) = (T, Td)
+
+        x = self._raw.reshape(-1)
+        sgn = np.tile([1, -1], len(self._raw))
+
+        k_prev = None
+        for loop in range(self.T_FIT_LOOP_MAX):
+            k = np.maximum(np.rint((x - sgn * Td) / T), 1).astype(int)
+            if k_prev is not None and np.array_equal(k, k_prev):
+                break
+            k_prev = k
+
+            mask = k <= self.T_FIT_K_MAX
+            n = int(np.count_nonzero(mask))
+            if n == 0:
+                return T0, Td0, 0.0
+            k1, s1, x1 = k[mask], sgn[mask], x[mask]
+            s_kk = sum((k1 * k1).tolist())
+            s_ks = sum((k1 * s1).tolist())
+            s_kx = sum((k1 * x1).tolist())
+            s_sx = sum((s1 * x1).tolist())
+            det = s_kk * n - s_ks * s_ks
+            if det == 0:
+                break
+
+            T = (s_kx * n - s_ks * s_sx) / det
+            Td = (s_kk * s_sx - s_ks * s_kx) / det
+            if T < self.T_MIN:
+                return T0, Td0, 0.0
+
+        mask = k <= self.T_FIT_K_MAX
+        if not mask.any():
+            return T0, Td0, 0.0
+        err = np.abs((x[mask] - sgn[mask] * Td) / T - k[mask]).tolist()
+        conf = max(1.0 - 2 * sum(err) / len(err), 0.0)
+        self._log.debug('T=%.2f, Td=%.2f, conf=%.3f, loop=%d',
+                        T, Td, conf, loop)
+        return T, Td, conf
+
+    def quantize(self):
+        n_float = np.empty(self._raw.shape)
+        n_float[:, 0] = (self._raw[:, 0] - self.Td) / self.T
+        n_float[:, 1] = (self._raw[:, 1] + self.Td) / self.T
+        self._n = np.rint(n_float).astype(int)
+
+        self.n_list_float = n_float.tolist()
+        self.n_list = self._n.tolist()
+        self._log.debug('n_list_float=%s', self.n_list_float)
+        self._log.debug('n_list=%s', self.n_list)
+
+    def extract_pattern(self):
+        pattern, self._n_idx = np.unique(self._n, axis=0, return_inverse=True)
+        self.n_pattern = pattern.tolist()
+        self._log.debug('n_pattern=%s', self.n_pattern)
+
+    def make_sig_list(self):
+        # パターン番号 -> キー のリストを作り、self.n_list全体に一括適用
+        pat2key = []
+        for p in self.n_pattern:
+            pat2key.append([key for key in self.sig2n if p in self.sig2n[key]])
+
+        self.sig_list = []
+        for i in self._n_idx.reshape(-1).tolist():
+            self.sig_list += pat2key[i]
+        self._log.debug('sig_list=%s', self.sig_list)
+
+
+class IrConsensus:
+    """
+    同じボタンの信号を複数回受信し、多数決で一つの解析結果を作る
+
+    1. 全ての受信データをまとめて、T, Td を求める
+    2. それぞれの受信データを、共通の T, Td で量子化する
+    3. 最も多い長さの受信データを基準にして、
+       それぞれの受信データの位置を合わせる(編集距離によるアラインメント)
+    4. 位置ごとに [n_pulse, n_space] を多数決で決め、
+       多数派の pulse, space の中央値から、一つの信号を合成する
+       (過半数の受信データに存在しない位置は、ノイズとして除く)
+    5. 合成した信号を解析する
+    """
+    def __init__(self, analyzer=None, debug=False):
+        """
+        Parameters
+        ----------
+        analyzer: IrAnalyze
+          None の場合は、IrAnalyzeを生成する
+        """
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('analyzer=%s', analyzer)
+
+        self.analyzer = analyzer
+        if self.analyzer is None:
+            self.analyzer = IrAnalyze(debug=self._dbg)
+
+        self.raw_data_list = []
+        self.agree = []
+        self.conf = None
+
+    def clear(self):
+        self._log.debug('')
+        self.raw_data_list = []
+
+    def add(self, raw_data):
+        """
+        受信データを追加する
+
+        Returns
+        -------
+        n: int
+          蓄積された受信データの数
+        """
+        self._log.debug('raw_data=%s', raw_data)
+
+        if len(raw_data) < self.analyzer.RAW_DATA_LEN_MIN:
+            self._log.warning('too short:%s .. ignored', raw_data)
+        else:
+            self.raw_data_list.append(raw_data)
+        return len(self.raw_data_list)
+
+    def quantize(self, raw_data, T, Td):
+        """
+        Returns
+        -------
+        n_list: [(n_p, n_s), ..]
+          T_FIT_K_MAXより長いものは、T_FIT_K_MAX + 1 とする
+          (trailerなどの長さのばらつきを無視するため)
+        """
+        k_max = self.analyzer.T_FIT_K_MAX + 1
+        return [(min(round((p - Td) / T), k_max),
+                 min(round((s + Td) / T), k_max)) for p, s in raw_data]
+
+    def analyze(self):
+        """
+        Returns
+        -------
+        result: dict
+          IrAnalyze.analyze()と同じ
+          None: error (一致しない場合も)
+        """
+        self._log.debug('')
+
+        if len(self.raw_data_list) == 0:
+            self._log.warning('no data')
+            return None
+
+        # 1. 全ての受信データをまとめて、T, Td を求める
+        an = self.analyzer
+        an.raw_data = [d for raw_data in self.raw_data_list for d in raw_data]
+        an.calc_T()
+        an.calc_Td()
+        an.fit_T()
+        (T, Td) = (an.T, an.Td)
+        self._log.debug('T=%.2f, Td=%.2f', T, Td)
+
+        # 2. 量子化
+        n_lists = [self.quantize(raw_data, T, Td)
+                   for raw_data in self.raw_data_list]
+
+        # 3. 基準: 最も多い長さの受信データ
+        ref_len = Counter([len(n) for n in n_lists]).most_common(1)[0][0]
+        ref_n = [n for n in n_lists if len(n) == ref_len][0]
+        self._log.debug('ref_len=%d, ref_n=%s', ref_len, ref_n)
+
+        votes = [[] for i in range(ref_len)]
+        for raw_data, n_list in zip(self.raw_data_list, n_lists):
+            for i, j in self.align(ref_n, n_list):
+                votes[i].append([n_list[j], raw_data[j]])
+
+        # 4. 位置ごとに多数決
+        cons_raw = []
+        self.agree = []
+        for v in votes:
+            if len(v) <= len(self.raw_data_list) / 2:
+                self._log.debug('v=%s .. ignored', v)
+                continue
+            (n, count) = Counter([n for n, d in v]).most_common(1)[0]
+            d = [d for n1, d in v if n1 == n]
+            cons_raw.append([self.median([p for p, s in d]),
+                             self.median([s for p, s in d])])
+            self.agree.append(count / len(self.raw_data_list))
+        if not self.agree:
+            # 過半数が一致する位置がない (全てノイズなど)
+            self._log.warning('no consensus')
+            self.conf = 0.0
+            return None
+        self.conf = sum(self.agree) / len(self.agree)
+        self._log.debug('cons_raw=%s', cons_raw)
+        self._log.debug('agree=%s, conf=%.3f', self.agree, self.conf)
+
+        # 5. 解析
+        return an.analyze(cons_raw)
+
+    def align(self, ref, seq):
+        """
+        編集距離(挿入・削除・置換のコスト=1)による、
+        ``ref``と``seq``のアラインメント
+
+        Returns
+        -------
+        pairs: [(i, j), ..]
+          ref[i] と seq[j] が対応する(一致、または置換)
+        """
+        n, m = len(ref), len(seq)
+        cost = [list(range(m + 1))]
+        for i in range(1, n + 1):
+            row = [i]
+            for j in range(1, m + 1):
+                row.append(min(cost[i - 1][j - 1] +
+                               (ref[i - 1] != seq[j - 1]),
+                               cost[i - 1][j] + 1,
+                               row[j - 1] + 1))
+            cost.append(row)
+
+        pairs = []
+        i, j = n, m
+        while i > 0 and j > 0:
+            if cost[i][j] == cost[i - 1][j - 1] + (ref[i - 1] != seq[j - 1]):
+                i, j = i - 1, j - 1
+                pairs.append((i, j))
+            elif cost[i][j] == cost[i - 1][j] + 1:
+                i -= 1
+            else:
+                j -= 1
+        pairs.reverse()
+        return pairs
+
+    def median(self, data):
+        data = sorted(data)
+        n = len(data)
+        if n % 2 == 1:
+            return data[n // 2]
+        return (data[n // 2 - 1] + data[n // 2]) / 2
+
+
 #####
 import threading
 import queue
 import os
+import sys
 
 
 class App:
@@ -469,20 +931,31 @@ class App:
     IrAnalyzeクラスを使った実例
     """
     PULSE_SPACE_FILE = '/tmp/pulse_space.txt'
+    JSON_LOG_FILE    = '/tmp/ir_dump.jsonl'
     JSON_DUMP_FILE   = '/tmp/ir_dump.irconf'
 
     MSG_END = ''
 
-    def __init__(self, pin, n=0, verbose=False, debug=False):
+    def __init__(self, pin, n=0, verbose=False, use_np=False, consensus_n=0,
+                 debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, debug)
-        self._log.debug('pin=%d, n=%d, verbose=%s', pin, n, verbose)
+        self._log.debug('pin=%d, n=%d, verbose=%s, use_np=%s, consensus_n=%d',
+                        pin, n, verbose, use_np, consensus_n)
 
         self.pin     = pin
         self.n       = n
         self.verbose = verbose
 
-        self.analyzer = IrAnalyze(debug=self._dbg)
+        if use_np:
+            self.analyzer = IrAnalyzeNp(debug=self._dbg)
+        else:
+            self.analyzer = IrAnalyze(debug=self._dbg)
+
+        self.consensus_n = consensus_n
+        self.consensus = None
+        if self.consensus_n > 1:
+            self.consensus = IrConsensus(self.analyzer, debug=self._dbg)
         self.receiver = IrRecv(self.pin, verbose=self.verbose,
                                debug=self._dbg)
 
@@ -499,6 +972,9 @@ class App:
         メッセージキューから``raw_data``を取出し、
         信号解析する。
 
+        ``consensus_n``が指定されている場合は、
+        ``consensus_n``回分の受信データを蓄積してから、まとめて解析する。
+
         raw_data: [[pulse1, space1], [pulse2, space2], ..]
         """
         self._log.debug('')
@@ -515,7 +991,22 @@ class App:
                     f.write('pulse %d\n' % p)
                     f.write('space %d\n' % s)
 
-            result = self.analyzer.analyze(raw_data)
+            if self.consensus is None:
+                result = self.analyzer.analyze(raw_data)
+            else:
+                count = self.consensus.add(raw_data)
+                print('(%d/%d)' % (count, self.consensus_n))
+                if count < self.consensus_n:
+                    continue
+
+                result = self.consensus.analyze()
+                self.consensus.clear()
+                if not self.consensus.agree:
+                    print('no consensus')
+                    continue
+                if result is not None:
+                    print('consensus: agree=%.2f (min %.2f)' %
+                          (self.consensus.conf, min(self.consensus.agree)))
             self._log.debug('result=%s', result)
             if result is None:
                 print('invalid signal .. ignored')
@@ -527,21 +1018,18 @@ class App:
                 json_str = json.dumps(result['buttons']['button1'])
                 if self.n > 1:
                     print('[%d/%d],' % (self.serial_num, self.n), end='')
-                print('%s,%s,T=%d,%s' % (dev_name1, result['format'],
-                                         round(result['T']), json_str))
-
+                print('%s,%s,T=%d(%.2f),%s' % (dev_name1, result['format'],
+                                               round(result['T']),
+                                               self.analyzer.T_conf,
+                                               json_str))
+
+                # 解析結果は、一行ずつ追記する
+                # (irconf形式のファイルは、dump_irconf()で生成)
+                mode = 'a'
                 if self.serial_num == 1:
-                    dump_data = [result]
-                else:
-                    with open(self.JSON_DUMP_FILE, 'r') as f:
-                        dump_data = json.load(f)
-                    dump_data.append(result)
-
-                json_str = self.analyzer.json_dumps(dump_data)
-                self._log.debug('json_str=%s', json_str)
-
-                with open(self.JSON_DUMP_FILE, 'w') as f:
-                    f.write(json_str)
+                    mode = 'w'
+                with open(self.JSON_LOG_FILE, mode) as f:
+                    f.write(json.dumps(result) + '\n')
 
                 if len(result['sym_tbl']['?']) > 0:
                     print('\'?\': %s .. try again' %
@@ -551,6 +1039,10 @@ class App:
                     print('\'=\' in \'%s\' .. try again' %
                           result['sym_tbl']['='])
                     continue
+                if self.analyzer.T_conf < self.analyzer.T_CONF_MIN:
+                    print('T_conf=%.2f < %.2f .. try again' %
+                          (self.analyzer.T_conf, self.analyzer.T_CONF_MIN))
+                    continue
 
                 if self.n > 0 and self.serial_num == self.n:
                     self._log.debug('serial_num=%d', self.serial_num)
@@ -570,6 +1062,8 @@ class App:
         """
         self._log.debug('')
 
+        count_max = self.n * max(self.consensus_n, 1)
+
         count = 0
         while True:
             raw_data = self.receiver.recv()
@@ -577,8 +1071,8 @@ class App:
             self.msgq.put(raw_data)
 
             count += 1
-            if self.n > 0 and count == self.n:
-                self._log.debug('count=%d/%d', count, self.n)
+            if self.n > 0 and count == count_max:
+                self._log.debug('count=%d/%d', count, count_max)
                 break
 
     def end(self):
@@ -590,9 +1084,35 @@ class App:
             self.th_worker.join()
 
         self.receiver.end()
+
+        if self.serial_num > 0:
+            dump_irconf(self.analyzer, self.JSON_LOG_FILE, self.JSON_DUMP_FILE)
         self._log.debug('done')
 
 
+def dump_irconf(analyzer, log_file=App.JSON_LOG_FILE,
+                dump_file=App.JSON_DUMP_FILE):
+    """
+    JSON Lines形式の解析結果``log_file``から、
+    irconf形式のファイル``dump_file``を生成する
+
+    Returns
+    -------
+    result: bool
+      False: ``log_file``がない、または、空
+    """
+    if not os.path.exists(log_file):
+        return False
+
+    dev_list = analyzer.load_jsonl(log_file)
+    if len(dev_list) == 0:
+        return False
+
+    with open(dump_file, 'w') as f:
+        f.write(analyzer.json_dumps(dev_list))
+    return True
+
+
 #
 # main
 #
@@ -610,13 +1130,28 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
               help='number of signal to anlyze')
 @click.option('--verbose', '-v', 'verbose', is_flag=True, default=False,
               help='verbose mode')
+@click.option('--numpy', 'use_np', is_flag=True, default=False,
+              help='use NumPy for analysis')
+@click.option('--consensus', '-c', 'consensus_n', type=int, default=0,
+              help='number of captures per signal (consensus mode)')
+@click.option('--dump', 'dump', is_flag=True, default=False,
+              help='generate %s from %s and exit' % (App.JSON_DUMP_FILE,
+                                                     App.JSON_LOG_FILE))
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(pin, n, verbose, debug):
+def main(pin, n, verbose, use_np, consensus_n, dump, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('pin=%d, n=%d', pin, n)
+    logger.debug('pin=%d, n=%d, use_np=%s, consensus_n=%d, dump=%s',
+                 pin, n, use_np, consensus_n, dump)
+
+    if dump:
+        if not dump_irconf(IrAnalyze(debug=debug)):
+            print('no capture log: %s' % App.JSON_LOG_FILE)
+            sys.exit(1)
+        print(App.JSON_DUMP_FILE)
+        return
 
-    app = App(pin, n, verbose, debug=debug)
+    app = App(pin, n, verbose, use_np, consensus_n, debug=debug)
     try:
         app.main()
     finally:
@@ -10,7 +10,8 @@ __date__   = '2019'
 
 import json
 from pathlib import Path
-from MyLogger import get_logger
+from IrTrace import tracer
+from FastLogger import get_logger, lazy
 
 
 #####
@@ -104,13 +105,15 @@ class IrConfig:
         '': error
 
         """
-        self._log.debug('macro_data=%s', json.dumps(macro_data, indent=2))
+        self._log.debug('macro_data=%s',
+                        lazy(json.dumps, macro_data, indent=2))
         self._log.debug('button_str=%s', button_str)
 
-        for m in macro_data:
-            self._log.debug('m=%s', m)
-            button_str = button_str.replace(m, macro_data[m])
-            self._log.debug('button_str=%s', button_str)
+        with tracer.span('expand_button_macro', macros=len(macro_data)):
+            for m in macro_data:
+                button_str = button_str.replace(m, macro_data[m])
+                if __debug__ and self._dbg:
+                    self._log.debug('m=%s, button_str=%s', m, button_str)
 
         if '[' in button_str or ']' in button_str:
             self._log.error('invalid macro: button_str=%s', button_str)
@@ -219,6 +222,17 @@ class IrConfig:
         return syms, button_rep
 
     def get_raw_data(self, dev_name, button_name):
+        """
+        ``get_raw_data1()``のトレース用のラッパー
+        """
+        with tracer.span('get_raw_data', dev=dev_name,
+                         button=button_name) as sp:
+            raw_data, repeat = self.get_raw_data1(dev_name, button_name)
+            if raw_data is not None:
+                sp.set(pulses=len(raw_data), repeat=repeat)
+        return raw_data, repeat
+
+    def get_raw_data1(self, dev_name, button_name):
         """
         デバイス情報を取得して、
         指定されたボタンの[pulse, space] のリストと
@@ -294,17 +308,15 @@ class IrConfig:
         for d_ent in self.data:
             try:
                 d_nlist = d_ent['data']['dev_name']
-                self._log.debug('d_nlist=%s', d_nlist)
             except KeyError:
                 self._log.warning('KeyError .. ignored: %s', d_ent)
                 continue
 
             if type(d_nlist) != list:
                 d_nlist = [d_nlist]
+            if __debug__ and self._dbg:
                 self._log.debug('d_nlist=%s', d_nlist)
             for d_name in d_nlist:
-                self._log.debug('d_name=%s', d_name)
-
                 if d_name == dev_name:
                     self._log.debug('%s: found', dev_name)
                     return d_ent
@@ -0,0 +1,32 @@
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrConst.py -- サーバーとクライアントで共有する定数
+
+クライアントが、サーバー側のモジュール(TcpCmdServer, IrSendCmdServer,
+IrSend, pigpio ..)を importしなくてすむように、
+ここには定数だけを定義し、何も importしない。
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+# TcpCmdServer: リプライの rc
+RC_OK = 'OK'
+RC_NG = 'NG'
+RC_CONT = 'CONTINUE'
+RC_ACCEPT = 'ACCEPT'
+
+# TcpCmdServer: リプライの終端
+EOF = '\x04'
+
+TCPCMD_PORT = 59001
+
+# IrSendCmdServer
+IRSEND_PORT = 51001
+IRSEND_CMD = 'irsend'
+IRSEND_SOCK = '/tmp/irsend.sock'
+IRSEND_STATE = '@state'  # 最後に送信した状態 (IrStateCache)
+
+# AutoAirconServer
+AUTOAIRCON_PORT = 51002
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrLoopback.py -- 送受信のループバック・セルフテスト
+
+送信ピンと受信ピンを(赤外線LEDと受信モジュールで)向かい合わせにして、
+ボタンごとに、IrSendで送信した信号を IrRecv で受信し、IrAnalyze で解析して、
+irconfから求めた期待値と比較する。
+
+  ms:     送信開始から受信完了までの時間 (受信のタイムアウトを含む)
+  drift:  最初のフレームの、受信した時間と期待値の差の累積 [us]
+  bias:   mark/space一つ当たりの平均の誤差 [us]
+
+--fake を指定すると、FakePigpio で送信ピンと受信ピンをつないで、
+ハードウェアなしでテストできる。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import sys
+import threading
+import time
+
+import FakePigpio
+from IrConfig import IrConfig
+from MyLogger import get_logger
+
+
+class IrLoopback:
+    """
+    送受信のループバック・テスト
+    """
+    DEF_TX_PIN = 22
+    DEF_RX_PIN = 27
+
+    READY_SEC = 0.1     # 受信開始を待つ時間
+    RECV_TIMEOUT = 5.0  # sec
+
+    def __init__(self, tx_pin=DEF_TX_PIN, rx_pin=DEF_RX_PIN,
+                 conf_dir=IrConfig.DEF_CONF_DIR, fake=False, realtime=False,
+                 debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('tx_pin=%d, rx_pin=%d, conf_dir=%s, fake=%s, '
+                        'realtime=%s', tx_pin, rx_pin, conf_dir, fake,
+                        realtime)
+
+        if fake:
+            FakePigpio.install()
+            FakePigpio.daemon.conf['time_scale'] = 1.0 if realtime else 0.0
+            FakePigpio.daemon.connect(tx_pin, rx_pin)
+
+        # pigpio を使うモジュールは、FakePigpio.install() の後に import する
+        from IrSend import IrSend
+        from IrRecv import IrRecv
+        from IrAnalyze import IrAnalyze
+
+        self.irsend = IrSend(tx_pin, load_conf=False, debug=self._dbg)
+        self.irsend.irconf = IrConfig(conf_dir, load_all=True,
+                                      debug=self._dbg)
+        self.irconf = self.irsend.irconf
+
+        self.irrecv = IrRecv(rx_pin, debug=self._dbg)
+        self.rx_data = None
+
+        self.an = IrAnalyze(debug=self._dbg)
+
+    def end(self):
+        self._log.debug('')
+        self.irsend.end()
+        self.irrecv.pi.stop()
+
+    def buttons(self, dev_name=None):
+        """
+        Returns
+        -------
+        [[dev_name, button_name], ..]
+        """
+        b_list = []
+        for d_ent in self.irconf.data:
+            dev = d_ent['data']
+            d_name = dev['dev_name']
+            if type(d_name) == list:
+                d_name = d_name[0]
+            if dev_name is not None and dev_name != d_name:
+                continue
+            for b in dev['buttons']:
+                if dev['buttons'][b] != '':
+                    b_list.append([d_name, b])
+        return b_list
+
+    def recv1(self):
+        self.rx_data = self.irrecv.recv()
+
+    def recv_cancel(self):
+        """
+        受信を中止する
+        """
+        self._log.debug('')
+        self.irrecv.set_watchdog(self.irrecv.WATCHDOG_CANCEL)
+        self.irrecv.cb_recv.cancel()
+        self.irrecv.receiving = False
+        self.irrecv.msgq.put(self.irrecv.MSG_END)
+
+    def loopback(self, dev_name, button_name):
+        """
+        一つのボタンを送信して、受信・解析する
+
+        Returns
+        -------
+        result: dict
+          None: 送信できない
+        """
+        self._log.debug('dev_name=%s, button_name=%s',
+                        dev_name, button_name)
+
+        raw_data, repeat = self.irconf.get_raw_data(dev_name, button_name)
+        if raw_data is None:
+            return None
+        if self.an.analyze(raw_data) is None:
+            return None
+        expect = self.an.sig_str2
+
+        self.rx_data = None
+        th = threading.Thread(target=self.recv1, daemon=True)
+        th.start()
+        time.sleep(self.READY_SEC)
+
+        t_start = time.perf_counter()
+        if not self.irsend.send(dev_name, button_name):
+            self.recv_cancel()
+            th.join()
+            return None
+        th.join(self.RECV_TIMEOUT)
+        t_ms = (time.perf_counter() - t_start) * 1000
+        if th.is_alive():
+            self._log.warning('%s %s: timeout', dev_name, button_name)
+            self.recv_cancel()
+            th.join()
+
+        rx_data = self.rx_data
+        self._log.debug('rx_data=%s', rx_data)
+
+        result = {
+            'dev_name': dev_name,
+            'button': button_name,
+            'ms': t_ms,
+            'frames': 0,
+            'drift': None,
+            'bias': None,
+            'ok': False,
+        }
+        if rx_data is None or len(rx_data) == 0:
+            return result
+
+        # 最初のフレームの誤差 (最後の space は除く)
+        err = []
+        for (p, s), rx in zip(raw_data[:-1], rx_data):
+            err.append(rx[0] - p)
+            if len(rx) > 1:
+                err.append(rx[1] - s)
+        if len(err) > 0:
+            result['drift'] = sum(err)
+            result['bias'] = sum(err) / len(err)
+
+        if self.an.analyze(rx_data) is not None:
+            sig_str = self.an.sig_str2
+            # 繰り返し送信は、一つの受信信号になることがある
+            for k in range(1, repeat + 1):
+                if sig_str == expect * k:
+                    result['frames'] = k
+                    result['ok'] = True
+                    break
+            self._log.debug('expect=%s, sig_str=%s', expect, sig_str)
+
+        self._log.debug('result=%s', result)
+        return result
+
+
+#####
+class App:
+    HDR_FMT = '%-16s %-16s %8s %8s %8s %s'
+    RES_FMT = '%-16s %-16s %8.1f %8s %8s %s'
+
+    def __init__(self, args, tx_pin, rx_pin, conf_dir, fake, realtime,
+                 verbose=False, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('args=%s, tx_pin=%d, rx_pin=%d, conf_dir=%s',
+                        args, tx_pin, rx_pin, conf_dir)
+
+        self.args = args
+        self.verbose = verbose
+
+        self.lb = IrLoopback(tx_pin, rx_pin, conf_dir, fake, realtime,
+                             debug=self._dbg)
+
+    def main(self):
+        self._log.debug('')
+
+        if len(self.args) == 0:
+            b_list = self.lb.buttons()
+        elif len(self.args) == 1:
+            b_list = self.lb.buttons(self.args[0])
+        else:
+            b_list = [[self.args[0], b] for b in self.args[1:]]
+
+        print(self.HDR_FMT % ('dev', 'button', 'ms', 'drift', 'bias', ''))
+        results = []
+        n_skip = 0
+        for dev_name, button in b_list:
+            r = self.lb.loopback(dev_name, button)
+            if r is None:
+                n_skip += 1
+                continue
+            results.append(r)
+
+            if self.verbose or not r['ok'] or len(self.args) > 1:
+                print(self.RES_FMT % (
+                    dev_name[:16], button[:16], r['ms'],
+                    '-' if r['drift'] is None else '%d' % r['drift'],
+                    '-' if r['bias'] is None else '%.1f' % r['bias'],
+                    'OK' if r['ok'] else 'NG'))
+
+        if len(results) == 0:
+            print('no buttons')
+            return False
+
+        n_ok = len([r for r in results if r['ok']])
+        ms = sorted([r['ms'] for r in results])
+        drift = [abs(r['drift']) for r in results if r['drift'] is not None]
+        bias = [r['bias'] for r in results if r['bias'] is not None]
+        print('OK: %d/%d (%.1f%%), skipped: %d' % (
+            n_ok, len(results), n_ok / len(results) * 100, n_skip))
+        print('latency: ave %.1f ms, 95%% %.1f ms' % (
+            sum(ms) / len(ms), ms[min(int(len(ms) * 0.95), len(ms) - 1)]))
+        if len(drift) > 0:
+            print('drift: ave %.1f us, max %d us, bias %.2f us' % (
+                sum(drift) / len(drift), max(drift), sum(bias) / len(bias)))
+        return n_ok == len(results)
+
+    def end(self):
+        self._log.debug('')
+        self.lb.end()
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='IR loopback self test (send -> recv -> analyze)')
+@click.argument('args', type=str, nargs=-1)
+@click.option('--tx_pin', '-t', 'tx_pin', type=int,
+              default=IrLoopback.DEF_TX_PIN, help='TX pin number')
+@click.option('--rx_pin', '-r', 'rx_pin', type=int,
+              default=IrLoopback.DEF_RX_PIN, help='RX pin number')
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, multiple=True,
+              help='irconf directory')
+@click.option('--fake', '-f', 'fake', is_flag=True, default=False,
+              help='use FakePigpio (TX is wired to RX)')
+@click.option('--realtime', 'realtime', is_flag=True, default=False,
+              help='real transmission time (with --fake)')
+@click.option('--verbose', '-v', 'verbose', is_flag=True, default=False,
+              help='print all buttons')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(args, tx_pin, rx_pin, conf_dir, fake, realtime, verbose, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('args=%s, tx_pin=%d, rx_pin=%d, conf_dir=%s, fake=%s',
+                 args, tx_pin, rx_pin, conf_dir, fake)
+
+    if len(conf_dir) == 0:
+        conf_dir = IrConfig.DEF_CONF_DIR
+    else:
+        conf_dir = list(conf_dir)
+
+    app = App(args, tx_pin, rx_pin, conf_dir, fake, realtime, verbose,
+              debug=debug)
+    ok = False
+    try:
+        ok = app.main()
+    finally:
+        logger.debug('finally')
+        app.end()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,7 @@ import pigpio
 import time
 import queue
 import threading
-from MyLogger import get_logger
+from FastLogger import get_logger
 
 
 #####
@@ -71,7 +71,8 @@ class IrRecv:
         ms: int
           msec
         """
-        self._log.debug('ms=%d', ms)
+        if __debug__ and self._dbg:
+            self._log.debug('ms=%d', ms)
         self.pi.set_watchdog(self.pin, ms)
 
     def cb_func_recv(self, pin, val, tick):
@@ -84,7 +85,8 @@ class IrRecv:
         最小限の処理にとどめて、ほとんどの処理はサブスレッドに任せる。
 
         """
-        self._log.debug('pin=%d, val=%d, tick=%d', pin, val, tick)
+        if __debug__ and self._dbg:
+            self._log.debug('pin=%d, val=%d, tick=%d', pin, val, tick)
 
         if not self.receiving:
             self._log.debug('reciving=%s .. ignore', self.receiving)
@@ -117,7 +119,8 @@ class IrRecv:
 
         while True:
             msg = self.msgq.get()
-            self._log.debug('msg=%s', msg)
+            if __debug__ and self._dbg:
+                self._log.debug('msg=%s', msg)
             if msg == self.MSG_END:
                 break
 
@@ -138,7 +141,8 @@ class IrRecv:
           GPIOピンの状態変化
 
         """
-        self._log.debug('msg=%s', msg)
+        if __debug__ and self._dbg:
+            self._log.debug('msg=%s', msg)
 
         if type(msg) != list:
             self._log.waring('invalid msg:%s .. ignored', msg)
@@ -150,7 +154,8 @@ class IrRecv:
         [pin, val, tick] = msg
 
         interval = tick - self.tick
-        self._log.debug('interval=%d', interval)
+        if __debug__ and self._dbg:
+            self._log.debug('interval=%d', interval)
         self.tick = tick
 
         if val == pigpio.TIMEOUT:
@@ -183,7 +188,8 @@ class IrRecv:
             else:
                 self.raw_data.append([interval])
 
-        self._log.debug('raw_data=%s', self.raw_data)
+        if __debug__ and self._dbg:
+            self._log.debug('raw_data=%s', self.raw_data)
 
     def recv(self):
         """
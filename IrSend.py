@@ -11,9 +11,10 @@ __date__   = '2019'
 
 
 from IrConfig import IrConfig
+from IrTrace import tracer
 import pigpio
 import time
-from MyLogger import get_logger
+from FastLogger import get_logger
 
 
 class WaveForm:
@@ -43,7 +44,9 @@ class WaveForm:
             raise ValueError(msg)
         if usec <= 0:
             raise ValueError('usec[' + str(usec) + '] must be > 0')
-        self._log.debug('onoff:%-3s, usec=%s', self.ONOFF_STR[onoff], usec)
+        if __debug__ and self._dbg:
+            self._log.debug('onoff:%-3s, usec=%s',
+                            self.ONOFF_STR[onoff], usec)
 
         if onoff == self.ON:
             self.waveform.append(pigpio.pulse(1 << self.pin, 0, usec))
@@ -55,12 +58,11 @@ class WaveForm:
         onoff_list:
           [on_usec1, off_usec1, on_usec2, off_usec2, ...]
         """
-        verr_msg = 'onoff_list:' + str(onoff_list) + ' must be int list'
-        if type(onoff_list) != list:
-            raise ValueError(verr_msg)
-        if type(onoff_list[0]) != int:
-            raise ValueError(verr_msg)
-        self._log.debug('onoff_list=%s', onoff_list)
+        if type(onoff_list) != list or type(onoff_list[0]) != int:
+            raise ValueError('onoff_list:' + str(onoff_list) +
+                             ' must be int list')
+        if __debug__ and self._dbg:
+            self._log.debug('onoff_list=%s', onoff_list)
 
         for i, usec in enumerate(onoff_list):
             if i % 2 == 0:
@@ -123,8 +125,10 @@ class Wave(WaveForm):
     def create_wave(self):
         self._log.debug('len(waveform): %d', len(self.waveform))
 
-        self.pi.wave_add_generic(self.waveform)
-        self.wave = self.pi.wave_create()
+        with tracer.span('wave_create', pulses=len(self.waveform)) as sp:
+            self.pi.wave_add_generic(self.waveform)
+            self.wave = self.pi.wave_create()
+            sp.set(wave_id=self.wave)
         return self.wave
 
     def delete(self):
@@ -194,9 +198,10 @@ class IrSend:
 
     def create_pulse_wave1(self, usec, freq=DEF_FREQ, duty=DEF_DUTY):
         self._log.debug('usec: %d, freq=%d', usec, freq)
-        wave = Wave(self.pi, self.pin, debug=self._dbg)
-        wave.append_carrier(freq, duty, usec)
-        return wave.create_wave()
+        with tracer.span('create_pulse_wave', usec=usec):
+            wave = Wave(self.pi, self.pin, debug=self._dbg)
+            wave.append_carrier(freq, duty, usec)
+            return wave.create_wave()
 
     def clear_pulse_wave_hash(self):
         self._log.debug('')
@@ -225,9 +230,10 @@ class IrSend:
 
     def create_space_wave1(self, usec):
         self._log.debug('usec: %d', usec)
-        wave = Wave(self.pi, self.pin, debug=self._dbg)
-        wave.append_null(int(round(usec)))
-        return wave.create_wave()
+        with tracer.span('create_space_wave', usec=usec):
+            wave = Wave(self.pi, self.pin, debug=self._dbg)
+            wave.append_null(int(round(usec)))
+            return wave.create_wave()
 
     def create_space_wave(self, usec):
         self._log.debug('usec: %d', usec)
@@ -259,19 +265,24 @@ class IrSend:
         w = []
 
         total_us = 0
-        for pulse, space in raw_data:
-            total_us += pulse + space
+        with tracer.span('build_waves', pulses=len(raw_data)) as sp:
+            for pulse, space in raw_data:
+                total_us += pulse + space
 
-            w.append(self.create_pulse_wave(pulse))
-            w.append(self.create_space_wave(space))
+                w.append(self.create_pulse_wave(pulse))
+                w.append(self.create_space_wave(space))
+            sp.set(waves=len(w))
         self._log.debug('total_us: %d', total_us)
 
         for i in range(repeat):
-            self.pi.wave_chain(w)
+            with tracer.span('wave_chain', waves=len(w),
+                             pulses=len(raw_data)):
+                self.pi.wave_chain(w)
 
-            while self.pi.wave_tx_busy():
-                time.sleep(0.01)
-            time.sleep(0.005)
+            with tracer.span('tx_busy_wait', total_us=total_us):
+                while self.pi.wave_tx_busy():
+                    time.sleep(0.01)
+                time.sleep(0.005)
 
         self.clean_wave()
 
@@ -286,10 +297,13 @@ class IrSend:
                 self._log.error('loading config files: failed')
                 return False
 
-        raw_data, repeat = self.irconf.get_raw_data(dev_name, button_name)
-        if raw_data is None:
-            return False
-        return self.send_raw_data(raw_data, repeat)
+        with tracer.span('send', dev=dev_name, button=button_name) as sp:
+            raw_data, repeat = self.irconf.get_raw_data(dev_name,
+                                                        button_name)
+            if raw_data is None:
+                return False
+            sp.set(pulses=len(raw_data), repeat=repeat)
+            return self.send_raw_data(raw_data, repeat)
 
     def get_dev_list(self):
         self._log.debug('')
@@ -507,12 +521,17 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
               help='pin number')
 @click.option('-n', 'n', type=int, default=1)
 @click.option('--interval', '-i', 'interval', type=float, default=0.0)
+@click.option('--trace', '-t', 'trace', type=str, default='',
+              help='trace file (Chrome trace-event JSON)')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(args, pin, interval, n, debug):
+def main(args, pin, interval, n, trace, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('args=%s, n=%d, interval=%f, pin=%d',
-                 args, n, interval, pin)
+    logger.debug('args=%s, n=%d, interval=%f, pin=%d, trace=%s',
+                 args, n, interval, pin, trace)
+
+    if trace != '':
+        tracer.enable()
 
     app = App(args, n, interval, pin, debug=debug)
     try:
@@ -520,6 +539,9 @@ def main(args, pin, interval, n, debug):
     finally:
         logger.debug('finally')
         app.end()
+        if trace != '':
+            n_span = tracer.dump(trace)
+            logger.info('%s: %d spans', trace, n_span)
         logger.debug('done')
 
 
@@ -9,25 +9,28 @@ __author__ = 'Yoichi Tanibayashi'
 __date__   = '2019'
 
 from TcpCmdClient import TcpCmdClient, TcpCmdClientApp
-from IrSendCmdServer import IrSendCmd
+import IrConst
+import IrSendLite
 import json
+import sys
 
 from MyLogger import get_logger
 
 
 class IrSendCmdClient(TcpCmdClient):
     DEF_SVR_HOST = 'localhost'
-    DEF_SVR_PORT = IrSendCmd.DEF_PORT
+    DEF_SVR_PORT = IrConst.IRSEND_PORT
 
-    CMD_NAME = IrSendCmd.CMD_NAME
+    CMD_NAME = IrConst.IRSEND_CMD
 
     DEF_TIMEOUT = 3  # sec
 
-    def __init__(self, host=DEF_SVR_HOST, port=DEF_SVR_PORT, debug=False):
+    def __init__(self, host=DEF_SVR_HOST, port=DEF_SVR_PORT, unix_path=None,
+                 debug=False):
         """
         サーバーホスト、サーバーポートのデフォルト値を変えるためだけの定義
         """
-        super().__init__(host, port, debug=debug)
+        super().__init__(host, port, unix_path=unix_path, debug=debug)
 
     def send_recv(self, args,
                   timeout=DEF_TIMEOUT, newline=False):
@@ -47,13 +50,13 @@ class IrSendCmdClient(TcpCmdClient):
         #
         # len(args) > 2: [CMD_NAME, dev, btn1, .. ]
         #
-        ret = json.dumps({'rc': IrSendCmd.RC_OK})
+        ret = json.dumps({'rc': IrConst.RC_OK})
         for b in args[2:]:
             ret1 = super().send_recv(args[:2] + [b],
                                      timeout=timeout, newline=newline)
             self._log.debug('ret1=%a', ret1)
             try:
-                if json.loads(ret1)['rc'] != IrSendCmd.RC_OK:
+                if json.loads(ret1)['rc'] != IrConst.RC_OK:
                     ret = ret1
                     self._log.debug('ret1=%s', ret1)
             except Exception as e:
@@ -63,53 +66,7 @@ class IrSendCmdClient(TcpCmdClient):
 
     def reply2str(self, rep_str):
         self._log.debug('rep_str=%a', rep_str)
-
-        rep = rep_str.split('\r\n')
-        self._log.debug('rep=%a', rep)
-
-        ret = json.loads(rep[0])
-        self._log.debug('ret=%a', ret)
-
-        if type(ret) != dict:
-            self._log.warning('invalid reply foramt')
-            return ret
-
-        if 'rc' not in ret:
-            self._log.warning('invalid reply foramt')
-            ret_str = json.dumps(ret, indent=2, ensure_ascii=False)
-            return ret_str
-
-        rc = ret['rc']
-
-        if 'msg' not in ret:
-            # only rc
-            return rc
-
-        msg = ret['msg']
-
-        if type(msg) == str:
-            return '%s: %s' % (rc, msg)
-
-        if type(msg) == list:
-            # device list
-            out_str = ''
-            for d in msg:
-                out_str += str(d) + '\n'
-            return out_str.strip()
-
-        # button list
-        out_str = ''
-        if 'macro' in msg:
-            out_str += '* macro\n'
-            for m in msg['macro']:
-                out_str += '%s: %s\n' % (m, msg['macro'][m])
-
-        if 'buttons' in msg:
-            out_str += '* button\n'
-            for b in msg['buttons']:
-                out_str += '%s: %s\n' % (b, msg['buttons'][b])
-
-        return out_str.strip()
+        return IrSendLite.reply2str(rep_str)
 
 
 import click
@@ -127,16 +84,34 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
               help='server port nubmer')
 @click.option('--timeout', '-t', 'timeout', type=float,
               default=TcpCmdClient.DEF_TIMEOUT,
-              help='timeout sec(float)')
+              help='timeout sec(float) (0: send only, no reply)')
+@click.option('--unix', '-u', 'unix_path', type=str,
+              help='Unix domain socket path')
+@click.option('--batch', '-b', 'batch', is_flag=True, default=False,
+              help='read commands from stdin (one command per line)')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(args, svrhost, svrport, timeout, debug):
+def main(args, svrhost, svrport, timeout, unix_path, batch, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('args=%s, svrhost=%s, svrport=%d, timeout=%s',
-                 args, svrhost, svrport, timeout)
+    logger.debug('args=%s, svrhost=%s, svrport=%d, timeout=%s, batch=%s',
+                 args, svrhost, svrport, timeout, batch)
+    logger.debug('unix_path=%s', unix_path)
+
+    if batch:
+        if len(args) > 0:
+            raise click.UsageError('--batch: no arguments allowed')
+
+        cl = IrSendCmdClient(svrhost, svrport, unix_path=unix_path,
+                             debug=debug)
+        for args1 in IrSendLite.read_batch(sys.stdin):
+            logger.debug('args1=%s', args1)
+            rep_str = cl.send_recv(args1, timeout)
+            print(cl.reply2str(rep_str), flush=True)
+        cl.end()
+        return
 
     app = TcpCmdClientApp(IrSendCmdClient, args, svrhost, svrport, timeout,
-                          debug=debug)
+                          unix_path=unix_path, debug=debug)
     try:
         app.main()
     finally:
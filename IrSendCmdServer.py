@@ -10,7 +10,10 @@ __author__ = 'Yoichi Tanibayashi'
 __date__   = '2019'
 
 from TcpCmdServer import Cmd, CmdServerApp
+import IrConst
 from IrSend import IrSend
+from IrTrace import tracer
+from IrStateCache import IrStateCache
 import time
 
 from MyLogger import get_logger
@@ -20,14 +23,17 @@ class IrSendCmd(Cmd):
     """
     赤外線リモコン信号送信コマンドの定義
     """
-    DEF_PORT = 51001
+    DEF_PORT = IrConst.IRSEND_PORT
 
-    CMD_NAME = 'irsend'
+    CMD_NAME = IrConst.IRSEND_CMD
 
-    SUBCMD = {'LOAD': '@load'}
+    SUBCMD = {'LOAD': '@load', 'TRACE': '@trace', 'STATE': IrConst.IRSEND_STATE}
 
-    def __init__(self, init_param=(IrSend.DEF_PIN,), port=DEF_PORT,
-                 debug=False):
+    DEF_TRACE_FILE = '/tmp/irsend_trace.json'
+
+    def __init__(self, init_param=(IrSend.DEF_PIN, IrStateCache.DEF_FILE,
+                                   IrStateCache.DEF_MAX_AGE),
+                 port=DEF_PORT, debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
         self._log.debug('init_param=%s, port=%s', init_param, port)
@@ -39,6 +45,18 @@ class IrSendCmd(Cmd):
         gpio = init_param[0]
         self._irsend = IrSend(gpio, load_conf=True, debug=False)
 
+        # 状態を持つリモコン(irconf の "stateful")の、最後に送信した状態
+        state_file = IrStateCache.DEF_FILE
+        if len(init_param) >= 2:
+            state_file = init_param[1]
+        state_max_age = IrStateCache.DEF_MAX_AGE
+        if len(init_param) >= 3:
+            state_max_age = init_param[2]
+        self._state = None
+        if state_file:
+            self._state = IrStateCache(state_file, state_max_age,
+                                       debug=self._dbg)
+
         # 最後に super()__init__()
         super().__init__(port=port, debug=self._dbg)
 
@@ -50,9 +68,14 @@ class IrSendCmd(Cmd):
 
         引数1個
           "@load":    設定ファイル再読込
+          "@trace":   トレースをファイルに出力 (--trace 指定時)
+          "@state":   最後に送信した状態 ("@state <dev>": デバイスごと、
+                      max_age より古い場合は null)
           デバイス名: ボタン一覧
 
         引数2個: 赤外線リモコン信号送信
+          "stateful"なデバイスで、最後に送信した状態と同じ場合は、省略
+          ボタン名の先頭が "!" の場合は、省略しない
 
         """
         self._log.debug('args=%a', args)
@@ -71,6 +94,28 @@ class IrSendCmd(Cmd):
                     self._log.error(msg)
                     return self.RC_NG, msg
                 return self.RC_OK, 'reload config data'
+            elif args[1] == self.SUBCMD['TRACE']:
+                if not tracer.enabled:
+                    return self.RC_NG, 'trace is disabled'
+                file_name = self.DEF_TRACE_FILE
+                if len(args) >= 3:
+                    file_name = args[2]
+                try:
+                    n_span = tracer.dump(file_name)
+                except OSError as e:
+                    msg = '%s:%s' % (type(e), e)
+                    self._log.error(msg)
+                    return self.RC_NG, msg
+                return self.RC_OK, '%s: %d spans' % (file_name, n_span)
+            elif args[1] == self.SUBCMD['STATE']:
+                if self._state is None:
+                    return self.RC_NG, 'state cache is disabled'
+                if len(args) == 2:
+                    return self.RC_OK, self._state.cache
+                dev_name = self.state_dev(args[2])
+                if dev_name is None:
+                    return self.RC_NG, '%s: not stateful device' % args[2]
+                return self.RC_OK, self._state.get(dev_name)
             else:
                 return self.RC_NG, '%s: no such command' % args[1]
 
@@ -98,13 +143,26 @@ class IrSendCmd(Cmd):
             time.sleep(interval)
             return self.RC_OK, 'sleep %s sec' % interval
 
-        if args[2] not in m_and_b['buttons']:
-            msg = '%s:%s: no such button' % (args[1], args[2])
+        button = args[2]
+        force = button.startswith(IrStateCache.FORCE_PREFIX)
+        if force:
+            button = button[len(IrStateCache.FORCE_PREFIX):]
+
+        if button not in m_and_b['buttons']:
+            msg = '%s:%s: no such button' % (args[1], button)
             self._log.error(msg)
             return self.RC_NG, msg
 
+        state_dev = self.state_dev(args[1])
+        if state_dev is not None and not force \
+           and self._state.is_same(state_dev, button):
+            self._metrics.inc_gauge('irsend_skipped')
+            msg = '%s:%s: same state .. skipped' % (args[1], button)
+            self._log.info(msg)
+            return self.RC_OK, msg
+
         try:
-            ret = self._irsend.send(args[1], args[2])
+            ret = self._irsend.send(args[1], button)
         except Exception as e:
             msg = '%s %s' % (type(e), e)
             self._log.error(msg)
@@ -112,8 +170,31 @@ class IrSendCmd(Cmd):
 
         if not ret:
             return self.RC_NG, None
+
+        if state_dev is not None:
+            self._state.update(state_dev, button)
         return self.RC_OK, None
 
+    def state_dev(self, dev_name):
+        """
+        Returns
+        -------
+        dev_name: str or None
+          状態を保存するデバイス名 (irconf の dev_name の最初の名前)
+          None: "stateful"でないデバイス、または、キャッシュが無効
+        """
+        if self._state is None:
+            return None
+
+        dev = self._irsend.irconf.get_dev(dev_name)
+        if dev is None or not dev['data'].get('stateful', False):
+            return None
+
+        d_nlist = dev['data']['dev_name']
+        if type(d_nlist) != list:
+            d_nlist = [d_nlist]
+        return d_nlist[0]
+
 
 #####
 import click
@@ -127,15 +208,45 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
               help='port number')
 @click.option('--gpio', '-g', 'gpio', type=int, default=IrSend.DEF_PIN,
               help='GPIO pin number')
+@click.option('--metrics_port', 'metrics_port', type=int,
+              help='port number for Prometheus metrics')
+@click.option('--unix', '-u', 'unix_path', type=str,
+              default=IrConst.IRSEND_SOCK,
+              help='Unix domain socket path (\'\': disable)')
+@click.option('--unix_mode', 'unix_mode', type=str, default='660',
+              help='permission of Unix domain socket (octal)')
+@click.option('--unix_group', 'unix_group', type=str,
+              help='group of Unix domain socket')
+@click.option('--state_file', 'state_file', type=str,
+              default=IrStateCache.DEF_FILE,
+              help='state cache of stateful devices (\'\': disable)')
+@click.option('--state_max_age', 'state_max_age', type=float,
+              default=IrStateCache.DEF_MAX_AGE,
+              help='max age of cached state [sec]')
+@click.option('--trace', '-t', 'trace', is_flag=True, default=False,
+              help='enable tracing ("irsend @trace [file]" to dump)')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(port, gpio, debug):
+def main(port, gpio, metrics_port, unix_path, unix_mode, unix_group,
+         state_file, state_max_age, trace, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('port=%s, gpio=%s', port, gpio)
+    logger.debug('port=%s, gpio=%s, metrics_port=%s, trace=%s',
+                 port, gpio, metrics_port, trace)
+    logger.debug('unix_path=%s, unix_mode=%s, unix_group=%s',
+                 unix_path, unix_mode, unix_group)
+    logger.debug('state_file=%s, state_max_age=%s', state_file, state_max_age)
 
     logger.info('start')
 
-    app = CmdServerApp(IrSendCmd, init_param=(gpio,), port=port, debug=debug)
+    if trace:
+        tracer.enable()
+
+    app = CmdServerApp(IrSendCmd,
+                       init_param=(gpio, state_file, state_max_age),
+                       port=port,
+                       metrics_port=metrics_port, unix_path=unix_path,
+                       unix_mode=int(unix_mode, 8), unix_group=unix_group,
+                       debug=debug)
     try:
         app.main()
     finally:
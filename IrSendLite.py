@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrSendLite.py -- 起動の速い ir-send クライアント
+
+IrSendCmdClient.py と同じ引数、同じ出力。
+
+起動時間を短くするため、click, telnetlib, logging や、
+サーバー側のモジュール(IrSendCmdServer, IrSend, pigpio ..)を importしない。
+(-h, --help などは、IrSendCmdClient.py に任せる)
+
+複数のボタンは、一つの接続で順に送信する。
+リプライがタイムアウトした場合は、次のコマンドから接続し直す。
+``-t 0``(送信のみ)の場合は、ボタンごとに接続し、リプライを待たない。
+
+Unix domain socket
+------------------
+-s, -p を指定せず、IrSendCmdServer の Unix domain socket
+(IrConst.IRSEND_SOCK)があれば、TCPの代わりに、それを使う。
+(接続できなければ TCP)
+-u PATH で、ソケットのパスを指定できる。
+
+バッチ・モード
+--------------
+``--batch`` (-b) を指定すると、標準入力から一行ずつコマンドを読み込み、
+一つのプロセス、一つの接続で、順に送信する。
+
+    $ ir-send --batch < file
+    $ printf 'lamp on\nlamp @0.5\nlamp up up up\n' | ir-send -b
+
+* 一行が、ir-send の引数一つ分 (デバイス名 ボタン名 ..)
+* 空行と、'#'で始まる行は無視する
+* "デバイス名 @秒数" で、サーバー側で待つ (例: "lamp @0.5")
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import IrConst
+
+
+DEF_SVR_HOST = 'localhost'
+DEF_SVR_PORT = IrConst.IRSEND_PORT
+DEF_TIMEOUT = 10  # sec
+
+CONNECT_TIMEOUT = 5  # sec
+
+
+def reply2str(rep_str):
+    """
+    リプライ(JSON文字列)を、表示用の文字列に変換する
+    """
+    import json
+
+    rep = rep_str.split('\r\n')
+    ret = json.loads(rep[0])
+
+    if type(ret) != dict:
+        return ret
+
+    if 'rc' not in ret:
+        return json.dumps(ret, indent=2, ensure_ascii=False)
+
+    rc = ret['rc']
+
+    if 'msg' not in ret:
+        # only rc
+        return rc
+
+    msg = ret['msg']
+
+    if type(msg) == str:
+        return '%s: %s' % (rc, msg)
+
+    if type(msg) == list:
+        # device list
+        out_str = ''
+        for d in msg:
+            out_str += str(d) + '\n'
+        return out_str.strip()
+
+    if type(msg) != dict:
+        return '%s: %s' % (rc, msg)
+
+    if 'macro' not in msg and 'buttons' not in msg:
+        # "@state" など
+        return '%s: %s' % (rc, json.dumps(msg, indent=2, ensure_ascii=False))
+
+    # button list
+    out_str = ''
+    if 'macro' in msg:
+        out_str += '* macro\n'
+        for m in msg['macro']:
+            out_str += '%s: %s\n' % (m, msg['macro'][m])
+
+    if 'buttons' in msg:
+        out_str += '* button\n'
+        for b in msg['buttons']:
+            out_str += '%s: %s\n' % (b, msg['buttons'][b])
+
+    return out_str.strip()
+
+
+def ng_reply(msg):
+    return '{"rc": "%s", "msg": "%s"}' % (
+        IrConst.RC_NG, str(msg).replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def connect(host=DEF_SVR_HOST, port=DEF_SVR_PORT, unix_path=None):
+    """
+    unix_path が指定されていれば Unix domain socket、
+    そうでなければ TCP で接続する
+
+    Returns
+    -------
+    sock: socket.socket
+
+    Raises
+    ------
+    OSError
+    """
+    import socket
+
+    if not unix_path:
+        return socket.create_connection((host, port), CONNECT_TIMEOUT)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(unix_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_recv1(sock, cmd_str, timeout=DEF_TIMEOUT):
+    """
+    コマンドを一つ送信し、リプライを受信する
+
+    timeout=0: 送信のみ、リプライを受信しない
+
+    送信に失敗したり、リプライを最後まで受信できなかった場合は、
+    sock を閉じる (遅れて届いたリプライを、次のコマンドのリプライと
+    間違えないように)。
+    """
+    try:
+        sock.sendall(cmd_str.encode('utf-8'))
+    except Exception as e:
+        sock.close()
+        return ng_reply('%s, %s' % (type(e), e))
+
+    if timeout == 0:
+        return '{"rc": "%s", "msg": "send only"}' % IrConst.RC_OK
+
+    eof = IrConst.EOF.encode('utf-8')
+
+    sock.settimeout(timeout)
+    rep = b''
+    while eof not in rep:
+        try:
+            in_data = sock.recv(4096)
+        except Exception:
+            break
+        if in_data == b'':
+            break
+        rep += in_data
+
+    if eof not in rep:
+        sock.close()
+    if len(rep) == 0:
+        return ng_reply('timeout')
+    return rep.split(eof)[0].decode('utf-8').strip()
+
+
+class Conn:
+    """
+    サーバーへの接続
+
+    一つの接続を使い回す。
+    send_recv1() が接続を閉じた場合(タイムアウトなど)は、次のコマンドで
+    接続し直す。
+
+    timeout=0 (送信のみ)の場合は、コマンドごとに接続する
+    (サーバーは、受信したデータを一つのコマンドとして扱うため、
+    リプライを待たずに、一つの接続で続けて送れない)。
+    """
+    def __init__(self, opts, sock=None):
+        self._opts = opts
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send_recv1(self, cmd_str, timeout=DEF_TIMEOUT):
+        if timeout == 0:
+            sock, err_str = open_sock(self._opts)
+            if sock is None:
+                return err_str
+            with sock:
+                return send_recv1(sock, cmd_str, timeout)
+
+        if self.sock is not None and self.sock.fileno() < 0:
+            self.sock = None
+        if self.sock is None:
+            self.sock, err_str = open_sock(self._opts)
+            if self.sock is None:
+                return err_str
+        return send_recv1(self.sock, cmd_str, timeout)
+
+
+def send_recv(conn, args, timeout=DEF_TIMEOUT):
+    """
+    args := [dev, button1, button2, ..]
+
+    ボタンを複数指定可能: どれかが NG だと、最後の NGを返す。
+
+    一つの接続で、次のコマンドを送る前に、必ずリプライを受信する。
+    (サーバーは、受信したデータを一つのコマンドとして扱うため)
+    timeout=0 の場合は、ボタンごとに接続して、送信のみ (Conn)。
+
+    Returns
+    -------
+    rep_str: str
+      JSON文字列
+    """
+    import json
+
+    cmd = [IrConst.IRSEND_CMD] + list(args)
+    if len(cmd) <= 2:
+        cmd_list = [cmd]
+    else:
+        cmd_list = [cmd[:2] + [b] for b in cmd[2:]]
+
+    ret = '{"rc": "%s"}' % IrConst.RC_OK
+    for c in cmd_list:
+        rep_str = conn.send_recv1(' '.join(c), timeout)
+
+        if len(cmd_list) == 1:
+            return rep_str
+        try:
+            if json.loads(rep_str)['rc'] != IrConst.RC_OK:
+                ret = rep_str
+        except Exception:
+            ret = rep_str
+
+    return ret
+
+
+def read_batch(f):
+    """
+    バッチ・ファイルを一行ずつ読み込む (generator)
+
+    時間をおいて一行ずつ書き込むプログラムからのパイプでも、
+    行を読むたびに返すので、すぐに送信できる。
+
+    Yields
+    ------
+    args: list of str
+    """
+    for line in iter(f.readline, ''):
+        line = line.strip()
+        if len(line) == 0 or line.startswith('#'):
+            continue
+        yield line.split()
+
+
+def parse_args(argv):
+    """
+    Returns
+    -------
+    opts: dict
+      None: IrSendCmdClient.py に任せる
+    """
+    opts = {'args': [], 'svrhost': None, 'svrport': None,
+            'timeout': DEF_TIMEOUT, 'unix_path': None, 'batch': False}
+    opt_key = {'-s': 'svrhost', '--svrhost': 'svrhost',
+               '-p': 'svrport', '--port': 'svrport', '--svrport': 'svrport',
+               '-t': 'timeout', '--timeout': 'timeout',
+               '-u': 'unix_path', '--unix': 'unix_path'}
+
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a in opt_key:
+            if i + 1 >= len(argv):
+                return None
+            opts[opt_key[a]] = argv[i + 1]
+            i += 2
+            continue
+        if a in ['-b', '--batch']:
+            opts['batch'] = True
+            i += 1
+            continue
+        if a.startswith('-'):
+            # -h, -d など
+            return None
+        opts['args'].append(a)
+        i += 1
+
+    if opts['unix_path'] is None and opts['svrhost'] is None and \
+       opts['svrport'] is None and os.path.exists(IrConst.IRSEND_SOCK):
+        opts['unix_path'] = IrConst.IRSEND_SOCK
+        opts['unix_auto'] = True
+
+    if opts['svrhost'] is None:
+        opts['svrhost'] = DEF_SVR_HOST
+    if opts['svrport'] is None:
+        opts['svrport'] = DEF_SVR_PORT
+
+    try:
+        opts['svrport'] = int(opts['svrport'])
+        opts['timeout'] = float(opts['timeout'])
+    except ValueError:
+        return None
+    return opts
+
+
+def open_sock(opts):
+    """
+    Returns
+    -------
+    (sock, err_str): (socket.socket or None, str or None)
+    """
+    if opts['unix_path']:
+        try:
+            return connect(unix_path=opts['unix_path']), None
+        except OSError as e:
+            if not opts.get('unix_auto'):
+                return None, ng_reply('%s, %s' % (type(e), e))
+            # TCP で接続
+
+    try:
+        return connect(opts['svrhost'], opts['svrport']), None
+    except OSError as e:
+        return None, ng_reply('%s, %s' % (type(e), e))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    opts = parse_args(argv)
+    if opts is None or (opts['batch'] and len(opts['args']) > 0):
+        import IrSendCmdClient
+        IrSendCmdClient.main(argv)
+        return
+
+    if opts['batch']:
+        args_list = read_batch(sys.stdin)
+    else:
+        args_list = [opts['args']]
+
+    conn = Conn(opts)
+    if opts['timeout'] != 0:
+        conn.sock, err_str = open_sock(opts)
+        if conn.sock is None:
+            print(reply2str(err_str))
+            return
+
+    try:
+        for args in args_list:
+            rep_str = send_recv(conn, args, opts['timeout'])
+            print(reply2str(rep_str), flush=True)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrStateCache.py -- 状態を持つリモコン(エアコンなど)の、最後に送信した状態
+
+``fujitsu_aircon``のように、一つの信号に全ての状態(電源、モード、風量、温度)
+を含むリモコンでは、最後に送信した状態と同じ信号を送る必要はない。
+
+irconf に ``"stateful": true`` があるデバイスについて、
+送信に成功したボタンから状態を求め、デバイスごとにファイルに保存する。
+IrSendCmdServer は、これを使って、同じ状態の信号の送信を省略する
+(再起動後や、複数のクライアントからの送信でも)。
+AutoAirconServer (Aircon)は、``irsend @state <dev>``で、これを参照する。
+
+ボタン名と状態:
+  on_<mode>_<fan>[_<temp>], chg_<mode>_<fan>[_<temp>]
+        -> {'power': 'on', 'mode': mode, 'fan': fan, 'temp': temp}
+  off   -> {'power': 'off'}
+  その他 (direction, hi_power など) -> 状態が分からないので、キャッシュを消す
+
+ボタン名の先頭が ``!`` の場合は、キャッシュに関係なく送信する。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import json
+import time
+import threading
+
+from MyLogger import get_logger
+
+
+class IrStateCache:
+    """
+    cache := {dev_name: {'button': button, 'state': state, 'ts': ts}}
+      dev_name: irconf の dev_name の最初の名前
+    """
+    DEF_FILE = os.path.join(os.environ['HOME'], '.irsend-state.json')
+    DEF_MAX_AGE = 10 * 60  # sec .. これより古い状態は信用しない
+                           # (手元のリモコンで操作されたかもしれない)
+
+    FORCE_PREFIX = '!'
+
+    def __init__(self, cache_file=DEF_FILE, max_age=DEF_MAX_AGE,
+                 debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('cache_file=%s, max_age=%s', cache_file, max_age)
+
+        self._file = cache_file
+        self._max_age = max_age
+        self._lock = threading.Lock()
+
+        self.cache = self.load()
+
+    def load(self):
+        try:
+            with open(self._file) as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self._log.warning('%s: %s:%s .. ignored', self._file, type(e), e)
+            return {}
+        self._log.debug('cache=%s', cache)
+        return cache
+
+    def save(self):
+        """
+        一時ファイルに書いてから置き換える (途中で止まっても壊れない)
+        """
+        tmp_file = self._file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self.cache, f, indent=2)
+            os.replace(tmp_file, self._file)
+        except OSError as e:
+            self._log.error('%s: %s:%s', self._file, type(e), e)
+
+    @classmethod
+    def parse_button(cls, button):
+        """
+        Returns
+        -------
+        state: dict or None
+          None: 状態が分からないボタン
+        """
+        if button == 'off':
+            return {'power': 'off'}
+
+        b = button.split('_')
+        if b[0] not in ['on', 'chg'] or len(b) < 3:
+            return None
+
+        state = {'power': 'on', 'mode': b[1], 'fan': b[2]}
+        if len(b) >= 4:
+            state['temp'] = '_'.join(b[3:])
+        return state
+
+    def get(self, dev_name, ts=None):
+        """
+        Returns
+        -------
+        ent: {'button':, 'state':, 'ts':} or None
+          None: 状態が分からない、または、max_age より古い
+        """
+        if ts is None:
+            ts = time.time()
+
+        with self._lock:
+            ent = self.cache.get(dev_name)
+        if ent is None or ts - ent['ts'] > self._max_age:
+            return None
+        return ent
+
+    def is_same(self, dev_name, button, ts=None):
+        """
+        最後に送信した状態と同じか?
+        """
+        state = self.parse_button(button)
+        if state is None:
+            return False
+
+        ent = self.get(dev_name, ts)
+        if ent is None:
+            return False
+        return ent['state'] == state
+
+    def update(self, dev_name, button, ts=None):
+        """
+        送信に成功したボタンを記録する
+        """
+        if ts is None:
+            ts = time.time()
+
+        state = self.parse_button(button)
+        self._log.debug('dev_name=%s, button=%s, state=%s',
+                        dev_name, button, state)
+        with self._lock:
+            if state is None:
+                if self.cache.pop(dev_name, None) is None:
+                    return
+            else:
+                self.cache[dev_name] = {'button': button, 'state': state,
+                                        'ts': ts}
+            self.save()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrTrace.py -- 処理時間のトレース (Chrome trace-event 形式)
+
+送信処理(IrConfig, IrSend)の主要な処理をスパンとして記録する。
+``tracer.enable()``するまでは、何も記録しない(ほぼオーバーヘッドなし)。
+
+記録はリングバッファ(最新 ``size``個)に保存され、
+``tracer.dump(file)``で、Chrome trace-event 形式のJSONに出力できる。
+(chrome://tracing や https://ui.perfetto.dev で表示できる)
+
+    from IrTrace import tracer
+
+    with tracer.span('wave_create', pulses=len(waveform)) as sp:
+        wave_id = pi.wave_create()
+        sp.set(wave_id=wave_id)
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import collections
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    """
+    一つの処理の開始から終了まで
+    """
+    __slots__ = ('_tracer', 'name', 'args', 'ts')
+
+    def __init__(self, tracer, name, args):
+        self._tracer = tracer
+        self.name = name
+        self.args = args
+        self.ts = 0
+
+    def set(self, **kwargs):
+        """
+        引数(デバイス名、パルス数など)を追加する
+        """
+        self.args.update(kwargs)
+
+    def __enter__(self):
+        self.ts = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self._tracer.record(self.name, self.ts, end - self.ts, self.args)
+        return False
+
+
+class NullSpan:
+    """
+    トレースしないときのスパン (何もしない)
+    """
+    __slots__ = ()
+
+    def set(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+class Tracer:
+    """
+    スパンを記録するリングバッファ
+    """
+    DEF_SIZE = 10000
+
+    CATEGORY = 'ir'
+
+    _NULL_SPAN = NullSpan()
+
+    def __init__(self, size=DEF_SIZE):
+        self.enabled = False
+        self._buf = collections.deque(maxlen=size)
+        self._pid = os.getpid()
+
+    def enable(self, size=None):
+        if size is not None and size != self._buf.maxlen:
+            self._buf = collections.deque(self._buf, maxlen=size)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._buf.clear()
+
+    def span(self, name, **args):
+        """
+        Returns
+        -------
+        span: Span or NullSpan
+          with文で使う
+        """
+        if not self.enabled:
+            return self._NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, ts_ns, dur_ns, args):
+        # deque.append() はスレッドセーフ
+        self._buf.append((name, ts_ns, dur_ns, threading.get_ident(), args))
+
+    def events(self):
+        """
+        Returns
+        -------
+        Chrome trace-event のリスト (complete event: "ph": "X")
+        """
+        ev_list = []
+        for name, ts_ns, dur_ns, tid, args in list(self._buf):
+            ev_list.append({
+                'name': name,
+                'cat': self.CATEGORY,
+                'ph': 'X',
+                'ts': ts_ns / 1000,
+                'dur': dur_ns / 1000,
+                'pid': self._pid,
+                'tid': tid,
+                'args': args,
+            })
+        return ev_list
+
+    def dumps(self):
+        return json.dumps({'traceEvents': self.events(),
+                           'displayTimeUnit': 'ms'})
+
+    def dump(self, file_name):
+        with open(file_name, 'w') as f:
+            f.write(self.dumps())
+        return len(self._buf)
+
+
+tracer = Tracer()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+IrWaveCheck.py -- 送信波形のタイミング精度の検証
+
+ボタンの信号を、IrSendの送信処理(WaveForm.append_carrier()など)で
+パルスのリストに変換し(FakePigpioを使うので、pigpiodは不要)、
+mark/spaceの長さを積算して、irconfの値(Tの倍数)と比較する。
+
+  err[T]:   シンボルごとの誤差の最大値 (Tに対する比)
+  drift:    フレーム全体の誤差の累積 [us]
+  freq:     キャリア周波数の誤差 [%]
+  duty:     キャリアのデューティー比の誤差 [%] (差)
+
+誤差が許容値を越えたボタンは NG とし、終了コードを 1 にする。
+ボタンを指定しなければ、全てのデバイス・ボタンを検証する。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import sys
+
+import FakePigpio
+FakePigpio.install()
+
+from IrSend import IrSend
+from IrConfig import IrConfig
+from MyLogger import get_logger
+
+
+class IrWaveCheck:
+    """
+    送信波形のタイミング精度の検証
+    """
+    DEF_TOL = 0.1           # シンボルの誤差の許容値 (Tに対する比)
+    DEF_FREQ_TOL = 0.02     # キャリア周波数の誤差の許容値 (比)
+    DEF_DUTY_TOL = 0.05     # デューティー比の誤差の許容値 (差)
+
+    GAP_US = 100            # これより短いOFFは、キャリアの一部
+
+    def __init__(self, conf_dir=IrConfig.DEF_CONF_DIR, tol=DEF_TOL,
+                 freq_tol=DEF_FREQ_TOL, duty_tol=DEF_DUTY_TOL, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('conf_dir=%s, tol=%s, freq_tol=%s, duty_tol=%s',
+                        conf_dir, tol, freq_tol, duty_tol)
+
+        self.tol = tol
+        self.freq_tol = freq_tol
+        self.duty_tol = duty_tol
+
+        FakePigpio.daemon.conf['latency_us'] = 0
+        FakePigpio.daemon.conf['wave_create_us'] = 0
+        FakePigpio.daemon.conf['time_scale'] = 0
+
+        self.irsend = IrSend(load_conf=False, debug=self._dbg)
+        self.irsend.irconf = IrConfig(conf_dir, load_all=True,
+                                      debug=self._dbg)
+        self.irconf = self.irsend.irconf
+
+    def end(self):
+        self._log.debug('')
+        self.irsend.end()
+
+    def buttons(self):
+        """
+        Returns
+        -------
+        [[dev_name, button_name], ..]
+        """
+        b_list = []
+        for d_ent in self.irconf.data:
+            dev = d_ent['data']
+            dev_name = dev['dev_name']
+            if type(dev_name) == list:
+                dev_name = dev_name[0]
+            for b in dev['buttons']:
+                if dev['buttons'][b] != '':
+                    b_list.append([dev_name, b])
+        return b_list
+
+    def render(self, dev_name, button_name):
+        """
+        ``IrSend.send()``で、ボタンの信号をパルスのリストに変換する。
+
+        Returns
+        -------
+        pulses: [(gpio_on, gpio_off, delay), ..]
+          None: 送信できなかった
+        """
+        daemon = FakePigpio.daemon
+        daemon.emitted = []
+        if not self.irsend.send(dev_name, button_name):
+            return None
+        # 繰り返しは、同じ波形
+        return daemon.emitted[0]['pulses']
+
+    def measure(self, pulses):
+        """
+        パルスのリストから、mark/space の長さとキャリアを測定する。
+
+        Returns
+        -------
+        sym_list: [[mark, space, cycles, period_sum, on_sum], ..]
+          cycles:     キャリアの周期の数
+          period_sum: キャリアの周期の合計 (最後の周期を除く)
+          on_sum:     キャリアのONの時間の合計
+        """
+        levels = FakePigpio.pulses2levels(pulses, self.irsend.pin)
+
+        sym_list = []
+        sym = None
+        space = 0
+        last_on = 0
+        for level, usec in levels:
+            if level == 1:
+                if sym is not None and space < self.GAP_US:
+                    # キャリアの OFF 部分
+                    sym[0] += space
+                    sym[3] += last_on + space
+                else:
+                    if sym is not None:
+                        sym[1] = space
+                        sym_list.append(sym)
+                    sym = [0, 0, 0, 0, 0]
+                space = 0
+                sym[0] += usec
+                sym[2] += 1
+                sym[4] += usec
+                last_on = usec
+            else:
+                space += usec
+        if sym is not None:
+            sym[1] = space
+            sym_list.append(sym)
+        return sym_list
+
+    def check(self, dev_name, button_name):
+        """
+        Returns
+        -------
+        result: dict
+          None: 送信できなかった
+        """
+        self._log.debug('dev_name=%s, button_name=%s',
+                        dev_name, button_name)
+
+        raw_data, repeat = self.irconf.get_raw_data(dev_name, button_name)
+        if raw_data is None:
+            return None
+        pulses = self.render(dev_name, button_name)
+        if pulses is None:
+            return None
+        sym_list = self.measure(pulses)
+
+        T = self.irconf.get_dev(dev_name)['data']['T']
+
+        err_max = 0
+        drift = 0
+        for i, (p, s) in enumerate(raw_data):
+            if i >= len(sym_list):
+                err_max = float('inf')
+                break
+            mark, space = sym_list[i][:2]
+            err_max = max(err_max, abs(mark - p), abs(space - s))
+            drift += (mark + space) - (p + s)
+
+        cycles = sum([sym[2] - 1 for sym in sym_list])
+        period = sum([sym[3] for sym in sym_list]) / max(cycles, 1)
+        on_usec = sum([sym[4] for sym in sym_list])
+        duty = on_usec / sum([sym[2] for sym in sym_list]) / period
+
+        freq_err = (1000000 / period) / IrSend.DEF_FREQ - 1
+        duty_err = duty - IrSend.DEF_DUTY
+
+        result = {
+            'dev_name': dev_name,
+            'button': button_name,
+            'T': T,
+            'n': len(raw_data),
+            'n_sym': len(sym_list),
+            'err_max': err_max / T,
+            'drift': drift,
+            'freq_err': freq_err,
+            'duty_err': duty_err,
+        }
+        result['ok'] = (len(sym_list) == len(raw_data) and
+                        result['err_max'] <= self.tol and
+                        abs(freq_err) <= self.freq_tol and
+                        abs(duty_err) <= self.duty_tol)
+        self._log.debug('result=%s', result)
+        return result
+
+
+#####
+class App:
+    HDR_FMT = '%-16s %-16s %5s %7s %8s %7s %7s %s'
+    RES_FMT = '%-16s %-16s %5d %7.3f %8d %7.2f %7.2f %s'
+
+    def __init__(self, args, conf_dir, tol, freq_tol, duty_tol,
+                 verbose=False, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('args=%s, conf_dir=%s, tol=%s, freq_tol=%s, '
+                        'duty_tol=%s', args, conf_dir, tol, freq_tol, duty_tol)
+
+        self.args = args
+        self.verbose = verbose
+
+        self.wc = IrWaveCheck(conf_dir, tol, freq_tol, duty_tol,
+                              debug=self._dbg)
+
+    def main(self):
+        self._log.debug('')
+
+        if len(self.args) == 0:
+            b_list = self.wc.buttons()
+        elif len(self.args) == 1:
+            b_list = [b for b in self.wc.buttons() if b[0] == self.args[0]]
+        else:
+            b_list = [[self.args[0], b] for b in self.args[1:]]
+
+        print(self.HDR_FMT % ('dev', 'button', 'n', 'err[T]', 'drift',
+                              'freq[%]', 'duty[%]', ''))
+        n_ok = n_ng = n_skip = 0
+        for dev_name, button in b_list:
+            r = self.wc.check(dev_name, button)
+            if r is None:
+                n_skip += 1
+                continue
+            if r['ok']:
+                n_ok += 1
+            else:
+                n_ng += 1
+            if self.verbose or not r['ok'] or len(self.args) > 1:
+                print(self.RES_FMT % (dev_name[:16], button[:16], r['n'],
+                                      r['err_max'], r['drift'],
+                                      r['freq_err'] * 100,
+                                      r['duty_err'] * 100,
+                                      'OK' if r['ok'] else 'NG'))
+
+        print('OK: %d, NG: %d, skipped: %d' % (n_ok, n_ng, n_skip))
+        if n_ok + n_ng == 0:
+            # 設定ファイルのディレクトリ(-c)の間違いなど
+            print('no button checked')
+            return False
+        return n_ng == 0
+
+    def end(self):
+        self._log.debug('')
+        self.wc.end()
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='check timing accuracy of IR waveforms')
+@click.argument('args', type=str, nargs=-1)
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, multiple=True,
+              help='irconf directory')
+@click.option('--tol', '-t', 'tol', type=float, default=IrWaveCheck.DEF_TOL,
+              help='symbol error tolerance (ratio to T)')
+@click.option('--freq_tol', 'freq_tol', type=float,
+              default=IrWaveCheck.DEF_FREQ_TOL,
+              help='carrier frequency tolerance (ratio)')
+@click.option('--duty_tol', 'duty_tol', type=float,
+              default=IrWaveCheck.DEF_DUTY_TOL,
+              help='carrier duty tolerance (difference)')
+@click.option('--verbose', '-v', 'verbose', is_flag=True, default=False,
+              help='print all buttons')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(args, conf_dir, tol, freq_tol, duty_tol, verbose, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('args=%s, conf_dir=%s, tol=%s, freq_tol=%s, duty_tol=%s',
+                 args, conf_dir, tol, freq_tol, duty_tol)
+
+    if len(conf_dir) == 0:
+        conf_dir = IrConfig.DEF_CONF_DIR
+    else:
+        conf_dir = list(conf_dir)
+
+    app = App(args, conf_dir, tol, freq_tol, duty_tol, verbose, debug=debug)
+    ok = False
+    try:
+        ok = app.main()
+    finally:
+        logger.debug('finally')
+        app.end()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,37 +7,69 @@ TcpCmdClient.py
 
 TCP client that send command strings and get reply string
 
+unix_path を指定すると、TCPの代わりに、Unix domain socket で接続する。
+(接続できない場合は、TCP)
+
 """
 __author__ = 'Yoichi Tanibayashi'
 __date__   = '2019'
 
-from TcpCmdServer import Cmd
-import telnetlib
+import IrConst
 import json
+import socket
 
 from MyLogger import get_logger
 
 
 class TcpCmdClient:
     DEF_SVR_HOST = 'localhost'
-    DEF_SVR_PORT = Cmd.DEF_PORT
+    DEF_SVR_PORT = IrConst.TCPCMD_PORT
 
     DEF_TIMEOUT = 10  # sec
 
     EOF = b'\x04'
     EOL = b'\r\n'
 
-    def __init__(self, host=DEF_SVR_HOST, port=DEF_SVR_PORT, debug=False):
+    CONNECT_TIMEOUT = 5  # sec
+
+    def __init__(self, host=DEF_SVR_HOST, port=DEF_SVR_PORT, unix_path=None,
+                 debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
-        self._log.debug('host=%s, port=%s', host, port)
+        self._log.debug('host=%s, port=%s, unix_path=%s',
+                        host, port, unix_path)
 
         self._svr_host = host
         self._svr_port = port
+        self._unix_path = unix_path
 
     def end(self):
         self._log.debug('')
 
+    def connect(self):
+        """
+        Returns
+        -------
+        sock: socket.socket
+
+        Raises
+        ------
+        OSError
+        """
+        if self._unix_path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.CONNECT_TIMEOUT)
+            try:
+                sock.connect(self._unix_path)
+                return sock
+            except OSError as e:
+                sock.close()
+                self._log.debug('%s: %s:%s .. use TCP',
+                                self._unix_path, type(e), e)
+
+        return socket.create_connection((self._svr_host, self._svr_port),
+                                        self.CONNECT_TIMEOUT)
+
     def send_recv(self, args, timeout=DEF_TIMEOUT, newline=False):
         """
         override対象
@@ -66,30 +98,34 @@ class TcpCmdClient:
         except UnicodeDecodeError as e:
             msg = '%s, %s' % (type(e), e)
             self._log.error(msg)
-            return json.dumps({'rc': Cmd.RC_NG, 'msg': msg})
+            return json.dumps({'rc': IrConst.RC_NG, 'msg': msg})
         else:
             self._log.debug('out_data=%a', out_data)
 
-        # Python3.6 以降は下記の記述ができるが、互換性のためあえて使わない。
-        #
-        #  with telnetlib.Telnet(self._svr_host, self._svr_port) as tn:
-        #
         try:
-            tn = telnetlib.Telnet(self._svr_host, self._svr_port, timeout=5)
-            tn.write(out_data)
+            sock = self.connect()
         except Exception as e:
             msg = '%s, %s' % (type(e), e)
             self._log.error(msg)
-            return json.dumps({'rc': Cmd.RC_NG, 'msg': msg})
+            return json.dumps({'rc': IrConst.RC_NG, 'msg': msg})
+
+        try:
+            sock.sendall(out_data)
+        except Exception as e:
+            sock.close()
+            msg = '%s, %s' % (type(e), e)
+            self._log.error(msg)
+            return json.dumps({'rc': IrConst.RC_NG, 'msg': msg})
 
         if timeout == 0:
             rep = b'{"rc": "OK", "msg": "send only"}'
         else:
+            sock.settimeout(timeout)
             rep = b''
             while True:
                 in_data = b''
                 try:
-                    in_data = tn.read_until(self.EOF, timeout=timeout)
+                    in_data = sock.recv(4096)
                 except Exception as e:
                     self._log.warning('%s:%s', type(e), e)
                     break
@@ -103,14 +139,14 @@ class TcpCmdClient:
                 self._log.debug('rep=%a', rep)
                 if self.EOF in rep:
                     self._log.debug('EOF')
-                    rep = rep[:-1]
+                    rep = rep[:rep.index(self.EOF)]
                     break
-        tn.close()
+        sock.close()
 
         if len(rep) == 0:
             msg = 'timeout'
             self._log.error(msg)
-            return json.dumps({'rc': Cmd.RC_NG, 'msg': msg})
+            return json.dumps({'rc': IrConst.RC_NG, 'msg': msg})
 
         rep_str = rep.decode('utf-8').strip()
         self._log.debug('rep_str=%a', rep_str)
@@ -135,15 +171,17 @@ class TcpCmdClient:
 class TcpCmdClientApp:
     def __init__(self, client_class, args, host, port,
                  timeout=TcpCmdClient.DEF_TIMEOUT, newline=False,
-                 debug=False):
+                 unix_path=None, debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
         self._log.debug('args=%s, host=%s, port=%d',
                            args, host, port)
-        self._log.debug('timeout=%s, newline=%s', timeout, newline)
+        self._log.debug('timeout=%s, newline=%s, unix_path=%s',
+                        timeout, newline, unix_path)
 
         self._args = args
-        self._cl = client_class(host, port, debug=self._dbg)
+        self._cl = client_class(host, port, unix_path=unix_path,
+                                debug=self._dbg)
 
         self._timeout = timeout
         self._newline = newline
@@ -182,15 +220,18 @@ TcpCmdClient
 @click.option('--newline', '--nl', '-n', 'newline',
               is_flag=True, default=False,
               help='append newline')
+@click.option('--unix', '-u', 'unix_path', type=str,
+              help='Unix domain socket path')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(args, svrhost, port, timeout, newline, debug):
+def main(args, svrhost, port, timeout, newline, unix_path, debug):
     logger = get_logger(__name__, debug)
     logger.debug('args=%s, svrhost=%s, port=%d, timeout=%.1f, newline=%s',
                  args, svrhost, port, timeout, newline)
+    logger.debug('unix_path=%s', unix_path)
 
     app = TcpCmdClientApp(TcpCmdClient, args, svrhost, port, timeout, newline,
-                          debug=debug)
+                          unix_path=unix_path, debug=debug)
     try:
         app.main()
     finally:
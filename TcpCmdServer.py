@@ -27,6 +27,33 @@ CmdServerHandler で即時に実行される関数(FUNC_I)と、
 FAUNC_I: 複数クライアントからの要求が並列実行される(マルチスレッド)。
 FAUNC_Q: 並列実行されず、必ず順に一つずつ実行される(シングルスレッド)。
 
+------------
+メトリクス (CmdMetrics)
+
+コマンドごとに、下記の処理時間のヒストグラムを記録する。
+
+  func_i:     FUNC_I の実行時間
+  queue_wait: キューイングされてから、FUNC_Q の実行が始まるまでの時間
+  func_q:     FUNC_Q の実行時間
+  reply:      コマンドを受信してから、リプライを送信するまでの時間
+
+ゲージ: queue_depth (キューの長さ), connections (接続数)
+
+"stats" コマンドで、JSONとして取得できる。
+"stats prom" は、Prometheus のテキスト形式。
+CmdServerApp(metrics_port=..)を指定すると、
+HTTP (http://host:metrics_port/metrics)でも、Prometheus形式で取得できる。
+
+------------
+Unix domain socket
+
+CmdServerApp(unix_path=..)を指定すると、TCPに加えて、
+Unix domain socket (unix_path)でも、同じコマンドを受け付ける。
+プロトコルは TCP と同じ。
+
+アクセス制限は、ソケットファイルのパーミッション(unix_mode, デフォルト 0o660)
+とグループ(unix_group)で行う。
+
 
 オブジェクト
 ------------
@@ -37,6 +64,10 @@ main()
        +- Cmd
        |
        +- CmdServer
+       |    |
+       |    +- CmdServerHandler
+       |
+       +- CmdUnixServer (unix_path 指定時)
             |
             +- CmdServerHandler
 
@@ -48,6 +79,10 @@ main() - CmdServerApp:main() - Cmd.main()
            |   |
            |   +- CmdServerHandler.handle()
            |
+           +- CmdUnixServer.serve_forever()
+           |   |
+           |   +- CmdServerHandler.handle()
+           |
            +- CmdServerApp.cmd_worker()
 
 """
@@ -56,15 +91,151 @@ __date__   = '2019'
 
 
 import socketserver
-import socket
+import selectors
+import os
+import stat
 import threading
 import queue
 import json
 import time
+import http.server
 
+import IrConst
 from MyLogger import get_logger
 
 
+class Histogram:
+    """
+    処理時間のヒストグラム (sec)
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self.n = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, sec):
+        for i, le in enumerate(self.buckets):
+            if sec <= le:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.n += 1
+        self.sum += sec
+        self.max = max(self.max, sec)
+
+    def percentile(self, p):
+        """
+        ``p``%点を含むバケットの上限 (+Inf の場合は最大値)
+        """
+        if self.n == 0:
+            return 0.0
+        target = self.n * p / 100
+        count = 0
+        for i, c in enumerate(self.counts):
+            count += c
+            if count >= target:
+                break
+        if i < len(self.buckets):
+            return min(self.buckets[i], self.max)
+        return self.max
+
+    def stats(self):
+        """
+        Returns
+        -------
+        {'n': int, 'ave_ms': float, 'p50_ms': .., 'p95_ms': .., 'max_ms': ..}
+        """
+        if self.n == 0:
+            return {'n': 0}
+        return {
+            'n': self.n,
+            'ave_ms': round(self.sum / self.n * 1000, 3),
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class CmdMetrics:
+    """
+    コマンドごとの処理時間のヒストグラムと、ゲージ
+    """
+    KIND = ('func_i', 'queue_wait', 'func_q', 'reply')
+
+    PROM_PREFIX = 'tcpcmd'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist = {}   # {cmd_name: {kind: Histogram}}
+        self._gauge = {}  # {name: value or function}
+
+    def observe(self, cmd_name, kind, sec):
+        with self._lock:
+            h = self._hist.setdefault(cmd_name, {})
+            if kind not in h:
+                h[kind] = Histogram()
+            h[kind].observe(sec)
+
+    def set_gauge(self, name, val):
+        """
+        ``val``: 数値、または、数値を返す関数
+        """
+        with self._lock:
+            self._gauge[name] = val
+
+    def inc_gauge(self, name, val=1):
+        with self._lock:
+            self._gauge[name] = self._gauge.get(name, 0) + val
+
+    def gauges(self):
+        with self._lock:
+            g = dict(self._gauge)
+        return {k: g[k]() if callable(g[k]) else g[k] for k in g}
+
+    def stats(self):
+        """
+        Returns
+        -------
+        {'gauge': {name: val}, 'cmd': {cmd_name: {kind: Histogram.stats()}}}
+        """
+        with self._lock:
+            cmd = {c: {k: self._hist[c][k].stats() for k in self._hist[c]}
+                   for c in self._hist}
+        return {'gauge': self.gauges(), 'cmd': cmd}
+
+    def prometheus(self):
+        """
+        Prometheus テキスト形式
+        """
+        pfx = self.PROM_PREFIX
+        lines = []
+        for name, val in sorted(self.gauges().items()):
+            lines.append('# TYPE %s_%s gauge' % (pfx, name))
+            lines.append('%s_%s %s' % (pfx, name, val))
+
+        with self._lock:
+            for kind in self.KIND:
+                name = '%s_%s_seconds' % (pfx, kind)
+                lines.append('# TYPE %s histogram' % name)
+                for c in sorted(self._hist):
+                    h = self._hist[c].get(kind)
+                    if h is None:
+                        continue
+                    count = 0
+                    for le, n in zip(list(h.buckets) + ['+Inf'], h.counts):
+                        count += n
+                        lines.append('%s_bucket{cmd="%s",le="%s"} %d' %
+                                     (name, c, le, count))
+                    lines.append('%s_sum{cmd="%s"} %f' % (name, c, h.sum))
+                    lines.append('%s_count{cmd="%s"} %d' % (name, c, h.n))
+        return '\n'.join(lines) + '\n'
+
+
 class Cmd:
     """
     __init__()を override
@@ -80,12 +251,13 @@ class Cmd:
       self._active をフラグとして利用
 
     """
-    DEF_PORT = 59001
+    DEF_PORT = IrConst.TCPCMD_PORT
 
-    RC_OK = 'OK'  # OK .. FUNC_I の場合は、キューイング不要
-    RC_NG = 'NG'  # NG
-    RC_CONT = 'CONTINUE'  # FUNC_I 正常終了 .. キューイングして結果を待つ
-    RC_ACCEPT = 'ACCEPT'  # FUNC_I 正常終了 .. キューイングして結果を待たない
+    RC_OK = IrConst.RC_OK  # OK .. FUNC_I の場合は、キューイング不要
+    RC_NG = IrConst.RC_NG  # NG
+    RC_CONT = IrConst.RC_CONT  # FUNC_I 正常終了 .. キューイングして結果を待つ
+    # FUNC_I 正常終了 .. キューイングして結果を待たない
+    RC_ACCEPT = IrConst.RC_ACCEPT
 
     FUNC_I = 'func_i'
     FUNC_Q = 'func_q'
@@ -93,6 +265,7 @@ class Cmd:
 
     CMD_HELP = 'help'
     CMD_EXIT = 'exit'
+    CMD_STATS = 'stats'
     CMD_SHUTDOWN = 'shutdown9999'
 
     def __init__(self, init_param=None, port=DEF_PORT, debug=False):
@@ -108,8 +281,12 @@ class Cmd:
 
         self._active = True  # main()の終了条件に使用
 
+        self._metrics = CmdMetrics()
+
         self.add_cmd('sleep', self.cmd_i_sleep, self.cmd_q_sleep, 'sleep')
         self.add_cmd(self.CMD_HELP, self.cmd_i_help, None, 'command help')
+        self.add_cmd(self.CMD_STATS, self.cmd_i_stats, None,
+                     'server statistics ("stats prom": Prometheus format)')
         self.add_cmd(self.CMD_EXIT, self.cmd_i_exit, None, 'disconnect')
         self.add_cmd(self.CMD_SHUTDOWN,
                      self.cmd_i_shutdown, self.cmd_q_shutdown,
@@ -187,6 +364,19 @@ class Cmd:
         rc = self.RC_OK
         return rc, msg
 
+    def cmd_i_stats(self, args):
+        """
+        メトリクス (処理時間のヒストグラム、ゲージ)
+        """
+        self._log.debug('args=%a', args)
+
+        if len(args) >= 2:
+            if args[1] == 'prom':
+                return self.RC_OK, self._metrics.prometheus()
+            return self.RC_NG, '%s: no such option' % args[1]
+
+        return self.RC_OK, self._metrics.stats()
+
     def cmd_i_sleep(self, args):
         """
         サーバーをスリープさせる。
@@ -289,10 +479,15 @@ class Cmd:
 class CmdServerHandler(socketserver.StreamRequestHandler):
     """
     override 不要
+
+    受信待ちは、クライアントのソケットと、サーバーの wakeup fd を
+    selector で待つ(タイムアウトなし)。
+    アイドル中の接続ではスレッドは起きず、
+    サーバー終了時(CmdServer.end())は、すぐに handle()を抜ける。
     """
-    DEF_HANDLE_TIMEOUT = 3  # sec
+    DEF_HANDLE_TIMEOUT = 3  # sec: 送信のタイムアウト
 
-    EOF = '\x04'
+    EOF = IrConst.EOF
 
     def __init__(self, req, c_addr, svr):
         self._dbg = svr._dbg
@@ -304,7 +499,12 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
         self._active = False
         self._myq = queue.SimpleQueue()
 
-        # 変数名は固定: self.request.recv() のタイムアウト
+        self._metrics = svr._app._cmd._metrics
+        self._cmd_name = None  # リプライ時間を記録するコマンド
+        self._t_recv = 0
+
+        # 変数名は固定: ソケットのタイムアウト
+        # (受信は selector で待つので、実際には送信のタイムアウト)
         self.timeout = self.DEF_HANDLE_TIMEOUT
         self._log.debug('timeout=%s sec', self.timeout)
 
@@ -314,12 +514,14 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
         self._log.debug('_active=%s', self._active)
         self._active = True
         self._log.debug('_active=%s', self._active)
+        self._metrics.inc_gauge('connections')
         return super().setup()
 
     def finish(self):
         self._log.debug('_active=%s', self._active)
         self._active = False
         self._log.debug('_active=%s', self._active)
+        self._metrics.inc_gauge('connections', -1)
         return super().finish()
 
     def set_timeout(self, timeout=DEF_HANDLE_TIMEOUT):
@@ -352,11 +554,30 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
         self._log.debug('rep_str=%a', rep_str)
         self.net_write(rep_str)
 
+        if self._cmd_name is not None:
+            self._metrics.observe(self._cmd_name, 'reply',
+                                  time.monotonic() - self._t_recv)
+            self._cmd_name = None
+
     def handle(self):
         self._log.debug('')
 
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.request, selectors.EVENT_READ)
+            sel.register(self._svr._wakeup_r, selectors.EVENT_READ)
+            self.handle_loop(sel)
+
+        self._log.debug('done')
+
+    def handle_loop(self, sel):
         while self._active:
             self._log.debug('wait net_data')
+            ready = [key.fileobj for key, ev in sel.select()]
+            if self._svr._wakeup_r in ready or not self._svr._active:
+                self._log.debug('_svr._active=%s', self._svr._active)
+                self.send_reply(Cmd.RC_NG, 'server is dead !')
+                break
+
             try:
                 # in_data = self.rfile.readline().strip()
                 #                ↓
@@ -365,15 +586,6 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
                 #              ↓
                 in_data = self.request.recv(512).strip()
 
-            except socket.timeout as e:
-                self._log.debug('%s:%s.', type(e), e)
-                self._log.debug('_svr._active=%s', self._svr._active)
-                if self._svr._active:
-                    # サーバーが生きている場合は、継続
-                    continue
-                else:
-                    self.send_reply(Cmd.RC_NG, 'server is dead !')
-                    break
             except Exception as e:
                 self._log.warning('%s:%s.', type(e), e)
                 msg = 'error %s:%s' % (type(e), e)
@@ -413,12 +625,18 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
                 self.send_reply(Cmd.RC_NG, msg)
                 continue
 
+            self._cmd_name = args[0]
+            self._t_recv = time.monotonic()
+
             if self._svr._app._cmd._cmd[args[0]][Cmd.FUNC_I] is not None:
                 #
                 # interactive command
                 #
                 self._log.info('call %s: %a', Cmd.FUNC_I, args)
+                t_start = time.monotonic()
                 rc, msg = self._svr._app._cmd._cmd[args[0]][Cmd.FUNC_I](args)
+                self._metrics.observe(args[0], Cmd.FUNC_I,
+                                      time.monotonic() - t_start)
                 self._log.info('rc=%s, msg=%s', rc, msg)
 
                 if args[0] == Cmd.CMD_EXIT:
@@ -456,7 +674,8 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
 
             # put args to queue
             try:
-                self._svr._app._cmdq.put((args, self._myq), block=False)
+                self._svr._app._cmdq.put((args, self._myq, time.monotonic()),
+                                         block=False)
             except Exception as e:
                 msg = '%s:%s' % (type(e), e)
                 self._log.error(msg)
@@ -480,8 +699,6 @@ class CmdServerHandler(socketserver.StreamRequestHandler):
             # send reply
             self.send_reply(rc, msg)
 
-        self._log.debug('done')
-
 
 class CmdServer(socketserver.ThreadingTCPServer):
     """
@@ -495,6 +712,9 @@ class CmdServer(socketserver.ThreadingTCPServer):
         self._app = app
         self._port = port
 
+        # end()で書き込み、CmdServerHandler の selector を起こす
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
         self._active = False
         self.allow_reuse_address = True  # Important !!
 
@@ -528,39 +748,177 @@ class CmdServer(socketserver.ThreadingTCPServer):
         self._log.debug('done')
     """
 
+    def close_wakeup(self):
+        """
+        wakeup 用のパイプを閉じる
+        (server_close()で、handle() のスレッドが全て終わってから)
+        """
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def end(self):
+        self._log.debug('')
+        self.shutdown()  # serve_forever() を終了させる
+        self._active = False  # handle()を終了させる
+        os.write(self._wakeup_w, b'\0')  # 読み出さないので、全員が起きる
+        self.server_close()  # handle() のスレッドの終了を待つ
+        self.close_wakeup()
+        self._log.debug('done')
+
+
+class CmdUnixServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix domain socket 版の CmdServer
+
+    接続できるのは、ソケットファイルに書き込み権限があるユーザーだけ。
+
+    override 不要
+    """
+    DEF_MODE = 0o660
+
+    def __init__(self, app, path, mode=DEF_MODE, group=None, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('path=%s, mode=%s, group=%s',
+                        path, oct(mode), group)
+
+        self._app = app
+        self._path = path
+        self._mode = mode
+        self._group = group
+
+        # end()で書き込み、CmdServerHandler の selector を起こす
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+        self._active = False
+
+        # 前回の残り(ソケットファイル)を削除
+        try:
+            if stat.S_ISSOCK(os.stat(self._path).st_mode):
+                self._log.warning('%s: remove old socket', self._path)
+                os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+
+        super().__init__(self._path, CmdServerHandler)
+        self._active = True
+        self._log.info('_active=%s,_path=%s', self._active, self._path)
+
+    def server_bind(self):
+        """
+        bind直後に、パーミッションとグループを設定する
+        (listen()より前なので、設定前に接続されることはない)
+        """
+        super().server_bind()
+
+        if self._group is not None:
+            import grp
+            try:
+                gid = grp.getgrnam(self._group).gr_gid
+            except KeyError:
+                gid = int(self._group)
+            os.chown(self._path, -1, gid)
+
+        os.chmod(self._path, self._mode)
+
+    def serve_forever(self):
+        self._log.debug('start')
+        super().serve_forever()
+        self._log.debug('done')
+
+    def close_wakeup(self):
+        """
+        wakeup 用のパイプを閉じる
+        (server_close()で、handle() のスレッドが全て終わってから)
+        """
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
     def end(self):
         self._log.debug('')
         self.shutdown()  # serve_forever() を終了させる
         self._active = False  # handle()を終了させる
+        os.write(self._wakeup_w, b'\0')  # 読み出さないので、全員が起きる
+        self.server_close()  # handle() のスレッドの終了を待つ
+        self.close_wakeup()
+        try:
+            os.unlink(self._path)
+        except OSError as e:
+            self._log.warning('%s:%s.', type(e), e)
         self._log.debug('done')
 
 
+class MetricsHttpHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Prometheus 形式のメトリクスを返す
+
+    override 不要
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+
+        body = self.server._metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
 class CmdServerApp:
     """
     """
     def __init__(self, cmd_class, init_param=None, port=Cmd.DEF_PORT,
+                 metrics_port=None, unix_path=None,
+                 unix_mode=CmdUnixServer.DEF_MODE, unix_group=None,
                  debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
-        self._log.debug('cmd_class=%s, init_param=%s, port=%s',
-                           cmd_class, init_param, port)
+        self._log.debug('cmd_class=%s, init_param=%s, port=%s, '
+                        'metrics_port=%s, unix_path=%s',
+                        cmd_class, init_param, port, metrics_port, unix_path)
+        self._log.debug('unix_mode=%s, unix_group=%s',
+                        oct(unix_mode), unix_group)
 
         self._cmdq = queue.Queue()
 
         self._cmd = cmd_class(init_param, port, debug=self._dbg)
+        self._cmd._metrics.set_gauge('queue_depth', self._cmdq.qsize)
+        self._cmd._metrics.set_gauge('connections', 0)
+
         self._svr = CmdServer(self, self._cmd._port, self._dbg)
         self._svr_th = threading.Thread(target=self._svr.serve_forever,
                                         daemon=True)
         self._cmd_worker_th = threading.Thread(target=self.cmd_worker,
                                                daemon=True)
 
+        self._unix_svr = None
+        if unix_path:
+            self._unix_svr = CmdUnixServer(self, unix_path, unix_mode,
+                                           unix_group, self._dbg)
+            self._unix_th = threading.Thread(
+                target=self._unix_svr.serve_forever, daemon=True)
+
+        self._metrics_svr = None
+        if metrics_port is not None:
+            self._metrics_svr = http.server.ThreadingHTTPServer(
+                ('', metrics_port), MetricsHttpHandler)
+            self._metrics_svr._metrics = self._cmd._metrics
+            self._metrics_th = threading.Thread(
+                target=self._metrics_svr.serve_forever, daemon=True)
+
     def cmd_worker(self):
         self._log.debug('')
 
         loop = True
 
         while loop:
-            args, repq = self._cmdq.get()
+            args, repq, t_put = self._cmdq.get()
             self._log.info('args=%a', args)
 
             # check and call cmd
@@ -569,7 +927,12 @@ class CmdServerApp:
 
                     # call cmd
                     self._log.debug('call %s: %a', Cmd.FUNC_Q, args)
+                    t_start = time.monotonic()
+                    self._cmd._metrics.observe(args[0], 'queue_wait',
+                                               t_start - t_put)
                     rc, msg = self._cmd._cmd[args[0]][Cmd.FUNC_Q](args)
+                    self._cmd._metrics.observe(args[0], Cmd.FUNC_Q,
+                                               time.monotonic() - t_start)
 
                     if rc == Cmd.RC_OK:
                         self._log.info('rc=%a, msg=%a', rc, msg)
@@ -601,7 +964,11 @@ class CmdServerApp:
 
     def main(self):
         self._svr_th.start()
+        if self._unix_svr is not None:
+            self._unix_th.start()
         self._cmd_worker_th.start()
+        if self._metrics_svr is not None:
+            self._metrics_th.start()
 
         self._cmd.main()
 
@@ -610,10 +977,15 @@ class CmdServerApp:
     def end(self):
         self._log.debug('')
         while not self._cmdq.empty():
-            args, repq = self._cmdq.get()
+            args, repq, t_put = self._cmdq.get()
             self._log.debug('args=%s, repq=%s', args, repq)
             if repq is not None:
                 repq.put((Cmd.RC_NG, 'terminated'))
+        if self._metrics_svr is not None:
+            self._metrics_svr.shutdown()
+            self._metrics_svr.server_close()
+        if self._unix_svr is not None:
+            self._unix_svr.end()
         self._svr.end()
         self._cmd.end()
         self._log.debug('done')
@@ -627,15 +999,28 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
                help='TCP Server base class')
 @click.option('--port', 'port', type=int,
               help='port number')
+@click.option('--metrics_port', 'metrics_port', type=int,
+              help='port number for Prometheus metrics')
+@click.option('--unix', '-u', 'unix_path', type=str,
+              help='Unix domain socket path')
+@click.option('--unix_mode', 'unix_mode', type=str, default='660',
+              help='permission of Unix domain socket (octal)')
+@click.option('--unix_group', 'unix_group', type=str,
+              help='group of Unix domain socket')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(port, debug):
+def main(port, metrics_port, unix_path, unix_mode, unix_group, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('port=%s', port)
+    logger.debug('port=%s, metrics_port=%s', port, metrics_port)
+    logger.debug('unix_path=%s, unix_mode=%s, unix_group=%s',
+                 unix_path, unix_mode, unix_group)
 
     logger.info('start')
 
-    app = CmdServerApp(Cmd, init_param=None, port=port, debug=debug)
+    app = CmdServerApp(Cmd, init_param=None, port=port,
+                       metrics_port=metrics_port, unix_path=unix_path,
+                       unix_mode=int(unix_mode, 8), unix_group=unix_group,
+                       debug=debug)
     try:
         app.main()
     finally:
@@ -37,10 +37,13 @@ fi
 VAL_COUNT=`expr \( $VAL_COUNT_MAX - $VAL_COUNT_MIN + 1 \) \* $VAL / 100`
 echo "VAL_COUNT=$VAL_COUNT"
 
-$IR_CMD $DEV_NAME on down down down down down down down down
-
-COUNT=0
-while [ $COUNT -lt $VAL_COUNT ]; do
-    $IR_CMD $DEV_NAME up
-    COUNT=`expr $COUNT + 1`
-done
+# 一つの ir-send プロセス(--batch)に、コマンドを一行ずつ渡す
+{
+    echo "$DEV_NAME on down down down down down down down down"
+
+    COUNT=0
+    while [ $COUNT -lt $VAL_COUNT ]; do
+	echo "$DEV_NAME up"
+	COUNT=`expr $COUNT + 1`
+    done
+} | $IR_CMD --batch
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_T.py -- 単位時間<T>の推定精度と速度のベンチマーク
+
+irconfファイルのボタン情報から合成した信号に、
+ジッタ、パルス幅の偏り(Td)、グリッチ(短いノイズ)を加えて解析し、
+下記の2つの方法を比較する。
+
+  bucket: 度数分布の一番小さいグループの平均 (従来の方法)
+  fit:    IrAnalyze.fit_T() (最小二乗法による補正)
+
+ok[%]: 解析結果のボタン文字列が、ノイズなしの場合と一致した割合
+       (グリッチを加えたフレームは、シンボルが一つ増えるので一致しない)
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import random
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from IrConfig import IrConfig
+from IrAnalyze import IrAnalyze, IrAnalyzeNp, np
+from MyLogger import get_logger
+
+
+DEF_CONF_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'irconf.d')
+
+
+def make_frames(conf_dir, jitter, td, glitch, n, seed):
+    """
+    Returns
+    -------
+    frames: [[T, clean_raw_data, noisy_raw_data], ..]
+    """
+    rnd = random.Random(seed)
+
+    irconf = IrConfig(conf_dir, load_all=True)
+    src = []
+    for d_ent in irconf.data:
+        dev = d_ent['data']
+        dev_name = dev['dev_name']
+        if type(dev_name) == list:
+            dev_name = dev_name[0]
+        for b in dev['buttons']:
+            if dev['buttons'][b] == '':
+                continue
+            raw_data, rep = irconf.get_raw_data(dev_name, b)
+            if raw_data is not None and len(raw_data) > 10:
+                src.append([dev['T'], raw_data])
+
+    frames = []
+    for i in range(n):
+        T, raw_data = rnd.choice(src)
+        noisy = []
+        for p, s in raw_data:
+            p = round(p + td + rnd.gauss(0, jitter))
+            s = round(s - td + rnd.gauss(0, jitter))
+            noisy.append([max(p, 1), max(s, 1)])
+        if rnd.random() < glitch:
+            i = rnd.randrange(1, len(noisy))
+            noisy.insert(i, [rnd.randint(60, 150), rnd.randint(60, 150)])
+        frames.append([T, raw_data, noisy])
+    return frames
+
+
+class BucketAnalyze(IrAnalyze):
+    """
+    fit_T()を行わない (従来の方法)
+    """
+    def fit_T(self):
+        self.T_conf = None
+
+
+def bench(analyzer, frames):
+    t_err = []
+    ok = 0
+    t_start = time.perf_counter()
+    for T, clean, noisy in frames:
+        analyzer.analyze(clean)
+        expect = analyzer.sig_str2
+
+        result = analyzer.analyze(noisy)
+        if result is None:
+            continue
+        t_err.append(abs(result['T'] - T) / T)
+        if analyzer.sig_str2 == expect:
+            ok += 1
+    t_sec = time.perf_counter() - t_start
+
+    return {
+        'T_err_ave': sum(t_err) / len(t_err) * 100,
+        'T_err_max': max(t_err) * 100,
+        'ok': ok / len(frames) * 100,
+        'msec': t_sec * 1000 / len(frames) / 2
+    }
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='benchmark of T estimation')
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, default=DEF_CONF_DIR,
+              help='irconf directory')
+@click.option('--jitter', '-j', 'jitter', type=float, default=60.0,
+              help='jitter (sigma) [us]')
+@click.option('--td', 'td', type=float, default=80.0,
+              help='pulse width bias [us]')
+@click.option('--glitch', '-g', 'glitch', type=float, default=0.2,
+              help='glitch probability per frame')
+@click.option('-n', 'n', type=int, default=500,
+              help='number of frames')
+@click.option('--seed', 'seed', type=int, default=0,
+              help='random seed')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(conf_dir, jitter, td, glitch, n, seed, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('conf_dir=%s, jitter=%s, td=%s, glitch=%s, n=%d',
+                 conf_dir, jitter, td, glitch, n)
+
+    frames = make_frames(conf_dir, jitter, td, glitch, n, seed)
+
+    analyzers = [['bucket', BucketAnalyze()], ['fit', IrAnalyze()]]
+    if np is not None:
+        analyzers.append(['fit(np)', IrAnalyzeNp()])
+
+    print('jitter=%.0fus, Td=%.0fus, glitch=%.2f, frames=%d' %
+          (jitter, td, glitch, n))
+    print('%-10s %10s %10s %8s %8s' %
+          ('', 'T_err[%]', 'max[%]', 'ok[%]', 'ms/frm'))
+    for name, an in analyzers:
+        r = bench(an, frames)
+        print('%-10s %10.3f %10.3f %8.1f %8.3f' %
+              (name, r['T_err_ave'], r['T_err_max'], r['ok'], r['msec']))
+
+
+if __name__ == '__main__':
+    main()
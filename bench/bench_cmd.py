@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_cmd.py -- CmdServer のリクエスト遅延のベンチマーク (TCP と Unix)
+
+同じプロセス内で、TcpCmdServer の CmdServerApp (TCP と Unix domain socket)
+を起動し、FUNC_I だけのコマンド(デフォルト: "help")の往復時間を測定する。
+
+  conn:    一回ごとに接続・切断 (TcpCmdClient.send_recv_str)
+  persist: 一つの接続で、繰り返し送受信
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TcpCmdServer import Cmd, CmdServerApp
+from TcpCmdClient import TcpCmdClient
+from bench_send import percentile
+from MyLogger import get_logger
+
+
+DEF_PORT = 59101
+DEF_UNIX_PATH = '/tmp/bench_cmd.sock'
+
+
+def bench_conn(cl, cmd, n):
+    t_list = []
+    for i in range(n):
+        t_start = time.perf_counter()
+        cl.send_recv_str(cmd)
+        t_list.append(time.perf_counter() - t_start)
+    return t_list
+
+
+def bench_persist(sock, cmd, n):
+    eof = TcpCmdClient.EOF
+    out_data = cmd.encode('utf-8')
+    t_list = []
+    for i in range(n):
+        t_start = time.perf_counter()
+        sock.sendall(out_data)
+        rep = b''
+        while eof not in rep:
+            rep += sock.recv(4096)
+        t_list.append(time.perf_counter() - t_start)
+    return t_list
+
+
+def print_result(name, t_list):
+    t_list = sorted(t_list)
+    print('%-14s avg %7.1f us, 50%% %7.1f us, 95%% %7.1f us' % (
+        name, sum(t_list) / len(t_list) * 1000000,
+        percentile(t_list, 50) * 1000000, percentile(t_list, 95) * 1000000))
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='request latency of CmdServer (TCP and Unix)')
+@click.argument('cmd', type=str, default='help')
+@click.option('--port', '-p', 'port', type=int, default=DEF_PORT,
+              help='port number')
+@click.option('--unix', '-u', 'unix_path', type=str, default=DEF_UNIX_PATH,
+              help='Unix domain socket path')
+@click.option('-n', 'n', type=int, default=2000,
+              help='number of requests')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(cmd, port, unix_path, n, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('cmd=%s, port=%s, unix_path=%s, n=%d',
+                 cmd, port, unix_path, n)
+
+    app = CmdServerApp(Cmd, port=port, unix_path=unix_path, debug=debug)
+    app._svr_th.start()
+    app._unix_th.start()
+
+    try:
+        for name, cl in [
+                ('tcp', TcpCmdClient('localhost', port)),
+                ('unix', TcpCmdClient(unix_path=unix_path))]:
+            bench_conn(cl, cmd, 10)  # warm up
+            print_result('%s conn' % name, bench_conn(cl, cmd, n))
+
+            with cl.connect() as sock:
+                bench_persist(sock, cmd, 10)  # warm up
+                print_result('%s persist' % name,
+                             bench_persist(sock, cmd, n))
+    finally:
+        app._unix_svr.end()
+        app._svr.end()
+
+
+if __name__ == '__main__':
+    main()
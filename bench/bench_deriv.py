@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_deriv.py -- PID の D項の計算方法(d_method)の比較 (リプレイ)
+
+温度の時系列を、AutoAirconCmd.pid() と Aircon.set_temp() に順に入力し、
+d_method ('ends', 'lsq')ごとに、下記を比較する。
+
+  d_std:   kd_d (D項)の標準偏差 .. ノイズによる振れ
+  changes: pid() から求めたリモコン温度(rtemp)が変化した回数
+  ir_send: Aircon.set_temp() が実際に赤外線信号を送信した回数
+
+温度の時系列は、``--csv FILE`` ("ts,temp" の行)で指定する。
+指定しない場合は、ゆっくり変化する温度に、センサーのノイズと、
+ときどき大きく外れた値(スパイク)を加えたものを生成する。
+
+赤外線送信と Node-RED へのパラメータ通知は、AutoAirconSim の
+SimAircon, SimAutoAirconCmd を使って、行わない。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import json
+import math
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AutoAirconServer import Aircon, PIDParam
+from AutoAirconSim import SimAircon, SimAutoAirconCmd
+from MyLogger import get_logger
+
+
+TOP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEF_PARAM_FILE = os.path.join(TOP_DIR, 'dot.autoaircon-param')
+
+
+def gen_series(n, ttemp, seed=0, noise=0.05, spike=0.02):
+    """
+    Returns
+    -------
+    series: [(ts, temp), ..]
+    """
+    rnd = random.Random(seed)
+    series = []
+    ts = 0.0
+    for i in range(n):
+        ts += rnd.uniform(10, 60)
+        temp = ttemp + 1.0 * math.sin(2 * math.pi * ts / 3600)
+        temp += rnd.gauss(0, noise)
+        if rnd.random() < spike:
+            temp += rnd.choice([-0.5, 0.5])
+        series.append((ts, round(temp, 2)))
+    return series
+
+
+def load_csv(file_name):
+    series = []
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith('#'):
+                continue
+            ts, temp = line.split(',')[:2]
+            series.append((float(ts), float(temp)))
+    return series
+
+
+class RecParamClient:
+    """
+    pid() が通知するパラメータを記録する
+    """
+    def __init__(self):
+        self.param = []
+
+    def send_param(self, param):
+        self.param.append(param)
+
+
+def replay(series, param, ttemp, interval_min):
+    """
+    Returns
+    -------
+    result: dict
+    """
+    cmd = SimAutoAirconCmd(param, ttemp)
+    cmd._param_cl = RecParamClient()
+
+    aircon = SimAircon(interval_min)
+    aircon.set_temp(round(ttemp), force=True, ts=series[0][0])
+    aircon.ir_send = 0
+
+    rtemp_prev = None
+    changes = 0
+    for ts, temp in series:
+        cmd.add_temp(temp, ts)
+        pid = cmd.pid()
+        if pid is None:
+            continue
+        rtemp = round(ttemp + round(pid, 2))
+        if rtemp != rtemp_prev:
+            changes += 1
+        rtemp_prev = rtemp
+        aircon.set_temp(rtemp, ts=ts)
+
+    kd_d = [p['kd_d'] for p in cmd._param_cl.param if 'kd_d' in p]
+    ave = sum(kd_d) / len(kd_d)
+    d_std = math.sqrt(sum((d - ave) ** 2 for d in kd_d) / len(kd_d))
+    return {'d_std': d_std, 'changes': changes, 'ir_send': aircon.ir_send}
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='compare d_method of AutoAirconCmd.d() by replay')
+@click.option('--csv', 'csv_file', type=str,
+              help='temperature series ("ts,temp" lines)')
+@click.option('--param', 'param_file', type=str, default=DEF_PARAM_FILE,
+              help='PID parameter file (JSON)')
+@click.option('--ttemp', 'ttemp', type=float, default=26,
+              help='target temperature')
+@click.option('--interval_min', 'interval_min', type=float,
+              default=Aircon.INTERVAL_MIN,
+              help='Aircon interval_min [sec]')
+@click.option('-n', 'n', type=int, default=2000,
+              help='number of generated samples')
+@click.option('--seed', 'seed', type=int, default=0,
+              help='random seed')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(csv_file, param_file, ttemp, interval_min, n, seed, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('csv_file=%s, param_file=%s, ttemp=%s, interval_min=%s',
+                 csv_file, param_file, ttemp, interval_min)
+
+    if csv_file is None:
+        series = gen_series(n, ttemp, seed)
+    else:
+        series = load_csv(csv_file)
+
+    param = dict(PIDParam.DEF_PARAM)
+    with open(param_file) as f:
+        param.update(json.load(f))
+
+    print('%d samples, %.1f hours' % (
+        len(series), (series[-1][0] - series[0][0]) / 3600))
+    for d_method in ['ends', 'lsq']:
+        param['d_method'] = d_method
+        ret = replay(series, param, ttemp, interval_min)
+        print('%-5s d_std %7.3f, changes %5d, ir_send %5d' % (
+            d_method, ret['d_std'], ret['changes'], ret['ir_send']))
+
+
+if __name__ == '__main__':
+    main()
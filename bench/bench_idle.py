@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_idle.py -- アイドル接続のコストと、シャットダウン時間の測定
+
+同じプロセス内で、TcpCmdServer の CmdServerApp を起動し、
+何もしないクライアントを N個(デフォルト: 200)接続して、下記を測定する。
+
+  idle:     アイドル中(--sec 秒)の、プロセスのCPU時間と
+            自発的コンテキストスイッチ(スレッドが起きた回数)
+  shutdown: CmdServer.end() から、全ての CmdServerHandler が
+            終了する(connections が 0 になる)までの時間
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import time
+import socket
+import resource
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TcpCmdServer import Cmd, CmdServerApp
+from MyLogger import get_logger
+
+
+DEF_PORT = 59103
+
+
+def wait_connections(metrics, n, timeout=30):
+    """
+    Returns
+    -------
+    sec: float
+      connections == n になるまでの時間 (タイムアウトの場合は None)
+    """
+    t_start = time.perf_counter()
+    while metrics.gauges()['connections'] != n:
+        if time.perf_counter() - t_start > timeout:
+            return None
+        time.sleep(0.001)
+    return time.perf_counter() - t_start
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='idle cost and shutdown latency of CmdServer')
+@click.option('--port', '-p', 'port', type=int, default=DEF_PORT,
+              help='port number')
+@click.option('-n', 'n', type=int, default=200,
+              help='number of idle clients')
+@click.option('--sec', '-s', 'sec', type=float, default=10,
+              help='idle time [sec]')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(port, n, sec, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('port=%s, n=%d, sec=%s', port, n, sec)
+
+    app = CmdServerApp(Cmd, port=port, debug=debug)
+    app._svr_th.start()
+    metrics = app._cmd._metrics
+
+    clients = []
+    for i in range(n):
+        clients.append(socket.create_connection(('localhost', port)))
+    if wait_connections(metrics, n) is None:
+        print('connections=%s' % metrics.gauges()['connections'])
+        sys.exit(1)
+
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    time.sleep(sec)
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = (ru1.ru_utime + ru1.ru_stime) - (ru0.ru_utime + ru0.ru_stime)
+    nvcsw = ru1.ru_nvcsw - ru0.ru_nvcsw
+    print('idle:     %d clients, %.1f sec: cpu %.1f ms, '
+          '%d wakeups (%.1f /sec)' % (n, sec, cpu * 1000, nvcsw, nvcsw / sec))
+
+    t_start = time.perf_counter()
+    app._svr.end()
+    t_svr = time.perf_counter() - t_start
+    t_handler = wait_connections(metrics, 0)
+    if t_handler is None:
+        print('shutdown: timeout (connections=%s)' %
+              metrics.gauges()['connections'])
+    else:
+        print('shutdown: serve_forever %.1f ms, all handlers %.1f ms' % (
+            t_svr * 1000, (t_svr + t_handler) * 1000))
+
+    for c in clients:
+        c.close()
+
+
+if __name__ == '__main__':
+    main()
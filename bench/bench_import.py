@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_import.py -- ir-send クライアントの import時間の測定とチェック
+
+``python -X importtime -c 'import <module>'`` をサブプロセスで実行し、
+import にかかった時間(cumulative の合計)と、重いモジュールの内訳を表示する。
+
+IrSendLite が、下記のどちらかに当てはまる場合は NG (終了コード 1)。
+
+* 起動時に import してはいけないモジュール(FORBIDDEN)を import している
+* import時間が ``--max_ms`` を越える
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import subprocess
+
+TOP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN = ['click', 'telnetlib', 'logging', 'pigpio', 'MyLogger',
+             'TcpCmdServer', 'TcpCmdClient', 'IrSendCmdServer',
+             'IrSendCmdClient', 'IrSend', 'IrConfig',
+             'socketserver', 'http.server']
+
+
+def importtime(module, n=5):
+    """
+    Returns
+    -------
+    (total_us, modules): (int, {name: cumulative_us})
+      n回測定して、最小の結果を返す
+    """
+    ret = None
+    for i in range(n):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [TOP_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+            cwd=TOP_DIR, env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+
+        modules = {}
+        total_us = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                self_us, cum_us, name = line[len('import time:'):].split('|')
+                cum_us = int(cum_us)
+            except ValueError:
+                continue
+            name_s = name.strip()
+            modules[name_s] = cum_us
+            if not name.startswith('  '):
+                # トップレベル(インデントなし)の import
+                total_us += cum_us
+
+        if ret is None or total_us < ret[0]:
+            ret = (total_us, modules)
+
+    return ret
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='import time of ir-send clients')
+@click.option('--max_ms', '-m', 'max_ms', type=float, default=30.0,
+              help='max import time of IrSendLite [ms]')
+@click.option('-n', 'n', type=int, default=5,
+              help='number of measurements (use minimum)')
+@click.option('--top', '-t', 'top', type=int, default=5,
+              help='number of heavy modules to show')
+def main(max_ms, n, top):
+    ok = True
+
+    for module in ['IrSendCmdClient', 'IrSendLite']:
+        total_us, modules = importtime(module, n)
+        print('%-16s %8.1f ms' % (module, total_us / 1000))
+        for name in sorted(modules, key=lambda m: -modules[m])[:top]:
+            print('  %-24s %8.1f ms' % (name, modules[name] / 1000))
+
+    found = [m for m in FORBIDDEN if m in modules]
+    if found:
+        print('NG: IrSendLite imports %s' % (', '.join(found)))
+        ok = False
+    if total_us / 1000 > max_ms:
+        print('NG: IrSendLite %.1f ms > %.1f ms' % (total_us / 1000, max_ms))
+        ok = False
+
+    if ok:
+        print('OK')
+    else:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_log.py -- デバッグログのオーバーヘッドのベンチマーク
+
+FakePigpio を使って(通信遅延なし)、下記の処理時間を測定する。
+
+  send:    IrSend.send() 一回 (送信完了待ちの sleep を除く:
+           get_raw_data() + send_raw_data(repeat=0))
+  recv_cb: IrRecv.cb_func_recv() + proc_msg() 一回 (エッジ一つ)
+
+``python -O bench_log.py`` で実行すると、
+ホットパスのデバッグログを取り除いた状態(strip debug)を測定できる。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FakePigpio
+FakePigpio.install()
+
+from IrSend import IrSend
+from IrRecv import IrRecv
+from IrConfig import IrConfig
+from MyLogger import get_logger
+
+
+DEF_CONF_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'irconf.d')
+
+
+def bench_send(irsend, dev_name, button, n):
+    t_start = time.perf_counter()
+    for i in range(n):
+        raw_data, repeat = irsend.irconf.get_raw_data(dev_name, button)
+        irsend.send_raw_data(raw_data, 0)
+    return (time.perf_counter() - t_start) / n
+
+
+def bench_recv_cb(irrecv, raw_data, n):
+    pin = irrecv.pin
+    edges = []
+    tick = 0
+    for p, s in raw_data:
+        edges.append([0, tick])
+        tick += p
+        edges.append([1, tick])
+        tick += s
+
+    irrecv.cb_recv = FakePigpio._callback(FakePigpio.daemon, pin, 0, None)
+    n_edge = 0
+    t_start = time.perf_counter()
+    for i in range(n):
+        irrecv.raw_data = []
+        irrecv.receiving = True
+        for val, t in edges:
+            irrecv.cb_func_recv(pin, val, t)
+            irrecv.proc_msg(irrecv.msgq.get())
+        n_edge += len(edges)
+    return (time.perf_counter() - t_start) / n_edge
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='benchmark of debug logging overhead')
+@click.argument('dev_name', type=str, default='lamp')
+@click.argument('button', type=str, default='on')
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, default=DEF_CONF_DIR,
+              help='irconf directory')
+@click.option('-n', 'n', type=int, default=500,
+              help='number of sends')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(dev_name, button, conf_dir, n, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('dev_name=%s, button=%s, conf_dir=%s, n=%d',
+                 dev_name, button, conf_dir, n)
+
+    FakePigpio.daemon.conf['latency_us'] = 0
+    FakePigpio.daemon.conf['wave_create_us'] = 0
+    FakePigpio.daemon.conf['time_scale'] = 0
+
+    irsend = IrSend(load_conf=False)
+    irsend.irconf = IrConfig(conf_dir, load_all=True)
+    raw_data, repeat = irsend.irconf.get_raw_data(dev_name, button)
+    irrecv = IrRecv(27)
+
+    # warm up
+    bench_send(irsend, dev_name, button, 5)
+
+    t_send = bench_send(irsend, dev_name, button, n)
+    t_cb = bench_recv_cb(irrecv, raw_data, n)
+
+    print('strip debug (python -O): %s' % (not __debug__))
+    print('send:    %8.3f ms' % (t_send * 1000))
+    print('recv_cb: %8.3f us/edge' % (t_cb * 1000000))
+
+
+if __name__ == '__main__':
+    main()
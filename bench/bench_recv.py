@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_recv.py -- 受信・解析処理のベンチマーク (ハードウェア不要)
+
+FakePigpio で、irconfファイルの全ボタンの信号を受信ピンに入力し、
+IrRecv.recv() と IrAnalyze.analyze() のスループットを測定する。
+
+  frm/s:   一秒当たりに処理できたフレーム数
+  edges/s: 一秒当たりに処理できたエッジ(コールバック)の数
+  ok[%]:   解析結果が、元のボタンと同じ信号に戻った割合
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FakePigpio
+FakePigpio.install()
+
+from IrRecv import IrRecv
+from IrConfig import IrConfig
+from IrAnalyze import IrAnalyze, IrAnalyzeNp, np
+from MyLogger import get_logger
+from bench_send import DEF_CONF_DIR, buttons
+
+
+DEF_PIN = 27
+
+
+def make_frames(irconf):
+    """
+    Returns
+    -------
+    frames: [[raw_data, expected_sig_str], ..]
+    """
+    an = IrAnalyze()
+    frames = []
+    for dev_name, button in buttons(irconf):
+        raw_data, rep = irconf.get_raw_data(dev_name, button)
+        if raw_data is None or len(raw_data) <= 10:
+            continue
+        if raw_data[0][0] < IrRecv.LEADER_MIN_USEC:
+            # IrRecv では受信できない
+            continue
+        # 受信側のタイムアウトで終わるように、最後の space を長くする
+        raw_data = [list(ps) for ps in raw_data]
+        raw_data[-1][1] = max(raw_data[-1][1],
+                              IrRecv.WATCHDOG_MSEC * 1000 * 2)
+        if an.analyze(raw_data) is None:
+            continue
+        frames.append([raw_data, an.sig_str2])
+    return frames
+
+
+def bench(irrecv, an, frames, n):
+    daemon = FakePigpio.daemon
+
+    n_frame = 0
+    n_edge = 0
+    ok = 0
+    t_start = time.perf_counter()
+    for i in range(n):
+        for raw_data, expect in frames:
+            daemon.inject(irrecv.pin, raw_data)
+            result = an.analyze(irrecv.recv())
+            n_frame += 1
+            n_edge += len(raw_data) * 2
+            if result is not None and an.sig_str2 == expect:
+                ok += 1
+    t_sec = time.perf_counter() - t_start
+
+    return {
+        'frames': n_frame,
+        'frm_s': n_frame / t_sec,
+        'edges_s': n_edge / t_sec,
+        'ok': ok / n_frame * 100,
+    }
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='benchmark of IrRecv + IrAnalyze (with FakePigpio)')
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, default=DEF_CONF_DIR,
+              help='irconf directory')
+@click.option('--latency', '-l', 'latency', type=float,
+              default=FakePigpio.Daemon.CONF['latency_us'],
+              help='pigpiod command latency [us]')
+@click.option('-n', 'n', type=int, default=3,
+              help='number of rounds')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(conf_dir, latency, n, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('conf_dir=%s, latency=%s, n=%d', conf_dir, latency, n)
+
+    FakePigpio.daemon.conf['latency_us'] = latency
+
+    irconf = IrConfig(conf_dir, load_all=True, debug=debug)
+    frames = make_frames(irconf)
+
+    analyzers = [['IrAnalyze', IrAnalyze()]]
+    if np is not None:
+        analyzers.append(['IrAnalyzeNp', IrAnalyzeNp()])
+
+    print('latency=%.0fus, frames=%d, rounds=%d' % (latency, len(frames), n))
+    print('%-12s %8s %10s %10s %8s' %
+          ('', 'frames', 'frm/s', 'edges/s', 'ok[%]'))
+    for name, an in analyzers:
+        irrecv = IrRecv(DEF_PIN, debug=debug)
+        r = bench(irrecv, an, frames, n)
+        irrecv.end()
+        print('%-12s %8d %10.1f %10.0f %8.1f' %
+              (name, r['frames'], r['frm_s'], r['edges_s'], r['ok']))
+
+
+if __name__ == '__main__':
+    main()
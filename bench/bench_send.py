@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# (c) 2026 Yoichi Tanibayashi
+#
+"""
+bench_send.py -- 送信処理のベンチマーク (ハードウェア不要)
+
+FakePigpio を使って、irconfファイルの全ボタンを IrSend.send() で送信し、
+下記を測定する。
+
+  ms/send:   send()一回の処理時間 (平均, 50%, 95%)
+  waves:     send()一回当たりの wave_create() の回数
+  pulses:    送信されたパルス数 (キャリアを含む)
+
+--time_scale 0 (デフォルト)では、送信時間(wave_tx_busy)を待たないので、
+ソフトウェアの処理時間だけを測定できる。
+--latency で、pigpiodとの通信遅延を変えられる。
+
+"""
+__author__ = 'Yoichi Tanibayashi'
+__date__   = '2026'
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FakePigpio
+FakePigpio.install()
+
+from IrSend import IrSend
+from IrConfig import IrConfig
+from MyLogger import get_logger
+
+
+DEF_CONF_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'irconf.d')
+
+
+def buttons(irconf):
+    """
+    Returns
+    -------
+    [[dev_name, button_name], ..]
+    """
+    b_list = []
+    for d_ent in irconf.data:
+        dev = d_ent['data']
+        dev_name = dev['dev_name']
+        if type(dev_name) == list:
+            dev_name = dev_name[0]
+        for b in dev['buttons']:
+            if dev['buttons'][b] == '':
+                continue
+            b_list.append([dev_name, b])
+    return b_list
+
+
+def percentile(data, p):
+    data = sorted(data)
+    return data[min(int(len(data) * p / 100), len(data) - 1)]
+
+
+def bench(irsend, b_list, n):
+    daemon = FakePigpio.daemon
+
+    t_list = []
+    waves = []
+    pulses = []
+    for i in range(n):
+        for dev_name, button in b_list:
+            n_wave = daemon.stats.get('wave_create', 0)
+            n_emit = len(daemon.emitted)
+
+            t_start = time.perf_counter()
+            ret = irsend.send(dev_name, button)
+            t_list.append(time.perf_counter() - t_start)
+
+            if not ret:
+                continue
+            waves.append(daemon.stats.get('wave_create', 0) - n_wave)
+            pulses.append(sum([len(e['pulses'])
+                               for e in daemon.emitted[n_emit:]]))
+        daemon.emitted = []
+
+    return {
+        'sends': len(t_list),
+        'ms_ave': sum(t_list) / len(t_list) * 1000,
+        'ms_50': percentile(t_list, 50) * 1000,
+        'ms_95': percentile(t_list, 95) * 1000,
+        'waves': sum(waves) / max(len(waves), 1),
+        'pulses': sum(pulses) / max(len(pulses), 1),
+    }
+
+
+#####
+import click
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               help='benchmark of IrSend (with FakePigpio)')
+@click.option('--conf_dir', '-c', 'conf_dir', type=str, default=DEF_CONF_DIR,
+              help='irconf directory')
+@click.option('--latency', '-l', 'latency', type=float,
+              default=FakePigpio.Daemon.CONF['latency_us'],
+              help='pigpiod command latency [us]')
+@click.option('--time_scale', '-t', 'time_scale', type=float, default=0.0,
+              help='transmission time scale (0: no wait)')
+@click.option('-n', 'n', type=int, default=3,
+              help='number of rounds')
+@click.option('--debug', '-d', 'debug', is_flag=True, default=False,
+              help='debug flag')
+def main(conf_dir, latency, time_scale, n, debug):
+    logger = get_logger(__name__, debug)
+    logger.debug('conf_dir=%s, latency=%s, time_scale=%s, n=%d',
+                 conf_dir, latency, time_scale, n)
+
+    FakePigpio.daemon.conf['latency_us'] = latency
+    FakePigpio.daemon.conf['time_scale'] = time_scale
+
+    irsend = IrSend(load_conf=False, debug=debug)
+    irsend.irconf = IrConfig(conf_dir, load_all=True, debug=debug)
+    b_list = buttons(irsend.irconf)
+
+    r = bench(irsend, b_list, n)
+    irsend.end()
+
+    print('latency=%.0fus, time_scale=%.2f, buttons=%d, rounds=%d' %
+          (latency, time_scale, len(b_list), n))
+    print('%8s %8s %8s %8s %8s %8s' %
+          ('sends', 'ms/send', '50%', '95%', 'waves', 'pulses'))
+    print('%8d %8.3f %8.3f %8.3f %8.1f %8.0f' %
+          (r['sends'], r['ms_ave'], r['ms_50'], r['ms_95'],
+           r['waves'], r['pulses']))
+    print('pigpio commands: %s' % (FakePigpio.daemon.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,48 +4,335 @@
 for irdb raw mode
 (http://irdb.tk/codes/)
 
+batch mode (--batch):
+  ディレクトリ・ツリー、または、CSVファイルに含まれる
+  全てのrawコードを、マルチプロセスで一括解析し、
+  デバイスごとにまとめた一つの irconf ファイルを出力する。
+
+  ディレクトリ: <dir>/<device>/<button>  (一ファイル一コード)
+  CSVファイル:  ヘッダ行必須
+                device(dev_name), function(functionname, button), raw(code)
+
 """
 __author__ = 'Yoichi Tanibayashi'
 __date__   = '2019'
 
-from IrAnalyze import IrAnalyze
+from IrAnalyze import IrAnalyze, IrAnalyzeNp, np
 from MyLogger import get_logger
+from pathlib import Path
+import multiprocessing
+import csv
+import json
+import os
+import sys
+
+
+def tokenize(lines):
+    """
+    rawコードのストリーミング・トークナイザ
+
+    '+9024 -4512 +564 -564 ..' の並びを、[pulse, space]ごとに返す。
+
+    Parameters
+    ----------
+    lines: iterable of str
+      ファイルオブジェクトなど
+
+    Yields
+    ------
+    [pulse, space]
+      最後の pulse に space がない場合(ストップ・ビット)は、
+      IrRecv の受信データと同様に、長い space(IrAnalyze.SIG_LONG)を補う
+    """
+    pulse = None
+    for li in lines:
+        for w in li.split():
+            if pulse is None:
+                pulse = int(w)
+            else:
+                yield [pulse, -int(w)]
+                pulse = None
+    if pulse is not None:
+        yield [pulse, IrAnalyze.SIG_LONG]
+
+
+#####
+_analyzer = None
+
+
+def analyze_code(code):
+    """
+    multiprocessing.Pool から呼ばれる解析関数
+    (プロセスごとに、IrAnalyzeオブジェクトを一つ生成して使い回す)
+
+    Parameters
+    ----------
+    code: (dev_name, button_name, raw_data)
+
+    Returns
+    -------
+    (dev_name, button_name, result, err)
+      err: 例外 ('<type>: <msg>') or None
+    """
+    global _analyzer
+
+    if _analyzer is None:
+        if np is None:
+            _analyzer = IrAnalyze()
+        else:
+            _analyzer = IrAnalyzeNp()
+
+    dev_name, button_name, raw_data = code
+    try:
+        result = _analyzer.analyze(raw_data)
+    except Exception as e:
+        # 一つのコードの解析エラーで、全体を止めない (呼び出し元でログ)
+        return dev_name, button_name, None, '%s: %s' % (type(e).__name__, e)
+    return dev_name, button_name, result, None
+
+
+class IrdbBatch:
+    """
+    irdb rawコードの一括解析
+    """
+    CSV_COL = {
+        'dev_name': ['device', 'dev_name'],
+        'button':   ['function', 'functionname', 'button'],
+        'raw':      ['raw', 'code']
+    }
+
+    CHUNK_SIZE = 16
+
+    KEY_SYM = ['-', '0', '1']  # デバイスをまとめるときに一致が必要なシンボル
+
+    def __init__(self, jobs=None, debug=False):
+        self._dbg = debug
+        self._log = get_logger(__class__.__name__, self._dbg)
+        self._log.debug('jobs=%s', jobs)
+
+        self.jobs = jobs
+        if self.jobs is None:
+            self.jobs = os.cpu_count()
+
+    def codes(self, path):
+        """
+        ``path``(ディレクトリ or CSVファイル)から、
+        (dev_name, button_name, raw_data)を順に返す。
+        """
+        self._log.debug('path=%s', path)
+
+        path = Path(path)
+
+        if path.is_dir():
+            for f in sorted(path.rglob('*')):
+                if not f.is_file() or f.name.startswith('.'):
+                    continue
+                if f.suffix == '.csv':
+                    yield from self.codes(f)
+                    continue
+                dev_name = str(f.parent.relative_to(path))
+                if dev_name == '.':
+                    dev_name = path.name
+                try:
+                    with open(f, 'r') as fp:
+                        raw_data = list(tokenize(fp))
+                except (ValueError, UnicodeDecodeError) as e:
+                    self._log.warning('%s: %s:%s .. ignored', f, type(e), e)
+                    continue
+                yield dev_name, f.name, raw_data
+            return
+
+        with open(path, 'r', newline='') as fp:
+            reader = csv.DictReader(fp)
+            col = {}
+            for key in self.CSV_COL:
+                for c in self.CSV_COL[key]:
+                    if c in reader.fieldnames:
+                        col[key] = c
+                        break
+            self._log.debug('col=%s', col)
+            if 'raw' not in col:
+                self._log.error('%s: no raw code column', path)
+                return
+
+            for i, row in enumerate(reader):
+                dev_name = row.get(col.get('dev_name'), '') or path.stem
+                button = row.get(col.get('button'), '') or 'button%d' % (i + 1)
+                try:
+                    raw_data = list(tokenize([row[col['raw']]]))
+                except ValueError as e:
+                    self._log.warning('%s:%d: %s:%s .. ignored',
+                                      path, i + 2, type(e), e)
+                    continue
+                yield dev_name, button, raw_data
+
+    def analyze(self, paths):
+        """
+        全てのコードを解析する。
+
+        Returns
+        -------
+        results: {dev_name: [[button_name, result], ..]}
+
+        errors: {reason: count}
+          解析できなかったコードの数 (理由ごと)
+        """
+        self._log.debug('paths=%s', paths)
+
+        def all_codes():
+            for p in paths:
+                yield from self.codes(p)
+
+        results = {}
+        errors = {}
+        with multiprocessing.Pool(self.jobs) as pool:
+            for dev_name, button, result, err in pool.imap(analyze_code,
+                                                           all_codes(),
+                                                           self.CHUNK_SIZE):
+                if err is not None:
+                    self._log.warning('%s:%s: %s .. ignored',
+                                      dev_name, button, err)
+                    reason = err.split(':')[0]
+                    errors[reason] = errors.get(reason, 0) + 1
+                    continue
+                if result is None:
+                    self._log.warning('%s:%s: invalid signal .. ignored',
+                                      dev_name, button)
+                    errors['invalid signal'] = errors.get(
+                        'invalid signal', 0) + 1
+                    continue
+                results.setdefault(dev_name, []).append([button, result])
+
+        return results, errors
+
+    def merge(self, results):
+        """
+        デバイスごとに、ボタン情報をまとめる。
+
+        同じデバイスでも、フォーマットや
+        sym_tbl の leader, 0, 1 が異なる場合は、
+        別のデバイス(dev_name + '_2', ..)とする。
+        それ以外の sym_tbl のシンボル(trailerなど)は、和集合をとる。
+        T は、まとめたボタンの平均値。
+
+        Returns
+        -------
+        dev_list: list of conf_data
+        """
+        dev_list = []
+        for dev_name in results:
+            groups = {}
+            for button, result in results[dev_name]:
+                key = json.dumps([result['format']] +
+                                 [result['sym_tbl'][ch]
+                                  for ch in self.KEY_SYM])
+                groups.setdefault(key, []).append([button, result])
+
+            groups = sorted(groups.values(), key=len, reverse=True)
+            for i, g in enumerate(groups):
+                name = dev_name
+                if i > 0:
+                    name += '_%d' % (i + 1)
+
+                dev_data = dict(g[0][1])
+                dev_data['comment'] = 'generated by %s' % (
+                    os.path.basename(__file__))
+                dev_data['dev_name'] = [name]
+                dev_data['T'] = sum([r['T'] for b, r in g]) / len(g)
+                dev_data['sym_tbl'] = {}
+                for ch in g[0][1]['sym_tbl']:
+                    sym = []
+                    for b, r in g:
+                        sym += [s for s in r['sym_tbl'][ch] if s not in sym]
+                    dev_data['sym_tbl'][ch] = sorted(sym)
+                dev_data['buttons'] = {}
+                for button, result in g:
+                    dev_data['buttons'][button] = result['buttons']['button1']
+                dev_list.append(dev_data)
+
+        return dev_list
+
+    def summary(self, results, errors):
+        """
+        フォーマット、Tの統計情報
+
+        Returns
+        -------
+        summary_str: str
+        """
+        stat = {}
+        for dev_name in results:
+            for button, result in results[dev_name]:
+                fmt = result['format']
+                if type(fmt) == list:
+                    fmt = ' '.join(sorted(fmt))
+                stat.setdefault(fmt, []).append(result['T'])
+
+        n = sum([len(t) for t in stat.values()])
+        out_str = 'devices: %d, codes: %d, errors: %d\n' % (
+            len(results), n, sum(errors.values()))
+        for reason in sorted(errors):
+            out_str += '  error: %-20s %6d\n' % (reason, errors[reason])
+        for fmt in sorted(stat, key=lambda f: len(stat[f]), reverse=True):
+            t = stat[fmt]
+            out_str += '  %-20s %6d  T=%.1f (min %.1f, max %.1f)\n' % (
+                fmt, len(t), sum(t) / len(t), min(t), max(t))
+        return out_str
 
 
 #####
 class App:
-    def __init__(self, file, debug=False):
+    def __init__(self, files, batch=False, out='', jobs=None, debug=False):
         self._dbg = debug
         self._log = get_logger(__class__.__name__, self._dbg)
-        self._log.debug('file=%s', file)
+        self._log.debug('files=%s, batch=%s, out=%s, jobs=%s',
+                        files, batch, out, jobs)
 
-        self.file = file
+        self.files = files
+        self.batch = batch
+        self.out = out
+        self.jobs = jobs
 
         self.an = IrAnalyze(debug=self._dbg)
 
     def main(self):
         self._log.debug('')
 
-        with open(self.file, 'r') as f:
-            line = f.readlines()
-        print(line)
+        if self.batch:
+            self.main_batch()
+            return
+
+        for file in self.files:
+            with open(file, 'r') as f:
+                line = f.readlines()
+            print(line)
+
+            raw_data = list(tokenize(line))
+            self._log.debug('raw_data=%s', raw_data)
+
+            result = self.an.analyze(raw_data)
+            self._log.debug('result=%s', result)
+
+            print(self.an.json_dumps(result))
+
+    def main_batch(self):
+        self._log.debug('')
+
+        irdb = IrdbBatch(self.jobs, debug=self._dbg)
 
-        raw_data = []
-        i = 0
-        for li in line:
-            for w in li.split():
-                if i % 2 == 0:
-                    raw_data.append([int(w)])
-                else:
-                    raw_data[-1].append(-int(w))
-                self._log.debug('raw_data=%s', raw_data)
-                i += 1
-        self._log.debug('raw_data=%s', raw_data)
+        results, errors = irdb.analyze(self.files)
+        dev_list = irdb.merge(results)
 
-        result = self.an.analyze(raw_data)
-        self._log.debug('result=%s', result)
+        if len(dev_list) > 0:
+            json_str = self.an.json_dumps(dev_list)
+            if self.out == '':
+                print(json_str)
+            else:
+                with open(self.out, 'w') as f:
+                    f.write(json_str)
 
-        print(self.an.json_dumps(result))
+        # 標準出力は、irconf の JSON だけ (リダイレクトできるように)
+        print(irdb.summary(results, errors), end='', file=sys.stderr)
 
     def end(self):
         self._log.debug('')
@@ -60,14 +347,21 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
 @click.command(context_settings=CONTEXT_SETTINGS,
                help='irdb raw format analyzer')
-@click.argument('file')
+@click.argument('files', nargs=-1, required=True)
+@click.option('--batch', '-b', 'batch', is_flag=True, default=False,
+              help='batch mode (FILES: directory or CSV)')
+@click.option('--out', '-o', 'out', type=str, default='',
+              help='output irconf file (batch mode)')
+@click.option('--jobs', '-j', 'jobs', type=int, default=None,
+              help='number of processes (batch mode)')
 @click.option('--debug', '-d', 'debug', is_flag=True, default=False,
               help='debug flag')
-def main(file, debug):
+def main(files, batch, out, jobs, debug):
     logger = get_logger(__name__, debug)
-    logger.debug('file=%s', file)
+    logger.debug('files=%s, batch=%s, out=%s, jobs=%s',
+                 files, batch, out, jobs)
 
-    app = App(file, debug=debug)
+    app = App(files, batch, out, jobs, debug=debug)
     try:
         app.main()
     finally:
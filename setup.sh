@@ -3,7 +3,7 @@
 # (c) 2020 Yoichi Tanibayashi
 #
 GITS="ytMQTT common_python"
-CMDS="IrAnalyze.py IrSendCmdServer.py IrSendCmdClient.py AutoAirconServer.py"
+CMDS="IrAnalyze.py IrSendCmdServer.py IrSendCmdClient.py IrSendLite.py AutoAirconServer.py"
 BINCMDS="boot-ir.sh ir-analyze ir-send dyson.sh dyson-temp.sh tv-light-level.sh"
 
 echo "GITS=${GITS}"
@@ -17,13 +17,12 @@ usage () {
     echo "usage: ${MYNAME} level (1 .. 5)"
 }
 
+# 一つの ir-send プロセス(--batch)に、コマンドを一行ずつ渡す
 irsend_n () {
     button=$1
     count=$2
     while [ $count -gt 0 ]; do
-	CMDLINE="$IRSEND_CMD $DEV_NAME $button"
-	echo -n "($count) $CMDLINE: "
-	eval $CMDLINE
+	echo "$DEV_NAME $button"
 	count=`expr $count - 1`
     done
 }
@@ -37,7 +36,9 @@ fi
 
 LEVEL=$1
 
-irsend_n $BUTTON_DOWN `expr $LEVEL_MAX - $LEVEL_MIN`
-irsend_n $BUTTON_UP   `expr $LEVEL     - $LEVEL_MIN`
+{
+    irsend_n $BUTTON_DOWN `expr $LEVEL_MAX - $LEVEL_MIN`
+    irsend_n $BUTTON_UP   `expr $LEVEL     - $LEVEL_MIN`
+} | $IRSEND_CMD --batch
 
 exit 0